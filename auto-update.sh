@@ -3,7 +3,7 @@
 # Scheduled to run at 08:45 and 13:00 Saudi Arabia time (GMT+3)
 #
 # To manually run: bash auto-update.sh
-# To test without push: bash auto-update.sh --dry-run
+# To test without push: bash auto-update.sh --dry-run (builds the commit, doesn't push)
 
 set -euo pipefail
 
@@ -21,12 +21,12 @@ DRY_RUN=false
 # with no new subscription. Override with NTFY_TOPIC= to silence (used when testing).
 NTFY_TOPIC="${NTFY_TOPIC-thc-bridge-will-c333ed3bee86b1cc}"
 
-# ping <title> <message> — phone notification via ntfy. Never fatal.
+# ping <title> <message> [priority] — phone notification via ntfy. Never fatal.
 ping() {
     [ -n "$NTFY_TOPIC" ] || return 0
     curl -s -m 10 \
         -H "Title: $1" \
-        -H "Priority: high" \
+        -H "Priority: ${3:-high}" \
         -H "Tags: helicopter" \
         -d "$2" \
         "https://ntfy.sh/${NTFY_TOPIC}" >/dev/null 2>&1 || true
@@ -46,63 +46,34 @@ echo "🚁 THC Fleet Map Auto-Update"
 echo "   $(date '+%Y-%m-%d %H:%M:%S %Z')"
 echo ""
 
-# 0. Pull first so generation runs on the latest state (a manual push from
-#    another machine won't jam the scheduled run).
-echo "🔄 Pulling latest..."
-# A failed pull used to warn and carry on. That is what shipped a broken page on
-# 2026-08-16: the autostash conflicted, the markers stayed in index.html, and the
-# script regenerated + committed + pushed them. Now it's fatal.
-if ! git pull --rebase --autostash; then
-    git rebase --abort 2>/dev/null || true
-    abort "git pull --rebase --autostash failed — working tree may be mid-conflict"
-fi
-
-# 1. Run the generator
+# 1. Generate and publish. publish.py commits the generated page directly onto
+#    origin/main (hash-object / commit-tree / push --force-with-lease) without
+#    touching the working tree, so the old pull --rebase --autostash step — and
+#    the conflict markers it once left in index.html (2026-08-16) — are gone.
+#    It first resets this clone to origin/main (failing, so we ping, if it
+#    holds hand changes), refuses to publish a page carrying conflict markers, and skips the
+#    publish when the ONLY change is the "Last updated" stamp.
 echo "📊 Generating fleet map..."
-python3 generate.py
-
-# 1b. Skip the publish when the ONLY change is the "Last updated" stamp.
-#     generate.py rewrites it every run, so a scheduled job pushed even when no
-#     fleet data had moved. See fleetpush.sh for the full note (2026-08-06).
-if ! git diff --quiet -- index.html; then
-    substantive=$(git diff -U0 -- index.html \
-        | grep -E '^[+-]' | grep -vE '^(\+\+\+|---)' \
-        | grep -vE 'LAST_UPDATED' || true)
-    if [ -z "$substantive" ]; then
-        echo "⏭️  Only the 'Last updated' stamp changed — nothing to publish"
-        git checkout -- index.html
-    fi
+PUBLISH_ARGS=(--publish -m "Auto-update: $(date '+%d %b %Y %H:%M')")
+[ "$DRY_RUN" = true ] && PUBLISH_ARGS+=(--dry-run)
+if ! python3 generate.py "${PUBLISH_ARGS[@]}"; then
+    abort "generate.py --publish failed — see the log above"
 fi
-
-# 2. Check for changes
-if git diff --quiet && git diff --cached --quiet; then
-    echo "✅ No changes detected — skipping push"
-    exit 0
+[ "$DRY_RUN" = true ] || echo "✅ Live at: https://willslawrence.github.io/thc-fleet-map-v2/"
+
+# 2. A region showing its last good copy (a source failed to load or came
+#    back nearly empty, see guard_regions) is worth a ping every run until
+#    the source is fixed.
+STALE="$(python3 -c 'import json; print("; ".join(r + ": " + s["why"] for r, s in sorted(json.load(open(".cache/stale.json")).items())))' 2>/dev/null || true)"
+if [ -n "$STALE" ] && [ "$DRY_RUN" = false ]; then
+    ping "🚁 Fleet map showing stale data" "$STALE — check the vault sync"
 fi
 
-# 2b. GUARD — never publish a page carrying git conflict markers.
-#     generate.py rewrites index.html only BETWEEN its comment markers, so a conflict
-#     elsewhere in the file survives regeneration untouched and looks fine to every
-#     other check ("the notes are there", "no leaks") while the page is broken.
-if grep -qE '^(<<<<<<< |>>>>>>> |=======$)' index.html; then
-    echo ""
-    grep -nE '^(<<<<<<< |>>>>>>> |=======$)' index.html | head
-    abort "index.html contains git conflict markers"
-fi
-
-# 3. Stage and commit
-echo "📦 Committing changes..."
-git add -A
-git commit -m "Auto-update: $(date '+%d %b %Y %H:%M')"
-
-# 4. Push (unless dry-run)
-if [ "$DRY_RUN" = true ]; then
-    echo "🔍 DRY RUN — would push to GitHub"
-else
-    echo "🚀 Pushing to GitHub..."
-    # If the remote moved in the meantime, rebase once and retry.
-    git push || { git pull --rebase --autostash && git push; }
-    echo "✅ Live at: https://willslawrence.github.io/thc-fleet-map-v2/"
+# 3. Tell the phone what changed since the previous run (the change set
+#    generate.py wrote to .cache/changes.json), if anything did.
+SUMMARY="$(python3 -c 'import json; print(json.load(open(".cache/changes.json"))["summary"])' 2>/dev/null || true)"
+if [ -n "$SUMMARY" ] && [ "$DRY_RUN" = false ]; then
+    ping "🚁 Fleet map changes" "$SUMMARY" default
 fi
 
 echo ""
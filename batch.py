@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Generate several sites, one per fleet/operator configuration, in parallel.
+
+    python3 generate.py batch batch.json [--jobs N] [--publish [--dry-run] [--now]]
+
+The manifest is JSON (not sites.json, which is the stadium map's data).
+Paths are relative to the manifest file, and "defaults" apply to every
+site:
+
+    {"defaults": {"tz": "Asia/Riyadh"},
+     "sites": [
+       {"name": "thc", "vault": "~/THC Vault", "html_file": "thc/index.html"},
+       {"name": "ops2", "vault": "~/Ops2 Vault", "html_file": "ops2/index.html",
+        "aircraft_type": "AW139", "schedule_section": "## AW139",
+        "reg_ranges": [["HC", 70, 89]]}]}
+
+Any Config field can be set per site. Each site needs a directory of its
+own, but sites can share a git repo. With --publish, every repo is first
+reset to origin/main, as a single run does. Sites run in a process pool,
+each under its own repo lock and with its own metrics, so total wall time
+is close to the slowest site's rather than the sum. Vaults that more than one
+site reads are loaded into generate's read and frontmatter caches once,
+before the pool forks, and the workers inherit them. A site that fails
+(bad vault path, exception, failed publish) is reported with its
+traceback; the others are unaffected. Exit status is 1 if any site failed.
+"""
+import os, io, sys, json, glob, time, argparse, traceback, contextlib, multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import fields
+
+import generate, publish
+
+CONFIG_FIELDS = {f.name for f in fields(generate.Config) if f.init}
+
+def load_manifest(path):
+    """[(name, Config)] from a manifest file."""
+    m = json.load(open(path))
+    if not isinstance(m, dict) or 'sites' not in m:
+        raise SystemExit(f"❌ {path} is not a batch manifest (no \"sites\" list)")
+    base = os.path.dirname(os.path.abspath(path))
+    sites = []
+    for i, entry in enumerate(m.get('sites', ())):
+        entry = {**m.get('defaults', {}), **entry}
+        name = entry.pop('name', f"site{i + 1}")
+        unknown = set(entry) - CONFIG_FIELDS
+        if unknown:
+            raise SystemExit(f"❌ {path}: site {name!r} has unknown setting(s) {', '.join(sorted(unknown))}")
+        for k in ('vault', 'html_file', 'metrics_dir'):
+            if entry.get(k):
+                entry[k] = os.path.join(base, os.path.expanduser(entry[k]))
+        if 'reg_ranges' in entry:
+            entry['reg_ranges'] = tuple((p.upper(), int(lo), int(hi)) for p, lo, hi in entry['reg_ranges'])
+        sites.append((name, generate.Config(**entry)))
+    names = Counter(n for n, _ in sites)
+    if any(c > 1 for c in names.values()):
+        raise SystemExit(f"❌ {path}: duplicate site names {', '.join(n for n, c in names.items() if c > 1)}")
+    # A site owns its directory: the pages, data/, exports/ and .cache/ in it
+    dirs = Counter(os.path.realpath(cfg.repo_dir) for _, cfg in sites)
+    shared = [n for n, cfg in sites if dirs[os.path.realpath(cfg.repo_dir)] > 1]
+    if shared:
+        raise SystemExit(f"❌ {path}: sites {', '.join(shared)} share a directory — give each its own")
+    return sites
+
+def sync_clones(sites):
+    """Reset each clone the sites publish from to origin/main, once, while
+    holding every lock in it (see generate.sync_clone). Returns (the paths
+    that changed, {site name: why} for sites whose clone refused to sync)."""
+    clones = {}
+    for name, cfg in sites:
+        try:
+            top = publish.git(cfg.repo_dir, 'rev-parse', '--show-toplevel')
+        except publish.PublishError:
+            continue                   # not a clone: the publish reports it
+        clones.setdefault(top, []).append((name, cfg))
+    changed, refused = [], {}
+    for top, group in clones.items():
+        locks = [generate.try_lock(cfg) for _, cfg in group]
+        try:
+            if None in locks:
+                print(f"⚠️ Not syncing {top} — a generator is running in it")
+                continue
+            changed += generate.sync_clone(*(cfg for _, cfg in group))
+        except publish.PublishError as e:
+            refused.update((name, f"Can't sync {top} to origin/main — {e}") for name, _ in group)
+        finally:
+            for lock in filter(None, locks):
+                lock.close()
+    return changed, refused
+
+def warm(vault):
+    """Read and parse every note under `vault` into generate's caches."""
+    for fp in sorted(glob.glob(os.path.join(vault, 'THC', '**', '*.md'), recursive=True)):
+        try:
+            generate.parse_fm(fp)
+        except Exception:
+            pass
+
+def run_site(name, cfg, publish=False, dry_run=False, now=False):
+    """One site's generation (and publish), output captured. Never raises."""
+    t0 = time.perf_counter()
+    if not os.path.isdir(cfg.vault):
+        return {'name': name, 'ok': False, 'seconds': 0, 'log': '', 'error': f"Vault not found at {cfg.vault!r}"}
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            def once(do_publish):
+                model, regions, html, data = generate.run(cfg)
+                if do_publish:
+                    generate.publish_run(cfg, model, regions, html, data,
+                                         f"Fleet sync {cfg.today.strftime('%Y-%m-%d %H:%M')}", dry_run=dry_run, now=now)
+                return 0
+            rc = generate.run_single_flight(cfg, once, publish, request_publish=publish and not dry_run)
+        return {'name': name, 'ok': rc == 0, 'seconds': time.perf_counter() - t0, 'log': log.getvalue(), 'error': None}
+    except Exception:
+        return {'name': name, 'ok': False, 'seconds': time.perf_counter() - t0, 'log': log.getvalue(),
+                'error': traceback.format_exc()}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    ap = argparse.ArgumentParser(prog='generate.py batch', description="Generate every site in a manifest in parallel.")
+    ap.add_argument('manifest')
+    ap.add_argument('--jobs', type=int, help="worker processes (default: one per site, up to the CPU count)")
+    ap.add_argument('--publish', action='store_true', help="publish each site after generating it")
+    ap.add_argument('--dry-run', action='store_true', help="with --publish: build the commits, don't push")
+    ap.add_argument('--now', action='store_true', help="with --publish: skip coalescing")
+    a = ap.parse_args(argv)
+    sites = load_manifest(a.manifest)
+    if not sites:
+        print(f"⚠️ {a.manifest} lists no sites")
+        return 0
+    results = []
+    if a.publish and not a.dry_run:
+        changed, refused = sync_clones(sites)
+        generate.restart_if_changed(changed, ['batch', *argv])
+        # a clone that can't follow origin must not publish: fail its sites
+        results = [{'name': n, 'ok': False, 'seconds': 0, 'log': '', 'error': why} for n, why in refused.items()]
+        for r in results:
+            print(f"❌ {r['name']:<16} {r['error']}")
+        sites = [(n, cfg) for n, cfg in sites if n not in refused]
+    t0 = time.perf_counter()
+    shared = [v for v, c in Counter(os.path.abspath(cfg.vault) for _, cfg in sites).items() if c > 1 and os.path.isdir(v)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for v in shared:
+            warm(v)
+    jobs = a.jobs or min(len(sites), os.cpu_count() or 1) or 1
+    print(f"🚁 {len(sites)} site(s) on {jobs} worker(s)" + (f", {len(shared)} shared vault(s) preloaded" if shared else ""))
+    # fork, so workers inherit the warmed caches and the imported module
+    ctx = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx) as pool:
+        futures = [pool.submit(run_site, name, cfg, a.publish, a.dry_run, a.now) for name, cfg in sites]
+        for fut in as_completed(futures):
+            try:
+                r = fut.result()
+            except Exception:          # the worker itself died
+                r = {'name': sites[futures.index(fut)][0], 'ok': False, 'seconds': 0, 'log': '', 'error': traceback.format_exc()}
+            results.append(r)
+            warnings = [ln.strip() for ln in r['log'].splitlines() if ln.lstrip().startswith(('⚠️', '❌'))]
+            print(f"{'✅' if r['ok'] else '❌'} {r['name']:<16} {r['seconds']:6.2f} s"
+                  + (f"  {len(warnings)} warning(s)" if warnings else ""))
+            for w in warnings:
+                print(f"   {w}")
+            if r['error']:
+                print('   ' + r['error'].rstrip().replace('\n', '\n   '))
+    wall = time.perf_counter() - t0
+    failed = [r['name'] for r in results if not r['ok']]
+    print(f"\n⏱️  {len(sites)} site(s) in {wall:.2f} s (slowest {max(r['seconds'] for r in results):.2f} s, "
+          f"sum {sum(r['seconds'] for r in results):.2f} s)"
+          + (f" — failed: {', '.join(sorted(failed))}" if failed else ""))
+    return 1 if failed else 0
+
+if __name__ == "__main__": sys.exit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Differential harness: generate.py vs generate_sandbox.py.
+
+Runs both generators against the same vault with the same frozen clock and
+the same index.html template, then compares every generated region of the
+result semantically (fleet records by registration, notices as JSON, HTML
+regions element by element, whitespace ignored) and prints per-stage timing
+side by side. A sandbox prototype is promotable only when every region is
+identical and it is measurably faster — the exit status says which.
+
+Usage:
+    python3 compare_sandbox.py [--vault DIR] [--at 2026-10-19T09:00] [--repeat 5] [--warm]
+"""
+import os, re, sys, io, json, time, shutil, difflib, argparse, tempfile, contextlib
+from datetime import datetime
+from html.parser import HTMLParser
+from zoneinfo import ZoneInfo
+
+import generate
+import generate_sandbox
+
+# Needs to beat production by this much in total to count as "measurably faster"
+MIN_SPEEDUP = 0.05
+
+REGIONS = {
+    'fleet':          (r'const fleet = \[(.*?)\];', 'fleet'),
+    'notices':        (r'const notices = (\[.*?\]);', 'json'),
+    'flights':        (r'<!-- FLIGHTS_START -->(.*?)<!-- FLIGHTS_END -->', 'html'),
+    'currency':       (r'<!-- CURRENCY_START -->(.*?)<!-- CURRENCY_END -->', 'html'),
+    'timeline':       (r'<!-- TIMELINE_START -->(.*?)<!-- TIMELINE_END -->', 'html'),
+    'title':          (r'<title>(THC Fleet Map.*?)</title>', 'text'),
+    'last_updated':   (r'<!-- LAST_UPDATED -->(.*?)<!-- /LAST_UPDATED -->', 'text'),
+    'last_updated2':  (r'<!-- LAST_UPDATED2 -->(.*?)<!-- /LAST_UPDATED2 -->', 'text'),
+    'report_period':  (r'<!-- REPORT_PERIOD -->(.*?)<!-- /REPORT_PERIOD -->', 'text'),
+}
+
+def run_staged(mod, cfg, warm=False):
+    """Run `mod`'s pipeline one stage at a time. Returns (html, {stage: s})."""
+    t = {}
+    def timed(stage, fn, *a):
+        t0 = time.perf_counter()
+        r = fn(*a)
+        t[stage] = time.perf_counter() - t0
+        return r
+    if not warm:
+        for cache in ('_READ_CACHE', '_FM_CACHE'):
+            getattr(mod, cache, {}).clear()
+    cfg.tick()
+    with contextlib.redirect_stdout(io.StringIO()):
+        h = timed('load_helis', mod.load_helis, cfg)
+        fl = timed('load_flights', mod.load_flights, cfg)
+        c = timed('load_currency', mod.load_currency, cfg)
+        m = timed('load_missions', mod.load_missions, cfg)
+        if hasattr(mod, 'scrub_model'):
+            timed('scrub', mod.scrub_model, {'helis': h, 'missions': m})
+        regions = [timed('build_fleet_js', mod.build_fleet_js, h, fl[1], fl[2]),
+                   timed('build_flights_html', mod.build_flights_html, cfg),
+                   timed('build_currency_html', mod.build_currency_html, cfg, c),
+                   timed('build_timeline', mod.build_timeline, cfg, m)]
+        if hasattr(mod, 'load_notices'):
+            regions.append(mod.build_notices_js(timed('load_notices', mod.load_notices, cfg)))
+        if hasattr(mod, 'get_report_period'):
+            regions.append(timed('get_report_period', mod.get_report_period, cfg, fl[3]))
+        html = timed('update', mod.update, cfg, open(cfg.html_file).read(), *regions)
+    return html, t
+
+class _Elements(HTMLParser):
+    """Flatten HTML into one normalized line per start tag / text run."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+    def handle_starttag(self, tag, attrs):
+        self.out.append(f"<{tag} " + ' '.join(f'{k}="{" ".join((v or "").split())}"' for k, v in sorted(attrs)) + ">")
+    def handle_data(self, data):
+        if data.strip():
+            self.out.append(' '.join(data.split()))
+    def handle_comment(self, data):
+        if data.strip():
+            self.out.append(f"<!-- {data.strip()} -->")
+
+def _fleet_records(src):
+    recs = {}
+    for ln in re.findall(r'\{(.*?)\},?\s*$', src, re.M):
+        d = dict(re.findall(r'(\w+): "((?:[^"\\]|\\.)*)"', ln))
+        recs[d.get('reg', ln)] = d
+    return recs
+
+def compare_region(kind, a, b):
+    """List of human-readable differences between two region bodies."""
+    if kind == 'fleet':
+        ra, rb = _fleet_records(a), _fleet_records(b)
+        out = [f"{r}: only in generate.py" for r in sorted(ra.keys() - rb.keys())]
+        out += [f"{r}: only in sandbox" for r in sorted(rb.keys() - ra.keys())]
+        for r in sorted(ra.keys() & rb.keys()):
+            for k in sorted(ra[r].keys() | rb[r].keys()):
+                if ra[r].get(k) != rb[r].get(k):
+                    out.append(f"{r}.{k}: {ra[r].get(k)!r} → {rb[r].get(k)!r}")
+        return out
+    if kind == 'json':
+        return [] if json.loads(a) == json.loads(b) else [f"{a[:80]} → {b[:80]}"]
+    if kind == 'html':
+        pa, pb = _Elements(), _Elements()
+        pa.feed(a), pb.feed(b)
+        return [ln for ln in difflib.unified_diff(pa.out, pb.out, 'generate.py', 'sandbox', n=0, lineterm='')
+                if ln[:1] in '+-' and ln[:3] not in ('+++', '---')]
+    return [] if ' '.join(a.split()) == ' '.join(b.split()) else [f"{a.strip()!r} → {b.strip()!r}"]
+
+def compare_html(prod, sand):
+    """{region: [differences]} — None where a region is missing from one side."""
+    result = {}
+    for name, (pat, kind) in REGIONS.items():
+        ma, mb = re.search(pat, prod, re.S), re.search(pat, sand, re.S)
+        if not ma or not mb:
+            result[name] = None if (ma or mb) else []
+            continue
+        result[name] = compare_region(kind, ma.group(1), mb.group(1))
+    return result
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compare generate_sandbox.py against generate.py.")
+    ap.add_argument('--vault', default=generate.resolve_vault(), help="fixture vault (default: $THC_VAULT / the live vault)")
+    ap.add_argument('--at', default=None, help="frozen Riyadh time, ISO format (default: now)")
+    ap.add_argument('--template', default=generate.HTML_FILE, help="index.html to render into (never modified)")
+    ap.add_argument('--repeat', type=int, default=5, help="timing runs per generator (best is reported)")
+    ap.add_argument('--warm', action='store_true', help="keep parse caches between timing runs")
+    ap.add_argument('--show', type=int, default=8, help="differences printed per region")
+    a = ap.parse_args(argv)
+    tz = ZoneInfo("Asia/Riyadh")
+    at = datetime.fromisoformat(a.at).replace(tzinfo=tz) if a.at else datetime.now(tz)
+    clock = lambda: at
+
+    tmp = tempfile.mkdtemp(prefix="fleetmap-compare-")
+    try:
+        outs, times = {}, {}
+        for label, mod in (('generate.py', generate), ('sandbox', generate_sandbox)):
+            html_file = os.path.join(tmp, f"{label}.html")
+            best = {}
+            for _ in range(max(a.repeat, 1)):
+                shutil.copy(a.template, html_file)
+                cfg = generate.Config(vault=a.vault, html_file=html_file, clock=clock)
+                outs[label], t = run_staged(mod, cfg, a.warm)
+                for k, v in t.items():
+                    best[k] = min(best.get(k, v), v)
+            times[label] = best
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"\n🔬 generate.py vs generate_sandbox.py\n   vault {a.vault}\n   frozen at {at.strftime('%Y-%m-%d %H:%M')}\n")
+    identical = True
+    for name, diffs in compare_html(outs['generate.py'], outs['sandbox']).items():
+        if diffs is None:
+            identical = False
+            print(f"❌ {name}: missing from {'sandbox' if re.search(REGIONS[name][0], outs['generate.py'], re.S) else 'generate.py'}")
+        elif diffs:
+            identical = False
+            print(f"❌ {name}: {len(diffs)} difference(s)")
+            for d in diffs[:a.show]:
+                print(f"     {d}")
+        else:
+            print(f"✅ {name}")
+
+    print(f"\n⏱️  best of {a.repeat}{' (warm)' if a.warm else ''}, ms")
+    print(f"   {'stage':<22}{'generate.py':>12}{'sandbox':>12}{'Δ':>9}")
+    stages = list(dict.fromkeys([*times['generate.py'], *times['sandbox']]))
+    for st in stages + ['total']:
+        p = sum(times['generate.py'].values()) if st == 'total' else times['generate.py'].get(st)
+        s = sum(times['sandbox'].values()) if st == 'total' else times['sandbox'].get(st)
+        fmt = lambda x: f"{x * 1000:12.2f}" if x is not None else f"{'—':>12}"
+        delta = f"{(s - p) / p * 100:+8.0f}%" if p and s is not None else f"{'':>9}"
+        print(f"   {st:<22}{fmt(p)}{fmt(s)}{delta}")
+
+    p_total, s_total = sum(times['generate.py'].values()), sum(times['sandbox'].values())
+    faster = s_total <= p_total * (1 - MIN_SPEEDUP)
+    if identical and faster:
+        print(f"\n✅ Promotable: identical output, {(1 - s_total / p_total) * 100:.0f}% faster")
+        return 0
+    why = ([] if identical else ["output differs"]) + ([] if faster else [f"not ≥{MIN_SPEEDUP:.0%} faster"])
+    print(f"\n❌ Not promotable: {', '.join(why)}")
+    return 1
+
+if __name__ == "__main__": sys.exit(main())
@@ -20,94 +20,34 @@ log() {
 }
 
 # Loud failures. A silently-failing publisher is the whole reason this file
-# was rewritten — see sync_to_origin() below.
+# was rewritten — see regenerate() below.
 alert() {
     log "$1"
     /usr/bin/curl -s -m 10 -H "Title: THC fleet-map ⚠️" -H "Priority: high" \
         -d "$1" "$NTFY" >/dev/null 2>&1
 }
 
-# Bring this clone in line with origin BEFORE regenerating.
-#
-# index.html is GENERATED output, so we never merge or rebase it — a history of
-# auto-commits conflicts on essentially every one, and "resolving" it means hand-
-# merging a file we can rebuild in one command. Origin is truth; we rebuild from
-# the vault.
-#
-# Without this, a single push from anywhere else (a MacBook session, an agent
-# worktree) leaves this clone permanently diverged: every push is rejected while
-# the watcher keeps committing locally. That ran undetected 2026-07-31 → 2026-08-03,
-# reaching 39 ahead / 8 behind. The live map looked fine throughout because a
-# second writer was publishing — which is exactly why nobody noticed.
-sync_to_origin() {
-    if ! git fetch --quiet origin 2>>"$LOG"; then
-        log "⚠️ git fetch failed — skipping this cycle, will retry on next change"
-        return 1
-    fi
-
-    local ahead nongen
-    ahead=$(git rev-list --count origin/main..HEAD 2>/dev/null || echo 0)
-    if [ "$ahead" -gt 0 ]; then
-        # Never discard anything that isn't generated output.
-        nongen=$(git diff --name-only origin/main...HEAD 2>/dev/null | grep -v '^index\.html$')
-        if [ -n "$nongen" ]; then
-            alert "fleet-map: $ahead local commit(s) on Po-Pro touch non-generated files — NOT resetting, resolve by hand: $(printf '%s' "$nongen" | tr '\n' ' ')"
-            return 1
-        fi
-        log "♻️ Discarding $ahead local-only commit(s) (generated index.html only) — resetting to origin/main"
-    fi
-
-    # -B also recovers a detached HEAD (e.g. an abandoned rebase)
-    if ! git checkout -qB main origin/main 2>>"$LOG"; then
-        alert "fleet-map: could not reset to origin/main on Po-Pro"
-        return 1
-    fi
-    return 0
-}
-
+# Publishing goes through publish.py (via generate.py --publish): the commit is
+# built from the generated bytes on top of a freshly fetched origin/main and
+# pushed with a lease, retrying on a race. Nothing is ever committed to this
+# clone's own branch, so it can no longer drift into divergence — the failure
+# that ran undetected 2026-07-31 → 2026-08-03, reaching 39 ahead / 8 behind,
+# while a second writer kept the live map looking fine. The old
+# sync_to_origin() fetch + reset step moved into generate.py --publish, which
+# resets this clone to origin/main before generating, so templates and the
+# generator itself stay origin's. A clone holding hand changes is not reset;
+# the run then exits non-zero without publishing, and the alert below fires.
 regenerate() {
     log "🔄 Regenerating fleet map..."
     cd "$FLEET_REPO" || { log "❌ Cannot cd to $FLEET_REPO"; return 1; }
 
-    sync_to_origin || return 1
-
-    python3 generate.py >> "$LOG" 2>&1
+    python3 generate.py --publish -m "Auto-update fleet map (vault change detected)" >> "$LOG" 2>&1
     rc=$?
     if [ "$rc" -ne 0 ]; then
-        log "❌ generate.py failed (exit $rc)"
-        return 1
-    fi
-    log "✅ generate.py succeeded"
-
-    # Skip the publish when the ONLY change is the "Last updated" stamp —
-    # generate.py rewrites it every run, so a vault touch that changed nothing
-    # the map shows still cost a full Pages deploy. See fleetpush.sh (2026-08-06).
-    if ! git diff --quiet -- index.html; then
-        substantive=$(git diff -U0 -- index.html \
-            | grep -E '^[+-]' | grep -vE '^(\+\+\+|---)' \
-            | grep -vE 'LAST_UPDATED' || true)
-        if [ -z "$substantive" ]; then
-            log "⏭️ Only the 'Last updated' stamp changed — nothing to publish"
-            git checkout -- index.html
-            return 0
-        fi
-    fi
-
-    # Only the generated artifact — `git add -A` is how a .claude/worktrees
-    # snapshot got committed once already (4c50975).
-    git add index.html >> "$LOG" 2>&1
-    if git diff --cached --quiet; then
-        log "ℹ️ No changes to commit"
-        return 0
-    fi
-
-    git commit -m "Auto-update fleet map (vault change detected)" >> "$LOG" 2>&1
-    if git push >> "$LOG" 2>&1; then
-        log "✅ Pushed to GitHub"
-    else
-        alert "fleet-map: git push FAILED on Po-Pro — the live map is STALE until this is resolved"
+        alert "fleet-map: generate.py --publish FAILED on Po-Pro (exit $rc) — the live map is STALE until this is resolved"
         return 1
     fi
+    log "✅ generate.py --publish succeeded"
 }
 
 log "👀 Watching:"
@@ -13,31 +13,13 @@ exec > >(tee -a "$LOG") 2>&1
 
 echo "$(date '+%Y-%m-%d %H:%M:%S') — Fleet map generation started"
 
-# Pull first so generation runs on the latest state (a manual push from
-# another machine won't jam the scheduled run).
-git pull --rebase --autostash || { echo "⚠️  pull --rebase failed — continuing"; git rebase --abort 2>/dev/null || true; }
-
-python3 generate.py
-
-# Skip the publish when the ONLY change is the "Last updated" stamp.
-#
-# generate.py rewrites that stamp on every run, so an hourly job committed and
-# pushed even when no fleet data had moved — ~21 pushes/day, each firing a full
-# Pages deploy. That volume is what causes the "job was not acquired by Runner
-# of type hosted" failures this repo kept hitting (2026-08-06).
-if ! git diff --quiet -- index.html; then
-    substantive=$(git diff -U0 -- index.html \
-        | grep -E '^[+-]' | grep -vE '^(\+\+\+|---)' \
-        | grep -vE 'LAST_UPDATED' || true)
-    if [ -z "$substantive" ]; then
-        echo "⏭️  Only the 'Last updated' stamp changed — nothing to publish"
-        git checkout -- index.html
-    fi
-fi
-
-git add -A
-git diff --cached --quiet || git commit -m "Fleet sync $(date '+%Y-%m-%d %H:%M')"
-
-# Push; if the remote moved in the meantime, rebase once and retry.
-git push || { git pull --rebase --autostash && git push; }
+# Generate and publish in one step. publish.py builds the commit from the
+# generated bytes on top of origin/main and pushes with a lease, so there is no
+# pull --rebase to fail, no working-tree commit, and no `git add -A` sweeping in
+# whatever else is lying around. Before generating, the clone is reset to
+# origin/main; if it holds hand changes the run fails instead. A stamp-only change ("Last updated") is not
+# published — the hourly job used to push ~21 times a day with no fleet data
+# moved, each push firing a full Pages deploy and starving the hosted runners
+# ("job was not acquired by Runner of type hosted", 2026-08-06).
+python3 generate.py --publish -m "Fleet sync $(date '+%Y-%m-%d %H:%M')"
 echo "$(date '+%Y-%m-%d %H:%M:%S') ✅ Done"
@@ -1,61 +1,282 @@
 #!/usr/bin/env python3
-import os, re, glob, json, hashlib
+import os, re, io, sys, csv, glob, gzip, json, functools, itertools, math, time, fcntl, heapq, bisect, hashlib, zipfile, argparse, contextlib
+from xml.sax.saxutils import escape as xml_escape
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from typing import Callable, Optional
 from zoneinfo import ZoneInfo
+try:
+    import brotli                  # optional: brotli sizes are recorded when installed
+except ImportError:
+    brotli = None
 
-# Resolve vault path: $THC_VAULT, then OneDrive (live since the 2026-07-09
-# migration), then Obsidian's old iCloud container (stale fallback only).
-_VAULT_ENV      = os.environ.get("THC_VAULT")
-_VAULT_OBSIDIAN = os.path.expanduser("~/Library/Mobile Documents/iCloud~md~obsidian/Documents/THC Vault")
-_VAULT_ONEDRIVE = os.path.expanduser("~/Library/CloudStorage/OneDrive-TheHelicopterCompany/THC Vault")
-if _VAULT_ENV:
-    VAULT = os.path.expanduser(_VAULT_ENV)
-elif os.path.isdir(_VAULT_ONEDRIVE):
-    VAULT = _VAULT_ONEDRIVE
-else:
-    VAULT = _VAULT_OBSIDIAN
-if not os.path.isdir(VAULT):
-    raise SystemExit(
-        f"❌ Vault not found at {VAULT!r}. Set THC_VAULT to the vault path, "
-        f"or check that one of the iCloud locations exists."
-    )
-HELIS_DIR = f"{VAULT}/THC/Helicopters"
-PILOTS_DIR = f"{VAULT}/THC/Pilots"
-FLIGHTS_FILE = f"{VAULT}/THC/Helicopters/Flights Schedule.md"
-MISSIONS_DIR = f"{VAULT}/THC/Missions"
-NOTICES_FILE = f"{VAULT}/THC/Notices.md"
 HTML_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "index.html")
-# Use Saudi Arabia timezone, then strip tz for naive comparisons
-_now = datetime.now(ZoneInfo("Asia/Riyadh"))
-TODAY = datetime(_now.year, _now.month, _now.day, _now.hour, _now.minute, _now.second)
+# Registrations of the type the map covers: (prefix, lowest, highest). The
+# first prefix found in a registration decides — every TH is an H125, HC
+# only from 52 to 69.
+H125_RANGES = (('TH', 0, 999), ('HC', 52, 69))
+
+def resolve_vault():
+    """Vault path: $THC_VAULT, then OneDrive (live since the 2026-07-09
+    migration), then Obsidian's old iCloud container (stale fallback only)."""
+    env = os.environ.get("THC_VAULT")
+    onedrive = os.path.expanduser("~/Library/CloudStorage/OneDrive-TheHelicopterCompany/THC Vault")
+    if env:
+        return os.path.expanduser(env)
+    if os.path.isdir(onedrive):
+        return onedrive
+    return os.path.expanduser("~/Library/Mobile Documents/iCloud~md~obsidian/Documents/THC Vault")
+
+@dataclass
+class Config:
+    """Where a run reads and writes, and what time it thinks it is. Passed to
+    every loader and builder, so importing this module does no I/O and a
+    long-lived process (daemon, test, benchmark) can run again and again."""
+    vault: str
+    html_file: str = HTML_FILE
+    tz: str = "Asia/Riyadh"
+    clock: Optional[Callable[[], datetime]] = None   # returns an aware datetime; None = wall clock
+    metrics_dir: Optional[str] = None                # textfile-collector dir; None = state_dir
+    aircraft_type: str = "H125"                      # pilots whose note names it get a currency row
+    schedule_section: str = "## H125"                # Flights Schedule heading the fleet's flights are under
+    reg_ranges: tuple = H125_RANGES                  # see is_h125
+    _today: Optional[datetime] = field(default=None, init=False, repr=False)
+
+    @classmethod
+    def from_env(cls, **kw):
+        kw.setdefault('metrics_dir', os.environ.get("THC_METRICS_DIR"))
+        return cls(vault=resolve_vault(), **kw)
+
+    helis_dir = property(lambda self: f"{self.vault}/THC/Helicopters")
+    pilots_dir = property(lambda self: f"{self.vault}/THC/Pilots")
+    flights_file = property(lambda self: f"{self.vault}/THC/Helicopters/Flights Schedule.md")
+    missions_dir = property(lambda self: f"{self.vault}/THC/Missions")
+    notices_file = property(lambda self: f"{self.vault}/THC/Notices.md")
+    repo_dir = property(lambda self: os.path.dirname(os.path.abspath(self.html_file)))
+    state_dir = property(lambda self: os.path.join(self.repo_dir, ".cache"))
+    sites_file = property(lambda self: os.path.join(self.repo_dir, SITES_FILE))
+
+    def __post_init__(self):
+        self.metrics_dir = self.metrics_dir or self.state_dir
+
+    def tick(self):
+        """Freeze "now" for one run: Saudi Arabia time, tz stripped for naive
+        comparisons. run() calls this first so every run sees the current time."""
+        now = (self.clock or (lambda: datetime.now(ZoneInfo(self.tz))))()
+        if now.tzinfo:
+            now = now.astimezone(ZoneInfo(self.tz))
+        self._today = datetime(now.year, now.month, now.day, now.hour, now.minute, now.second)
+        return self._today
+
+    @property
+    def today(self):
+        return self._today or self.tick()
+
+# ── Run metrics ──────────────────────────────────────────────────────────────
+# Every run writes a Prometheus textfile-collector file, so staleness and
+# slowdowns show on a dashboard instead of waiting for a pilot to notice — a
+# 39-commit divergence once went unseen for three days. Counters are
+# module-level and reset by run().
+METRICS_FILE = "fleetmap.prom"
+_metrics = {}
+
+def metric(name, value=1, inc=True, **labels):
+    """Add `value` to (or with inc=False, set) a metric sample."""
+    key = (name, tuple(sorted(labels.items())))
+    _metrics[key] = _metrics.get(key, 0) + value if inc else value
+
+def parse_error(where):
+    """Count an exception a loader swallowed so a bad note can't break the map."""
+    metric('fleetmap_parse_errors_total', where=where)
+
+def timed(stage, fn, *a):
+    t0 = time.perf_counter()
+    try:
+        return fn(*a)
+    finally:
+        metric('fleetmap_stage_duration_seconds', time.perf_counter() - t0, stage=stage)
+
+_METRIC_HELP = {
+    'fleetmap_run_success': ('gauge', '1 if the last generator run completed'),
+    'fleetmap_last_run_timestamp_seconds': ('gauge', 'Unix time the last run finished'),
+    'fleetmap_run_duration_seconds': ('gauge', 'Wall time of the last run'),
+    'fleetmap_stage_duration_seconds': ('gauge', 'Wall time per pipeline stage in the last run'),
+    'fleetmap_files_read_total': ('gauge', 'Files read from disk in the last run (cache hits excluded), by source'),
+    'fleetmap_parse_errors_total': ('gauge', 'Exceptions swallowed by loaders in the last run'),
+    'fleetmap_aircraft': ('gauge', 'Aircraft on the map by status'),
+    'fleetmap_pilot_alerts': ('gauge', 'Pilots with a currency alert, by level'),
+    'fleetmap_conflicts': ('gauge', 'Current and future double bookings, by kind (aircraft / pilot)'),
+    'fleetmap_unknown_base_warnings': ('gauge', 'Aircraft at a base code not in KNOWN_BASES'),
+    'fleetmap_unknown_waypoint_warnings': ('gauge', "Route waypoints on today's flights not in KNOWN_WAYPOINTS"),
+    'fleetmap_source_newest_mtime_seconds': ('gauge', 'mtime of the newest file in each vault source'),
+    'fleetmap_source_age_seconds': ('gauge', 'Age of the newest file in each vault source'),
+    'fleetmap_page_bytes': ('gauge', 'index.html bytes per generated region, by encoding'),
+    'fleetmap_page_elements': ('gauge', 'HTML elements per generated region of index.html'),
+    'fleetmap_page_size_warnings': ('gauge', 'Regions over their size budget or growing too fast'),
+    'fleetmap_scrub_dropped_lines': ('gauge', 'Note lines withheld from the page as internal references'),
+    'fleetmap_export_files_changed': ('gauge', 'Export files whose content changed this run'),
+    'fleetmap_search_entries': ('gauge', 'Entries in the search index'),
+    'fleetmap_unreadable_files': ('gauge', 'Vault notes that could not be read, by source'),
+    'fleetmap_region_stale_seconds': ('gauge', 'Age of the last good copy a region is showing (0 = current)'),
+}
+
+def _source_of_path(fp):
+    """Vault source a note belongs to, for metric labels."""
+    if "Past Missions" in fp: return "Past Missions"
+    if fp.endswith("Flights Schedule.md"): return "Flights Schedule"
+    for src in ("Helicopters", "Pilots", "Missions"):
+        if f"/{src}/" in fp: return src
+    return os.path.splitext(os.path.basename(fp))[0]
+
+def collect_source_ages(cfg):
+    """Newest mtime per vault source — the first thing to go stale when a
+    sync stalls."""
+    now = time.time()
+    sources = {'Helicopters': cfg.helis_dir, 'Pilots': cfg.pilots_dir, 'Missions': cfg.missions_dir,
+               'Past Missions': f"{cfg.missions_dir}/Past Missions", 'Flights Schedule': cfg.flights_file,
+               'Notices': cfg.notices_file}
+    for name, path in sources.items():
+        newest = 0
+        try:
+            if os.path.isfile(path):
+                newest = os.stat(path).st_mtime
+            else:
+                for root, dirs, files in os.walk(path):
+                    if name == 'Missions':
+                        dirs[:] = []            # Past Missions is its own source
+                    for f in files:
+                        if f.endswith('.md'):
+                            newest = max(newest, os.stat(os.path.join(root, f)).st_mtime)
+        except OSError:
+            parse_error('source_age')
+        if newest:
+            metric('fleetmap_source_newest_mtime_seconds', round(newest), inc=False, source=name)
+            metric('fleetmap_source_age_seconds', round(now - newest), inc=False, source=name)
+
+def collect_model_metrics(model, currency_html):
+    fy = model['pilot_by_reg']
+    for st in ('parked', 'flying', 'maint', 'preserv'):
+        metric('fleetmap_aircraft', 0, status=st)
+    for h in model['helis']:
+        metric('fleetmap_aircraft', status='flying' if h['reg'] in fy else h['status'])
+    levels = {}
+    for lv, name in re.findall(r'class="alert (\w+)">\S+ (.+?) - ', currency_html):
+        levels.setdefault(lv, set()).add(name)
+    for lv in ('danger', 'warn', 'info'):
+        metric('fleetmap_pilot_alerts', len(levels.get(lv, ())), inc=False, level=lv)
+
+def write_metrics(cfg):
+    """Atomically write the textfile-collector file (tmp + rename, as
+    node_exporter requires)."""
+    L, seen = [], set()
+    for (name, labels), v in sorted(_metrics.items()):
+        if name not in seen:
+            seen.add(name)
+            kind, text = _METRIC_HELP.get(name, ('gauge', name))
+            L += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+        lbl = ','.join(f'{k}="{v2}"' for k, v2 in labels)
+        v = round(v, 6) if isinstance(v, float) else v
+        L.append(f"{name}{{{lbl}}} {v}" if lbl else f"{name} {v}")
+    os.makedirs(cfg.metrics_dir, exist_ok=True)
+    path = os.path.join(cfg.metrics_dir, METRICS_FILE)
+    with open(path + ".tmp", 'w') as f:
+        f.write('\n'.join(L) + '\n')
+    os.replace(path + ".tmp", path)
+
+# Parsed-file cache keyed on (path, mtime, size): repeated runs in one process
+# only re-read notes that changed since the last run.
+_READ_CACHE = {}
+
+def read_text(fp):
+    st = os.stat(fp)
+    key = (st.st_mtime_ns, st.st_size)
+    hit = _READ_CACHE.get(fp)
+    if hit and hit[0] == key:
+        return hit[1]
+    metric('fleetmap_files_read_total', source=_source_of_path(fp))   # real reads only, not cache hits
+    t = open(fp).read()
+    _READ_CACHE[fp] = (key, t)
+    return t
 
 # ── Pilot-facing note scrubbing ──────────────────────────────────────────────
 # The map is read by pilots. Nothing published to it may reference the vault
 # (wikilinks, note titles) or point at internal source paths.
+#
+# Loaders keep free-text fields raw. scrub_model() then cleans them all in
+# one pass over the loaded model. Results are memoised on the raw string,
+# because the same pilot lists, locations and clients repeat across hundreds
+# of missions and across runs. Every dropped line is recorded with the note
+# and field it came from. After rendering, find_leaks() scans the generated
+# regions for anything that still looks internal; there should be nothing.
+# Both go to .cache/scrub-audit.json. Records carry their note path as
+# '_src', which no builder publishes.
 _WIKILINK = re.compile(r'\[\[([^\]|]+?)(?:\|([^\]]+?))?\]\]')
 _INTERNAL_REF = re.compile(
     r'(OneDrive|iCloud|/Users/|\bvault\b|\.docx|\.xlsx|\.pdf\b|\.md\b|SOP source|KMZ files)', re.I)
+SCRUB_FIELDS = {'helis': ('note',), 'missions': ('pilots', 'location', 'client', 'special_notes')}
+SCRUB_AUDIT_FILE = "scrub-audit.json"
+
+@functools.lru_cache(maxsize=8192)
+def _scrub(text):
+    """(clean text, ((dropped line, matched reference), ...))"""
+    out, dropped = [], []
+    for line in text.splitlines():
+        m = _INTERNAL_REF.search(line)
+        if m:
+            dropped.append((line.strip(), m.group(1)))    # never publish a source path
+            continue
+        line = _WIKILINK.sub(lambda m: m.group(2) or m.group(1), line).strip()
+        if line:
+            out.append(line)
+    return ' | '.join(out), tuple(dropped)
 
 def scrub(text):
     """Strip vault cross-references and internal source paths from any string
     that reaches the pilot-facing map."""
-    if not text:
-        return ''
+    return _scrub(str(text))[0] if text else ''
+
+def scrub_model(model):
+    """Scrub every SCRUB_FIELDS value in place. Returns the audit: one
+    {file, field, line, reason} per dropped line."""
+    audit = []
+    for key, fields in SCRUB_FIELDS.items():
+        for rec in model[key]:
+            for f in fields:
+                clean, dropped = _scrub(str(rec[f])) if rec.get(f) else ('', ())
+                # Pilot lists end up inside a quoted data- attribute
+                rec[f] = clean.replace('"', '') if f == 'pilots' else clean
+                audit += [{'file': rec.get('_src', ''), 'field': f, 'line': ln, 'reason': f"internal reference {ref!r}"}
+                          for ln, ref in dropped]
+    metric('fleetmap_scrub_dropped_lines', len(audit), inc=False)
+    return audit
+
+def find_leaks(html):
+    """[{region, match, context}] for anything internal-looking left in the
+    generated regions of the page."""
     out = []
-    for line in str(text).splitlines():
-        if _INTERNAL_REF.search(line):
-            continue                                    # never publish a source path
-        line = _WIKILINK.sub(lambda m: m.group(2) or m.group(1), line).strip()
-        if line:
-            out.append(line)
-    return ' | '.join(out)
+    for name, pat in REGIONS.items():
+        m = re.search(pat, html, re.S)
+        body = m.group() if m else ''
+        for x in itertools.chain(_INTERNAL_REF.finditer(body), _WIKILINK.finditer(body)):
+            out.append({'region': name, 'match': x.group(), 'context': body[max(0, x.start() - 40):x.end() + 40]})
+    return out
+
+def write_scrub_audit(cfg, audit, leaks):
+    for lk in leaks:
+        print(f"❌ Internal reference {lk['match']!r} in the published {lk['region']} region")
+    os.makedirs(cfg.state_dir, exist_ok=True)
+    path = os.path.join(cfg.state_dir, SCRUB_AUDIT_FILE)
+    with open(path + ".tmp", 'w') as f:
+        json.dump({'at': cfg.today.isoformat(), 'dropped': audit, 'leaks': leaks}, f, indent=1, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
 
 def pilot_notes(d):
     """Mission note shown to pilots. FAIL-CLOSED: only `pilot_notes` is ever
     published. `special_notes` is the internal/commercial field (contract
     status, stakeholder names, CEO/steering decisions, vault cross-refs) and
-    must never reach the map — a mission with no `pilot_notes` shows no note."""
-    return scrub(d.get('pilot_notes', ''))
+    must never reach the map — a mission with no `pilot_notes` shows no note.
+    Returned raw; scrub_model() cleans it with the other free-text fields."""
+    return d.get('pilot_notes', '')
 
 # Known waypoint coordinates — must match bases dict in index.html
 KNOWN_WAYPOINTS = {
@@ -79,11 +300,27 @@ def validate_route_waypoints(route, reg=''):
         if re.match(r'[NS]\d+', wp):
             continue
         print(f"  ⚠️  Unknown waypoint '{wp}' in route for {reg}")
+        metric('fleetmap_unknown_waypoint_warnings')
+
+_FM_CACHE = {}
 
 def parse_fm(fp):
+    try:
+        t = read_text(fp)
+    except OSError:
+        metric('fleetmap_unreadable_files', source=_source_of_path(fp))
+        return {}
+    hit = _FM_CACHE.get(fp)
+    if not (hit and hit[0] is t):
+        hit = _FM_CACHE[fp] = (t, *_parse_fm_text(t))
+    if not hit[2]:
+        parse_error('parse_fm')
+    return dict(hit[1])
+
+def _parse_fm_text(t):
+    """Returns (fields, parsed cleanly)."""
     d = {}
     try:
-        t = open(fp).read()
         if not t.startswith('---'):
             # Plain "Key: Value" format (one per line)
             # Map display labels back to internal keys
@@ -112,7 +349,7 @@ def parse_fm(fp):
                     internal = label_to_key.get(k, k)
                     if v:
                         d[internal] = v
-            return d
+            return d, True
         if t.startswith('---'):
             p = t.split('---', 2)
             if len(p) >= 3:
@@ -185,8 +422,9 @@ def parse_fm(fp):
                     d[nested_key] = nested_dict
                 elif k and lst:
                     d[k] = lst[0] if len(lst)==1 else ', '.join(lst)
-    except: pass
-    return d
+    except Exception:
+        return d, False
+    return d, True
 
 # Base codes recognised by index.html's `bases` map. Keep in sync if new
 # bases are added on the JS side; helicopters with unknown codes are warned
@@ -206,9 +444,9 @@ def short_reg(r):
         return 'TBD'
     return r.replace('HZHC', 'HC').replace('HZTH', 'TH')
 
-def load_helis():
+def load_helis(cfg):
     h = []
-    for f in sorted(glob.glob(f"{HELIS_DIR}/HZHC*.md") + glob.glob(f"{HELIS_DIR}/HZTH*.md")):
+    for f in sorted(glob.glob(f"{cfg.helis_dir}/HZHC*.md") + glob.glob(f"{cfg.helis_dir}/HZTH*.md")):
         d = parse_fm(f)
         raw_status = d.get('status', 'Parked')
         st = raw_status.lower()
@@ -222,7 +460,7 @@ def load_helis():
             'status': pin_st,
             'fullStatus': raw_status,
             'mission': d.get('current_mission',''),
-            'note': scrub(d.get('notes', d.get('note',''))),
+            'note': d.get('notes', d.get('note','')),
             'ert': d.get('ert',''),
             'total_fh': d.get('total_fh',''),
             '150hr_rem_fh': d.get('150hr_rem_fh',''),
@@ -230,24 +468,23 @@ def load_helis():
             'mel_ref': d.get('mel_ref',''),
             'mel_expiry': d.get('mel_expiry',''),
             'mel_rem_days': d.get('mel_rem_days',''),
+            '_src': os.path.relpath(f, cfg.vault),
         })
     print(f"\u2705 Loaded {len(h)} helicopters")
     for x in h:
         if x['loc'] and x['loc'] not in KNOWN_BASES:
             print(f"\u26a0\ufe0f Unknown base code {x['loc']!r} for {x['reg']} (not in KNOWN_BASES)")
+            metric('fleetmap_unknown_base_warnings')
     return h
 
-def is_h125(reg_field):
-    """Check if registration is in HC52-HC69 range or TH56 (H125 only)"""
+def is_h125(reg_field, ranges=H125_RANGES):
+    """Check if registration is in the fleet's ranges (default: HC52-HC69 or
+    any TH, the H125s)"""
     s = reg_field.strip().upper().replace('-', '')
-    # TH-prefix aircraft (HZTH56, etc.) are also H125
-    m = re.search(r'TH(\d+)', s)
-    if m:
-        return True
-    m = re.search(r'HC(\d+)', s)
-    if m:
-        num = int(m.group(1))
-        return 52 <= num <= 69
+    for prefix, lo, hi in ranges:
+        m = re.search(prefix + r'(\d+)', s)
+        if m:
+            return lo <= int(m.group(1)) <= hi
     return False
 
 def normalize_reg(raw):
@@ -261,6 +498,11 @@ def normalize_reg(raw):
         return 'HZHC' + m.group(1)
     return s
 
+# A bullet's "DD MON" has no year. It is this year's date, or next year's
+# when it lies more than this far in the past (a January flight seen in
+# December). A few days back is just a flight that has flown.
+FLIGHT_ROLLOVER_DAYS = 90
+
 def parse_flight_bullet(ln, ts):
     """Parse a bullet line: - REG — MISSION, DD MON HH:MM-HH:MM, ROUTE (CREW) [FLAGS]"""
     pattern = r'^-\s*(HZ\w+)\s*[\u2014\u2013-]\s*([^,]+),\s*(\d{2}\s+\w{3})\s+(\d{2}:\d{2}-\d{2}:\d{2}),\s*([^()]+)\s*(?:\(([^)]+)\))?\s*(\[.*\])?'
@@ -271,13 +513,14 @@ def parse_flight_bullet(ln, ts):
     reg_str = reg_str.strip()
     mission = mission.strip()
     route = route.strip()
-    # Parse date — assume current year, or next year if past
+    # Parse date — assume current year, or next year if long past
     try:
         date_full = datetime.strptime(f"{date_str} {ts.year}", "%d %b %Y")
-        if date_full < ts.replace(hour=0, minute=0, second=0, microsecond=0):
+        if date_full < ts.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=FLIGHT_ROLLOVER_DAYS):
             date_full = date_full.replace(year=ts.year + 1)
         date_iso = date_full.strftime("%Y-%m-%d")
-    except:
+    except Exception:
+        parse_error('flight_date')
         date_iso = ""
     pilot = ""
     if crew:
@@ -288,18 +531,21 @@ def parse_flight_bullet(ln, ts):
         'time': time_str, 'date_short': date_str,
     }
 
-def load_flights():
-    """Parse Flights Schedule.md — handles bullet list format from ops plan pipeline."""
+def load_flights(cfg):
+    """Parse Flights Schedule.md — handles bullet list format from ops plan pipeline.
+    Returns today's flights, pilot and route by reg, every flight date seen,
+    and every dated H125 flight (the schedule, for conflict detection)."""
     fl, fy, fr = [], {}, {}  # fr = flight routes
     all_dates = []  # Track all flight dates for report period
+    sched = []
     try:
-        t = open(FLIGHTS_FILE).read()
-        ts = TODAY
-        ts_str = TODAY.strftime("%Y-%m-%d")
+        t = read_text(cfg.flights_file)
+        ts = cfg.today
+        ts_str = ts.strftime("%Y-%m-%d")
         in_h125 = False
         for ln in t.split('\n'):
             # Track H125 section
-            if ln.startswith('## H125'):
+            if ln.startswith(cfg.schedule_section):
                 in_h125 = True
                 continue
             elif ln.startswith('## Other') or (ln.startswith('## ') and not ln.startswith('### ')):
@@ -314,11 +560,16 @@ def load_flights():
             if not parsed:
                 continue
             reg_str = parsed['reg']
-            if not is_h125(reg_str):
+            if not is_h125(reg_str, cfg.reg_ranges):
+                continue
+            # Flights already flown stay out of the schedule: the report
+            # period, the exports and conflict detection are forward-looking
+            if parsed['date'] and parsed['date'] < ts_str:
                 continue
             # Track all dates for report period
             if parsed['date']:
                 all_dates.append(parsed['date'])
+                sched.append({**parsed, 'reg': normalize_reg(reg_str)})
             # Only load today's H125 flights for map display
             if parsed['date'] != ts_str:
                 continue
@@ -330,29 +581,28 @@ def load_flights():
                 validate_route_waypoints(parsed['route'], r)
     except Exception as e:
         print(f"⚠️ load_flights error: {e}")
-    load_flights._all_dates = sorted(set(all_dates)) if all_dates else []
+        parse_error('load_flights')
     print(f"✅ Loaded {len(fl)} flights")
-    return fl, fy, fr
-load_flights._all_dates = []
+    return fl, fy, fr, sorted(set(all_dates)), sched
 
-def load_currency():
+def load_currency(cfg):
     c = []
-    for pd in glob.glob(f"{PILOTS_DIR}/*/"):
+    for pd in sorted(glob.glob(f"{cfg.pilots_dir}/*/")):
         nm = os.path.basename(pd.rstrip('/'))
         pf = os.path.join(pd, f"{nm}.md")
         if not os.path.exists(pf):
             # Try case-insensitive match
-            for fn in os.listdir(pd):
+            for fn in sorted(os.listdir(pd)):
                 if fn.lower().endswith('.md') and fn.lower().replace('.md','') == nm.lower().replace('.md',''):
                     pf = os.path.join(pd, fn)
                     break
         if os.path.exists(pf):
             try:
-                t = open(pf).read()
+                t = read_text(pf)
                 # Only include H125 pilots in currency box
                 # Handle both single-line (Helicopter: H125) and YAML list (Helicopter:\n  - H125) formats
                 frontmatter = t.split('---')[1] if t.startswith('---') and t.count('---') >= 2 else ''
-                if 'H125' not in frontmatter:
+                if cfg.aircraft_type not in frontmatter:
                     continue  # Skip non-H125 pilots
                 med = rems = comp = line = cp = ""
                 for ln in t.split('\n'):
@@ -363,102 +613,273 @@ def load_currency():
                     if 'Check Pilot Renewal:' in ln: cp = ln.split(':',1)[1].strip()
                 c.append({'name': nm, 'medical': med, 'rems': rems, 'competency': comp,
                           'line_check': line, 'check_pilot': cp})
-            except: pass
-    print(f"✅ Loaded {len(c)} H125 pilot currency records")
+            except Exception: parse_error('load_currency')
+    c.sort(key=lambda x: x['name'])
+    print(f"✅ Loaded {len(c)} {cfg.aircraft_type} pilot currency records")
     return c
 
-def load_missions():
-    m = []
-    for pat in [f"{MISSIONS_DIR}/*.md", f"{MISSIONS_DIR}/Past Missions/*.md"]:
-        for f in glob.glob(pat):
+def _mission_title(fname):
+    """Timeline title: the filename (what the user sees in Obsidian), with an
+    emoji prefix by mission type."""
+    tl = fname.lower()
+    for key, emoji in (('rally', '🏁'), ('survey', '🔍'), ('skybridge', '🌉'), ('uam', '🌆'), ('tour', '🏜️'), ('film', '🎬')):
+        if key in tl:
+            return f"{emoji} {fname}"
+    return fname
+
+def _mission_helis(d):
+    """'HC54 (Film) | HC57 (EMS 1)' from a mission's frontmatter."""
+    # Canonical vault format is heli_N_reg / heli_N_role (one slot per
+    # aircraft); fall back to legacy fields.
+    heli_entries = []
+    try:
+        heli_count = int(d.get('helicopter_count', '0') or 0)
+    except (ValueError, TypeError):
+        heli_count = 0
+    # Scan max(count, 10) slots so a wrong/absent count never drops entries
+    for n in range(1, max(heli_count, 10) + 1):
+        reg = d.get(f'heli_{n}_reg')
+        role = (d.get(f'heli_{n}_role') or '').strip()
+        if not reg and not role:
+            continue  # empty slot
+        rs = short_reg(reg)
+        heli_entries.append(f"{rs} ({role})" if role else rs)
+    if heli_entries:
+        return ' | '.join(heli_entries)
+    # Legacy fallbacks: nested dict, plain string, or helicopter_main/backup
+    helis = d.get('helicopters', d.get('Helicopter', ''))
+    if isinstance(helis, dict):
+        # Old nested format: {Film: HZHC55, EMS 1: HZHC57, ...}
+        return ' | '.join(f"{short_reg(reg)} ({role})" for role, reg in helis.items())
+    if isinstance(helis, str) and helis:
+        return helis.replace('HZHC','HC').replace('HZTH','TH')
+    # Flat helicopter_main / helicopter_backup fields.
+    # Exclude helicopter_count — it is a tally, not an aircraft.
+    heli_parts = []
+    for k, v in d.items():
+        if k.startswith('helicopter_') and k != 'helicopter_count' and v:
+            role = k.replace('helicopter_', '').replace('_', ' ').strip()
+            heli_parts.append(f"{short_reg(v)} ({role})")
+    return ' | '.join(heli_parts) if heli_parts else 'TBD'
+
+def mission_files(cfg):
+    """Every mission note, Missions/ first, then Past Missions/."""
+    return [f for pat in (f"{cfg.missions_dir}/*.md", f"{cfg.missions_dir}/Past Missions/*.md")
+            for f in sorted(glob.glob(pat))
             # Skip folder notes (Missions.md is the folder note, not a mission)
-            fname = os.path.basename(f).replace('.md','')
-            if fname.lower() == 'missions':
-                continue
-            d = parse_fm(f)
-            # Use filename as title (matches what user sees in Obsidian)
-            t = fname
-            # Add emoji prefixes based on mission type
-            tl = t.lower()
-            if 'rally' in tl:
-                t = '🏁 ' + t
-            elif 'survey' in tl:
-                t = '🔍 ' + t
-            elif 'skybridge' in tl:
-                t = '🌉 ' + t
-            elif 'uam' in tl:
-                t = '🌆 ' + t
-            elif 'tour' in tl:
-                t = '🏜️ ' + t
-            elif 'film' in tl:
-                t = '🎬 ' + t
-            # Format helicopter roles. Canonical vault format is heli_N_reg /
-            # heli_N_role (one slot per aircraft); fall back to legacy fields.
-            heli_entries = []
-            try:
-                heli_count = int(d.get('helicopter_count', '0') or 0)
-            except (ValueError, TypeError):
-                heli_count = 0
-            # Scan max(count, 10) slots so a wrong/absent count never drops entries
-            for n in range(1, max(heli_count, 10) + 1):
-                reg = d.get(f'heli_{n}_reg')
-                role = (d.get(f'heli_{n}_role') or '').strip()
-                if not reg and not role:
-                    continue  # empty slot
-                rs = short_reg(reg)
-                heli_entries.append(f"{rs} ({role})" if role else rs)
-            if heli_entries:
-                heli_str = ' | '.join(heli_entries)
-            else:
-                # Legacy fallbacks: nested dict, plain string, or helicopter_main/backup
-                helis = d.get('helicopters', d.get('Helicopter', ''))
-                if isinstance(helis, dict):
-                    # Old nested format: {Film: HZHC55, EMS 1: HZHC57, ...}
-                    heli_str = ' | '.join(f"{short_reg(reg)} ({role})" for role, reg in helis.items())
-                elif isinstance(helis, str) and helis:
-                    heli_str = helis.replace('HZHC','HC').replace('HZTH','TH')
-                else:
-                    # Flat helicopter_main / helicopter_backup fields.
-                    # Exclude helicopter_count — it is a tally, not an aircraft.
-                    heli_parts = []
-                    for k, v in d.items():
-                        if k.startswith('helicopter_') and k != 'helicopter_count' and v:
-                            role = k.replace('helicopter_', '').replace('_', ' ').strip()
-                            heli_parts.append(f"{short_reg(v)} ({role})")
-                    heli_str = ' | '.join(heli_parts) if heli_parts else 'TBD'
-            # Scrub: pilot lists are sometimes written as wikilinks, which both
-            # leak vault note titles and break the data-pilots attribute quoting.
-            pilots = scrub(d.get('Pilots', '')).replace('"', '')
-            # Auto-determine status from dates
-            # complete/canceled = done or cancelled (grey)
-            # active = happening now (green)
-            # pending = future, unconfirmed (red)
-            # confirmed = future, confirmed (blue)
-            raw_status = d.get('status','pending').lower()
-            start = d.get('date','')
-            end = d.get('endDate', start)
-            if raw_status in ('canceled', 'cancelled'):
-                continue  # Skip canceled missions entirely
-            if raw_status == 'paused':
-                auto_status = 'paused'  # short-circuit — don't let date logic force 'active'
-            elif raw_status == 'complete':
+            if os.path.basename(f).replace('.md', '').lower() != 'missions']
+
+def load_missions(cfg, files=None):
+    """Missions from `files` (default: every mission note — see plan_missions
+    for the subset a run actually needs)."""
+    m = []
+    ts = cfg.today.strftime("%Y-%m-%d")
+    for f in mission_files(cfg) if files is None else files:
+        d = parse_fm(f)
+        t = _mission_title(os.path.basename(f).replace('.md', ''))
+        heli_str = _mission_helis(d)
+        # Pilot lists are sometimes written as wikilinks, which both leak
+        # vault note titles and break the data-pilots attribute quoting;
+        # scrub_model() cleans them.
+        pilots = d.get('Pilots', '')
+        # Auto-determine status from dates
+        # complete/canceled = done or cancelled (grey)
+        # active = happening now (green)
+        # pending = future, unconfirmed (red)
+        # confirmed = future, confirmed (blue)
+        raw_status = d.get('status','pending').lower()
+        start = d.get('date','')
+        end = d.get('endDate', start)
+        if raw_status in ('canceled', 'cancelled'):
+            continue  # Skip canceled missions entirely
+        if raw_status == 'paused':
+            auto_status = 'paused'  # short-circuit — don't let date logic force 'active'
+        elif raw_status == 'complete':
+            auto_status = 'complete'
+        elif start:
+            if end and end < ts:
                 auto_status = 'complete'
-            elif start:
-                ts = TODAY.strftime("%Y-%m-%d")
-                if end and end < ts:
-                    auto_status = 'complete'
-                elif start <= ts and (not end or end >= ts):
-                    auto_status = 'active'
-                else:
-                    # Future mission — use frontmatter status
-                    auto_status = raw_status if raw_status in ('confirmed', 'pending', 'potential') else 'pending'
+            elif start <= ts and (not end or end >= ts):
+                auto_status = 'active'
             else:
-                auto_status = raw_status
-            m.append({'title': t, 'date': start, 'endDate': end, 'status': auto_status, 'helicopters': heli_str, 'pilots': pilots, 'location': scrub(d.get('location','')), 'client': scrub(d.get('client', d.get('customer',''))), 'special_notes': pilot_notes(d), 'flight_hours': d.get('flight_hours','')})
-    m.sort(key=lambda x: x['date'] if x['date'] else 'zzzz')
+                # Future mission — use frontmatter status
+                auto_status = raw_status if raw_status in ('confirmed', 'pending', 'potential') else 'pending'
+        else:
+            auto_status = raw_status
+        regs = sorted({normalize_reg(r) for r in _REG_IN_TEXT.findall(heli_str)})
+        m.append({'title': t, 'date': start, 'endDate': end, 'status': auto_status, 'helicopters': heli_str, 'regs': regs, 'pilots': pilots, 'location': d.get('location',''), 'client': d.get('client', d.get('customer','')), 'special_notes': pilot_notes(d), 'flight_hours': d.get('flight_hours',''), '_src': os.path.relpath(f, cfg.vault)})
+    # Ties broken on end date then title, so same-day missions never swap
+    m.sort(key=lambda x: (x['date'] or 'zzzz', x['endDate'] or '', x['title']))
     print(f"✅ Loaded {len(m)} missions")
     return m
 
+# Mission summary index. Past Missions only grows, but a run needs just the
+# missions in the timeline window, plus every mission of a year whose
+# segment file must be rebuilt. .cache/missions-index.json keeps a summary
+# of each mission note (dates, raw status, tails) keyed on (mtime, size).
+# An archived note is opened only if it changed or its years are "hot": in
+# the window, touched by a changed, new or deleted note, or lacking a
+# segment file. Notes in Missions/ itself are always read. A year with a
+# skipped mission isn't rebuilt: its file on disk already holds exactly that
+# year's missions, and is read back so every run emits (and publishes) the
+# complete set of segments, whichever run first wrote them.
+MISSION_INDEX_FILE = "missions-index.json"
+MISSION_INDEX_FORMAT = 1
+
+def _mission_summary(f, st):
+    d = parse_fm(f)
+    start = d.get('date', '')
+    end = d.get('endDate', start)
+    years = []
+    try:
+        s = datetime.strptime(start, "%Y-%m-%d")
+        try:
+            e = datetime.strptime(end, "%Y-%m-%d")
+        except (ValueError, TypeError):
+            e = s
+        years = list(range(s.year, e.year + 1))
+    except (ValueError, TypeError):
+        pass
+    return {'key': [st.st_mtime_ns, st.st_size], 'date': start, 'endDate': end,
+            'status': d.get('status', 'pending').lower(), 'years': years,
+            'regs': sorted({normalize_reg(r) for r in _REG_IN_TEXT.findall(_mission_helis(d))}),
+            'training': _is_training({'title': _mission_title(os.path.basename(f).replace('.md', ''))})}
+
+def _on_timeline(e):
+    return e['years'] and not e['training'] and e['status'] not in ('canceled', 'cancelled')
+
+def plan_missions(cfg):
+    """Which mission notes this run must open. Returns {load: [paths],
+    index: the refreshed index, years: every year with timeline missions,
+    complete: the years whose segments can be rebuilt, skipped: count}."""
+    path = os.path.join(cfg.state_dir, MISSION_INDEX_FILE)
+    try:
+        old = json.load(open(path))
+        old = old['missions'] if old.get('format') == MISSION_INDEX_FORMAT and old.get('vault') == cfg.vault else {}
+    except (OSError, ValueError, KeyError, AttributeError):
+        old = {}
+    archive = os.path.join(cfg.missions_dir, "Past Missions")
+    index, load, hot = {}, [], set()
+    mn, mx = timeline_window(cfg.today)
+    hot.update(range(mn.year, mx.year + 1))
+    for f in mission_files(cfg):
+        rel = os.path.relpath(f, cfg.missions_dir)
+        try:
+            st = os.stat(f)
+        except OSError:
+            continue
+        e = old.get(rel)
+        if not e or e['key'] != [st.st_mtime_ns, st.st_size]:
+            hot.update(e['years'] if e else ())
+            e = _mission_summary(f, st)
+            hot.update(e['years'])
+        index[rel] = e
+    for rel in old.keys() - index.keys():
+        hot.update(old[rel]['years'])                  # deleted / moved notes
+    years = sorted({y for e in index.values() if _on_timeline(e) for y in e['years']})
+    hot.update(y for y in years if not os.path.exists(os.path.join(cfg.repo_dir, TIMELINE_DIR, f"{y}.html")))
+    cold = set()
+    for rel, e in index.items():
+        f = os.path.join(cfg.missions_dir, rel)
+        if not f.startswith(archive + os.sep):
+            load.append(f)
+        elif e['status'] in ('canceled', 'cancelled'):
+            continue                                   # never shown anyway
+        elif not e['years'] or hot.intersection(e['years']):
+            load.append(f)
+        elif _on_timeline(e):
+            cold.update(e['years'])
+    skipped = len(index) - len(load)
+    if skipped:
+        print(f"🗄️  {skipped} archived mission(s) outside the window not opened")
+    return {'load': load, 'index': index, 'years': years,
+            'complete': [y for y in years if y not in cold], 'skipped': skipped}
+
+def save_mission_index(cfg, index):
+    path = os.path.join(cfg.state_dir, MISSION_INDEX_FILE)
+    text = json.dumps({'format': MISSION_INDEX_FORMAT, 'vault': cfg.vault, 'missions': index}, sort_keys=True)
+    write_if_changed(path, text)
+
+# Conflict detection: a tail on two overlapping missions or two overlapping
+# flights, or a PIC on two overlapping flights. (A flight inside its own
+# mission's dates is not a conflict, so missions and flights are never
+# compared with each other.) Intervals are grouped per aircraft / pilot and
+# swept in start order with a heap of active end times, so each group costs
+# O((n + k) log n) for n intervals and k overlaps — the whole Past Missions
+# archive is a few milliseconds.
+_REG_IN_TEXT = re.compile(r'\b(?:HZ-?)?(?:HC|TH)-?\d+\b', re.I)
+
+def overlaps(intervals):
+    """Overlapping pairs among [(start, end, label)] (half-open)."""
+    out, active = [], []
+    for i, (s, e, lab) in enumerate(sorted(intervals)):
+        while active and active[0][0] <= s:
+            heapq.heappop(active)
+        for e2, _, s2, lab2 in active:
+            out.append((lab2, lab, s, min(e, e2)))
+        heapq.heappush(active, (e, i, s, lab))
+    return out
+
+def _day(d):
+    return datetime.strptime(d, "%Y-%m-%d")
+
+def _flight_interval(f):
+    a, b = f['time'].split('-')
+    s = _day(f['date']).replace(hour=int(a[:2]), minute=int(a[3:]))
+    e = s.replace(hour=int(b[:2]), minute=int(b[3:]))
+    return s, e if e > s else e + timedelta(days=1)
+
+def find_conflicts(missions, sched):
+    """[{kind, key, a, b, start, end}] for every double booking, and tag each
+    affected mission with m['conflicts'] for the timeline."""
+    by_reg, by_flight_reg, by_pilot, by_title = {}, {}, {}, {}
+    for m in missions:
+        if not m['date'] or m['status'] == 'paused':
+            continue
+        try:
+            s, e = _day(m['date']), _day(m['endDate'] or m['date']) + timedelta(days=1)
+        except ValueError:
+            continue  # reported by the timeline
+        by_title[m['title']] = m
+        for r in m.get('regs', ()):
+            by_reg.setdefault(r, []).append((s, e, m['title']))
+    for f in sched:
+        try:
+            s, e = _flight_interval(f)
+        except (ValueError, IndexError):
+            parse_error('flight_time')
+            continue
+        lab = f"{f['date']} {f['time']} {f['mission']}"
+        by_flight_reg.setdefault(f['reg'], []).append((s, e, lab))
+        if f['pilot'] and f['pilot'].upper() not in ('TBA', 'TBD'):
+            by_pilot.setdefault(f['pilot'], []).append((s, e, lab))
+    out = []
+    for kind, groups in (('aircraft', by_reg), ('aircraft', by_flight_reg), ('pilot', by_pilot)):
+        for key, ivs in sorted(groups.items()):
+            for a, b, s, e in overlaps(ivs):
+                out.append({'kind': kind, 'key': key, 'a': a, 'b': b, 'start': s, 'end': e})
+    for c in out:
+        who = short_reg(c['key']) if c['kind'] == 'aircraft' else c['key']
+        for t, other in ((c['a'], c['b']), (c['b'], c['a'])):
+            if t in by_title:
+                by_title[t].setdefault('conflicts', []).append(f"{who} also on {other}")
+    return out
+
+def report_conflicts(cfg, conflicts):
+    """Warn about current and future conflicts; past ones are only counted."""
+    today = cfg.today.replace(hour=0, minute=0, second=0, microsecond=0)
+    live = [c for c in conflicts if c['end'] > today]
+    for c in live:
+        who = short_reg(c['key']) if c['kind'] == 'aircraft' else c['key']
+        print(f"⚠️ {'Double-booked' if c['kind'] == 'aircraft' else 'Crew conflict'}: {who} on "
+              f"{c['a']!r} and {c['b']!r} ({c['start'].strftime('%-d %b %Y')})")
+        metric('fleetmap_conflicts', kind=c['kind'])
+    for kind in ('aircraft', 'pilot'):
+        metric('fleetmap_conflicts', 0, kind=kind)
+    if len(conflicts) > len(live):
+        print(f"ℹ️  {len(conflicts) - len(live)} past conflict(s) in the archive")
+    return live
+
 def build_fleet_js(helis, fy, fr):
     L = ["const fleet = ["]
     cnt = {'parked':0, 'flying':0, 'maint':0, 'preserv':0}
@@ -482,18 +903,27 @@ def build_fleet_js(helis, fy, fr):
     print(f"✅ Fleet: {cnt['parked']} serviceable, {cnt['flying']} flying, {cnt['maint']} maint, {cnt['preserv']} preserv")
     return '\n'.join(L)
 
-def build_flights_html():
-    """Build flights panel HTML — handles bullet list format from ops plan pipeline."""
+# The flights panel carries today and the next FLIGHTS_INLINE_DAYS - 1 days
+# inline. Every later day is a small JSON file, data/flights/<date>.json,
+# which the panel fetches a few at a time from "Show later days" (or when
+# that button scrolls into view). However far ahead the ops plan is
+# written, the page itself stays the same size.
+FLIGHTS_INLINE_DAYS = 3
+FLIGHTS_DIR = "data/flights"
+
+def flight_days(cfg):
+    """[(date YYYY-MM-DD, 'Mon 19 Oct', [(reg, info, pilot)])] for every day
+    from today on with H125 flights — handles the bullet list format from
+    the ops plan pipeline."""
     from collections import defaultdict
-    L = []
-    ts_str = TODAY.strftime("%Y-%m-%d")
+    ts = cfg.today
+    ts_str = ts.strftime("%Y-%m-%d")
     by_date = defaultdict(list)
     try:
-        t = open(FLIGHTS_FILE).read()
-        ts = TODAY
+        t = read_text(cfg.flights_file)
         in_h125 = False
         for ln in t.split('\n'):
-            if ln.startswith('## H125'):
+            if ln.startswith(cfg.schedule_section):
                 in_h125 = True
                 continue
             elif ln.startswith('## Other') or (ln.startswith('## ') and not ln.startswith('### ')):
@@ -506,32 +936,62 @@ def build_flights_html():
             parsed = parse_flight_bullet(ln, ts)
             if not parsed:
                 continue
-            if not is_h125(parsed['reg']):
+            if not is_h125(parsed['reg'], cfg.reg_ranges):
                 continue
             if parsed['date'] < ts_str:
                 continue
             by_date[parsed['date']].append(parsed)
     except Exception as e:
         print(f"⚠️ build_flights_html error: {e}")
-    if not by_date:
-        return '  <div>No flights scheduled</div>'
+        parse_error('build_flights_html')
     # Day name lookup
     DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
     MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    days = []
     for date_iso in sorted(by_date.keys()):
         dt = datetime.strptime(date_iso, "%Y-%m-%d")
-        day_name = f"{DAY_NAMES[dt.weekday()]} {dt.day} {MONTH_NAMES[dt.month - 1]}"
+        rows = [(normalize_reg(f['reg']).replace('HZHC', 'HC').replace('HZTH', 'TH'),
+                 f["route"] + " · " + f["mission"] if f["route"] else f["mission"], f["pilot"])
+                for f in sorted(by_date[date_iso], key=lambda x: (x['time'], x['reg'], x['mission']))]
+        days.append((date_iso, f"{DAY_NAMES[dt.weekday()]} {dt.day} {MONTH_NAMES[dt.month - 1]}", rows))
+    return days
+
+def _inline_until(cfg):
+    return (cfg.today + timedelta(days=FLIGHTS_INLINE_DAYS)).strftime("%Y-%m-%d")
+
+def build_flights_html(cfg, days=None):
+    """Build flights panel HTML: the inline window, then the later days as a
+    "Show later days" control."""
+    days = flight_days(cfg) if days is None else days
+    if not days:
+        return '  <div>No flights scheduled</div>'
+    ts_str, until = cfg.today.strftime("%Y-%m-%d"), _inline_until(cfg)
+    L = []
+    for date_iso, day_name, rows in days:
+        if date_iso >= until:
+            break
         L.append(f'  <h4>{day_name}</h4>')
-        for f in sorted(by_date[date_iso], key=lambda x: x['time']):
-            r = normalize_reg(f['reg']).replace('HZHC', 'HC').replace('HZTH', 'TH')
-            cl = "flight-row today" if f['date'] == ts_str else "flight-row"
-            info = f["route"] + " · " + f["mission"] if f["route"] else f["mission"]
-            L.append(f'  <div class="{cl}"><span class="reg">{r}</span><span class="info">{info}</span><span class="pilot">{f["pilot"]}</span></div>')
-    return '\n'.join(L) if L else '  <div>No flights scheduled</div>'
-
-def build_currency_html(curr):
+        cl = "flight-row today" if date_iso == ts_str else "flight-row"
+        for r, info, pilot in rows:
+            L.append(f'  <div class="{cl}"><span class="reg">{r}</span><span class="info">{info}</span><span class="pilot">{pilot}</span></div>')
+    later = [d for d, _, _ in days if d >= until]
+    if not L:
+        L.append(f'  <div>No flights in the next {FLIGHTS_INLINE_DAYS} days</div>')
+    if later:
+        L.append(f'  <div class="flights-more" data-src="{FLIGHTS_DIR}" data-days="{",".join(later)}">'
+                 f'<button type="button">Show later days ({len(later)})</button></div>')
+    return '\n'.join(L)
+
+def build_flight_day_files(cfg, days):
+    """{relpath: json} — one compact file per day after the inline window."""
+    until = _inline_until(cfg)
+    return {f"{FLIGHTS_DIR}/{d}.json": json.dumps({'label': label, 'flights': rows}, ensure_ascii=False, separators=(',', ':')) + '\n'
+            for d, label, rows in days if d >= until}
+
+def build_currency_html(cfg, curr):
     L = []
-    this_mo = TODAY.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    today = cfg.today
+    this_mo = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     this_mo_end = (this_mo + timedelta(days=32)).replace(day=1)
     next_mo = this_mo_end
     next_mo_end = (next_mo + timedelta(days=32)).replace(day=1)
@@ -553,7 +1013,7 @@ def build_currency_html(curr):
                     comp_this.append((first_name, exp.strftime("%b %Y")))
                 elif next_mo <= exp < next_mo_end:
                     comp_next.append((first_name, exp.strftime("%b %Y")))
-            except: pass
+            except Exception: parse_error('currency_competency')
     L.append('  <h4>Competency Checks</h4>')
     if comp_overdue:
         for n, d in comp_overdue:
@@ -582,21 +1042,21 @@ def build_currency_html(curr):
                 exp = datetime(exp_year, exp_month, 1)
                 exp_end = (exp + timedelta(days=32)).replace(day=1)  # First of next month
                 first_name = c['name'].split()[0] + ' ' + c['name'].split()[-1][0] if len(c['name'].split()) > 1 else c['name'].split()[0]
-                if TODAY >= exp_end:
+                if today >= exp_end:
                     # Expired (we're past the expiry month)
                     rems_issues.append((first_name, exp.strftime("%b %Y"), 'danger', 'expired'))
                 elif this_mo <= exp < this_mo_end:
                     # Expires this month
                     rems_issues.append((first_name, exp.strftime("%b %Y"), "warn", "expires"))
-            except: pass
+            except Exception: parse_error('currency_rems')
     if rems_issues:
         L.append('  <h4>30-Min REMS (6 month validity)</h4>')
-        for n,d,lv,status in sorted(rems_issues, key=lambda x: x[2]!='danger'):
+        for n,d,lv,status in sorted(rems_issues, key=lambda x: (x[2]!='danger', x[0])):
             L.append(f'  <div class="alert {lv}">{"🔴" if lv=="danger" else "⚠️"} {n} - {status} {d}</div>')
     
     # Medical - 12 months from check date
     med_issues = []
-    this_month_start = TODAY.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    this_month_start = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     this_month_end = (this_month_start + timedelta(days=32)).replace(day=1)
     for c in curr:
         m = c.get('medical','')
@@ -612,10 +1072,10 @@ def build_currency_html(curr):
                     # Due this month
                     med_issues.append((first_name, exp.strftime("%b %Y"), 'warn', 'due'))
                 # Future months: don't show
-            except: pass
+            except Exception: parse_error('currency_medical')
     if med_issues:
         L.append('  <h4>Medical Certificate (12 month validity)</h4>')
-        for n,d,lv,status in sorted(med_issues, key=lambda x: x[2]!='danger'):
+        for n,d,lv,status in sorted(med_issues, key=lambda x: (x[2]!='danger', x[0])):
             L.append(f'  <div class="alert {lv}">{"🔴" if lv=="danger" else "⚠️"} {n} - {status} {d}</div>')
 
     # Check Pilot authorisation - 24 months from last renewal (check pilots only)
@@ -631,45 +1091,143 @@ def build_currency_html(curr):
                     cp_issues.append((first_name, exp.strftime("%b %Y"), 'danger', 'overdue since'))
                 elif this_month_start <= exp < this_month_end:
                     cp_issues.append((first_name, exp.strftime("%b %Y"), 'warn', 'due'))
-            except: pass
+            except Exception: parse_error('currency_check_pilot')
     if cp_issues:
         L.append('  <h4>Check Pilot Authorisation (24 month validity)</h4>')
-        for n,d,lv,status in sorted(cp_issues, key=lambda x: x[2]!='danger'):
+        for n,d,lv,status in sorted(cp_issues, key=lambda x: (x[2]!='danger', x[0])):
             L.append(f'  <div class="alert {lv}">{"🔴" if lv=="danger" else "⚠️"} {n} - {status} {d}</div>')
 
     return '\n'.join(L)
 
+# Currency expiry index: every (expiry date, pilot, item) in one list sorted
+# by ISO date, so "who loses what between A and B" is two bisections and a
+# slice. Expiry rules match build_currency_html() above.
+CURRENCY_LOOKAHEAD_DAYS = 90
+CURRENCY_ITEMS = {          # item: (label, years valid)
+    'medical':     ('Medical', 1),
+    'rems':        ('REMS 30', None),       # 6 calendar months, see _currency_expiry
+    'competency':  ('Competency', 1),
+    'check_pilot': ('Check Pilot', 2),
+}
+
+def _short_name(name):
+    p = name.split()
+    return f"{p[0]} {p[-1][0]}" if len(p) > 1 else p[0]
+
+def _iso(d):
+    return d if isinstance(d, str) else d.strftime("%Y-%m-%d")
+
+def _currency_expiry(item, value):
+    """Last valid day for one currency field, as YYYY-MM-DD."""
+    if item == 'rems':
+        rd = datetime.strptime(value, "%Y-%m")
+        return _iso(_add_months(rd, 6) - timedelta(days=1))
+    d = datetime.strptime(value, "%Y-%m-%d")
+    years = CURRENCY_ITEMS[item][1]
+    try:
+        return _iso(d.replace(year=d.year + years))
+    except ValueError:  # 29 Feb
+        return _iso(d.replace(year=d.year + years, day=28))
+
+def build_expiry_index(curr):
+    """Sorted [(expiry YYYY-MM-DD, pilot, item)] for every dated currency item."""
+    idx = []
+    for c in curr:
+        for item in CURRENCY_ITEMS:
+            if c.get(item):
+                try:
+                    idx.append((_currency_expiry(item, c[item]), c['name'], item))
+                except Exception: parse_error('expiry_index')
+    idx.sort()
+    return idx
+
+def expiring(index, start, end, items=None):
+    """Index entries expiring between start and end inclusive (dates or
+    YYYY-MM-DD strings), optionally only for `items`."""
+    lo = bisect.bisect_left(index, (_iso(start),))
+    hi = bisect.bisect_right(index, (_iso(end), '\uffff'))
+    return [e for e in index[lo:hi] if not items or e[2] in items]
+
+def build_expiry_calendar_html(cfg, index, days=CURRENCY_LOOKAHEAD_DAYS):
+    """Forward-looking list of expiries over the next `days`, by month."""
+    today = cfg.today.replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = expiring(index, today, today + timedelta(days=days))
+    L = [f'  <h4>Expiring in the next {days} days</h4>']
+    if not rows:
+        L.append(f'  <div class="alert ok">✅ Nothing expires before {(today + timedelta(days=days)).strftime("%-d %b")}</div>')
+    month = None
+    for exp, name, item in rows:
+        d = datetime.strptime(exp, "%Y-%m-%d")
+        if d.strftime("%b %Y") != month:
+            month = d.strftime("%b %Y")
+            L.append(f'  <div class="expiry-month">{month}</div>')
+        soon = ' soon' if (d - today).days < 14 else ''
+        L.append(f'  <div class="expiry-row{soon}"><span class="date">{d.strftime("%a %-d")}</span>'
+                 f'<span class="pilot">{_short_name(name)}</span><span class="item">{CURRENCY_ITEMS[item][0]}</span></div>')
+    return '\n'.join(L)
+
+def print_expiring(index, start, end):
+    rows = expiring(index, start, end)
+    print(f"🩺 {len(rows)} currency item(s) expiring {_iso(start)} → {_iso(end)}")
+    for exp, name, item in rows:
+        print(f"   {exp}  {name:<24} {CURRENCY_ITEMS[item][0]}")
+
 
 def _is_training(m):
     return (m.get('title') or '').strip().lower().startswith('training')
 
-def build_timeline(missions):
+# The timeline shows a rolling window around today; every calendar year that
+# has missions is also written to data/timeline/<year>.html, which the page
+# fetches when you page past the window. Page weight stays flat however big
+# Past Missions gets.
+TIMELINE_MONTHS_BACK = 3
+TIMELINE_MONTHS_AHEAD = 12
+TIMELINE_DIR = "data/timeline"
+
+def _add_months(d, n):
+    y, m = divmod(d.month - 1 + n, 12)
+    return d.replace(year=d.year + y, month=m + 1, day=1)
+
+def timeline_window(today):
+    """First day of the month TIMELINE_MONTHS_BACK ago → last day of the month
+    TIMELINE_MONTHS_AHEAD on."""
+    mn = _add_months(today.replace(hour=0, minute=0, second=0, microsecond=0), -TIMELINE_MONTHS_BACK)
+    return mn, _add_months(mn, TIMELINE_MONTHS_BACK + TIMELINE_MONTHS_AHEAD + 1) - timedelta(days=1)
+
+def _timeline_missions(missions, quiet=False):
+    """Split into (TBD, dated) with parsed start/end on each dated mission."""
     skipped = sum(1 for m in missions if _is_training(m))
-    if skipped:
+    if skipped and not quiet:
         print(f"⏭️  Skipping {skipped} training mission(s) from timeline")
     missions = [m for m in missions if not _is_training(m)]
     tbd = [m for m in missions if not m['date']]
     dated = [m for m in missions if m['date']]
-    if not dated: return "<!-- No missions -->"
-    
+
     def pdt(d):
         try: return datetime.strptime(d, "%Y-%m-%d")
         except Exception as e:
-            print(f"⚠️ Bad mission date {d!r}: {e}")
+            if not quiet:
+                print(f"⚠️ Bad mission date {d!r}: {e}")
+                parse_error('mission_date')
             return None
-    
+
     for m in dated: m['s'], m['e'] = pdt(m['date']), pdt(m['endDate']) or pdt(m['date'])
     dated = [m for m in dated if m['s']]
-    dated.sort(key=lambda x: x['s'])
-    
-    # Jan-Dec of current year
-    yr = TODAY.year
-    mn, mx = datetime(yr,1,1), datetime(yr,12,31)
+    dated.sort(key=_mission_order)
+    return tbd, dated
+
+def _mission_order(m):
+    return m['s'], m['e'], m['title']
+
+def _timeline_years(dated):
+    return sorted({y for m in dated for y in range(m['s'].year, m['e'].year + 1)})
+
+def _timeline_body(today, dated, mn, mx):
+    """The <div class="timeline-body"> for missions overlapping mn..mx, with
+    a today marker if `today` falls in it (None: no marker)."""
     td = (mx-mn).days
-    
-    # Filter to only missions that overlap with 2026
     dated = [m for m in dated if m['e'] >= mn and m['s'] <= mx]
-    
+
     def pos(s,e): 
         s_clamped = max(s, mn)
         e_clamped = min(e, mx)
@@ -701,16 +1259,6 @@ def build_timeline(missions):
     above = [lanes[i] for i in [0, 2, 4] if lanes[i]]
     below = [lanes[i] for i in [1, 3, 5] if lanes[i]]
     
-    L = ['    <div class="timeline-wrapper">']
-    if tbd:
-        L.append('    <div class="tbd-sidebar">')
-        L.append('      <div class="tbd-header">📋 Dates TBD</div>')
-        for m in tbd:
-            safe_notes = m.get("special_notes","").replace('"','&quot;')
-            safe_fh = m.get("flight_hours","")
-            L.append(f'      <div class="tbd-item" role="button" tabindex="0" aria-label="{m["title"]} — dates TBD" data-name="{m["title"]}" data-status="pending" data-dates="TBD" data-aircraft="{m.get("helicopters","TBD")}" data-pilots="{m.get("pilots","TBD")}" data-location="{m.get("location","")}" data-client="{m.get("client","")}" data-notes="{safe_notes}" data-flight-hours="{safe_fh}" onclick="showEventPopup(this,event)" onkeydown="if(event.key===\'Enter\'||event.key===\' \'){{event.preventDefault();showEventPopup(this,event);}}">\n        {m["title"]}\n      </div>')
-        L.append('    </div>')
-    
     def bar(m):
         l,w = pos(m['s'],m['e'])
         t,st,dt = m['title'], m['status'], fdt(m['s'],m['e'])
@@ -720,23 +1268,27 @@ def build_timeline(missions):
         loc,cli = m.get('location',''), m.get('client','')
         notes = m.get('special_notes','').replace('"','&quot;')
         fh = m.get('flight_hours','')
-        return f'          <div class="event-bar {st} {sh}" role="button" tabindex="0" aria-label="{t}, {dt}, status {st}" style="left:{l}%;width:{w}%;" data-name="{t}" data-status="{st}" data-dates="{dt}" data-aircraft="{h}" data-pilots="{p}" data-location="{loc}" data-client="{cli}" data-notes="{notes}" data-flight-hours="{fh}" onclick="showEventPopup(this,event)" onkeydown="if(event.key===\'Enter\'||event.key===\' \'){{event.preventDefault();showEventPopup(this,event);}}" title="{t} ({dt})">\n            <span class="event-title">{dp}</span>' + (f'\n            <span class="event-dates">{dt}</span>' if not sh else '') + '\n          </div>'
+        cf = '; '.join(m.get('conflicts', ())).replace('"','&quot;')
+        return f'          <div class="event-bar {st} {sh}' + (' conflict' if cf else '') + f'" role="button" tabindex="0" aria-label="{t}, {dt}, status {st}" style="left:{l}%;width:{w}%;" data-name="{t}" data-status="{st}" data-dates="{dt}" data-aircraft="{h}" data-pilots="{p}" data-location="{loc}" data-client="{cli}" data-notes="{notes}" data-flight-hours="{fh}"' + (f' data-conflicts="{cf}"' if cf else '') + f' onclick="showEventPopup(this,event)" onkeydown="if(event.key===\'Enter\'||event.key===\' \'){{event.preventDefault();showEventPopup(this,event);}}" title="{t} ({dt})' + (f' — ⚠️ {cf}' if cf else '') + f'">\n            <span class="event-title">{dp}</span>' + (f'\n            <span class="event-dates">{dt}</span>' if not sh else '') + '\n          </div>'
     
-    L.append('    <div class="timeline-body">')
+    L = ['    <div class="timeline-body">']
     L.append('      <div class="lanes-above">')
     for lane in reversed(above):
         L.append('        <div class="lane">')
-        for m in sorted(lane, key=lambda x: x['s']): L.append(bar(m))
+        for m in sorted(lane, key=_mission_order): L.append(bar(m))
         L.append('        </div>')
     L.append('      </div>')
     L.append('      <div class="timeline-axis">')
     L.append('        <div class="axis-line"></div>')
     
-    # Month ticks (larger) with labels
-    for month in range(1, 13):
-        d = datetime(yr, month, 1)
+    # Month ticks (larger) with labels; the year is shown on January and on
+    # the first tick so a window spanning two years reads unambiguously
+    d = mn.replace(day=1)
+    while d <= mx:
         pct = round(((d-mn).days/td)*100,1)
-        L.append(f'        <div class="month-tick" style="left:{pct}%;"><span class="tick-label">{d.strftime("%b")}</span></div>')
+        label = d.strftime("%b %y") if d.month == 1 or d == mn else d.strftime("%b")
+        L.append(f'        <div class="month-tick" style="left:{pct}%;"><span class="tick-label">{label}</span></div>')
+        d = _add_months(d, 1)
     
     # Week ticks (smaller) - every Monday
     c = mn
@@ -746,34 +1298,73 @@ def build_timeline(missions):
             L.append(f'        <div class="week-tick" style="left:{pct}%;"></div>')
         c += timedelta(days=1)
     
-    if mn <= TODAY <= mx: 
-        L.append(f'        <div class="today-marker" style="left:{round(((TODAY-mn).days/td)*100,1)}%;"></div>')
+    if today and mn <= today <= mx:
+        L.append(f'        <div class="today-marker" style="left:{round(((today-mn).days/td)*100,1)}%;"></div>')
     
     L.append('      </div>')
     L.append('      <div class="lanes-below">')
     for lane in below:
         L.append('        <div class="lane">')
-        for m in sorted(lane, key=lambda x: x['s']): L.append(bar(m))
+        for m in sorted(lane, key=_mission_order): L.append(bar(m))
         L.append('        </div>')
     L.append('      </div>')
     L.append('    </div>')
+    return L
+
+def build_timeline(cfg, missions, years=None):
+    """`years`: every year with missions, when `missions` is only the subset
+    plan_missions chose to open."""
+    tbd, dated = _timeline_missions(missions)
+    if not dated: return "<!-- No missions -->"
+    mn, mx = timeline_window(cfg.today)
+    years = ','.join(map(str, _timeline_years(dated) if years is None else years))
+    # Years the page's ◀/▶ open first: the window's partly-shown end years
+    prev_yr = mn.year if mn.month > 1 else mn.year - 1
+    next_yr = mx.year if mx.month < 12 else mx.year + 1
+    L = [f'    <div class="timeline-wrapper" data-range="{mn.strftime("%b %Y")} – {mx.strftime("%b %Y")}" data-years="{years}" data-prev="{prev_yr}" data-next="{next_yr}" data-segments="{TIMELINE_DIR}">']
+    if tbd:
+        L.append('    <div class="tbd-sidebar">')
+        L.append('      <div class="tbd-header">📋 Dates TBD</div>')
+        for m in tbd:
+            safe_notes = m.get("special_notes","").replace('"','&quot;')
+            safe_fh = m.get("flight_hours","")
+            L.append(f'      <div class="tbd-item" role="button" tabindex="0" aria-label="{m["title"]} — dates TBD" data-name="{m["title"]}" data-status="pending" data-dates="TBD" data-aircraft="{m.get("helicopters","TBD")}" data-pilots="{m.get("pilots","TBD")}" data-location="{m.get("location","")}" data-client="{m.get("client","")}" data-notes="{safe_notes}" data-flight-hours="{safe_fh}" onclick="showEventPopup(this,event)" onkeydown="if(event.key===\'Enter\'||event.key===\' \'){{event.preventDefault();showEventPopup(this,event);}}">\n        {m["title"]}\n      </div>')
+        L.append('    </div>')
+    L += _timeline_body(cfg.today, dated, mn, mx)
     L.append('    </div>')
     return '\n'.join(L)
 
-def get_report_period():
+def build_timeline_segments(cfg, missions, years=None, keep=()):
+    """{relpath: html} — one Jan–Dec timeline body per year with missions
+    (only `years`, if given: the ones all of whose missions were loaded),
+    plus the segment on disk for each year in `keep` not rebuilt."""
+    _, dated = _timeline_missions(missions, quiet=True)
+    # No today marker: it would change the current year's file every day. The
+    # page adds it when it loads the segment.
+    out = {f"{TIMELINE_DIR}/{y}.html": '\n'.join(_timeline_body(None, dated, datetime(y,1,1), datetime(y,12,31))) + '\n'
+           for y in _timeline_years(dated) if years is None or y in years}
+    for y in keep:
+        rel = f"{TIMELINE_DIR}/{y}.html"
+        if rel not in out:
+            try:
+                out[rel] = read_text(os.path.join(cfg.repo_dir, rel))
+            except OSError:
+                pass
+    return out
+
+def get_report_period(cfg, dates):
     """Auto-generate report period from flight dates, or read from frontmatter."""
     # Try frontmatter first
     try:
-        t = open(FLIGHTS_FILE).read()
+        t = read_text(cfg.flights_file)
         for ln in t.split('\n'):
             if ln.strip().startswith('report_period:'):
                 val = ln.split(':', 1)[1].strip()
                 if val:
                     return val
     except Exception as e:
-        print(f"⚠️ Could not read report_period from {FLIGHTS_FILE}: {e}")
+        print(f"⚠️ Could not read report_period from {cfg.flights_file}: {e}")
     # Auto-generate from parsed flight dates
-    dates = load_flights._all_dates
     if dates:
         try:
             first = datetime.strptime(dates[0], "%Y-%m-%d")
@@ -781,7 +1372,8 @@ def get_report_period():
             return f"{first.strftime('%-d %b')} – {last.strftime('%-d %b %Y')}"
         except Exception as e:
             print(f"⚠️ Could not parse flight date range {dates[0]!r}..{dates[-1]!r}: {e}")
-    return TODAY.strftime("%-d %b %Y")
+    # Not today's date: that would make an otherwise unchanged page differ daily
+    return "No flights scheduled"
 
 def _strip_md_links(s):
     """Obsidian auto-links dates and note names inside Notices.md bullets.
@@ -792,14 +1384,14 @@ def _strip_md_links(s):
     s = re.sub(r'\[([^\]]+)\]\([^)]*\)', r'\1', s)         # [text](url)      -> text
     return s
 
-def load_notices():
+def load_notices(cfg):
     """DFO notices from THC/Notices.md — bullets '- YYYY-MM-DD | message'
     under the '## Active' heading only. Wiki/markdown links are stripped to
     display text first. Each notice gets a stable id (hash of date+text) so
     a browser can remember which ones were dismissed; identical bullets
     (e.g. an auto-linked duplicate of a plain one) collapse to one."""
     try:
-        text = open(NOTICES_FILE).read()
+        text = read_text(cfg.notices_file)
     except OSError:
         return []
     m = re.search(r'^## Active\s*$(.*?)(?=^## |\Z)', text, re.M | re.S)
@@ -823,29 +1415,1347 @@ def load_notices():
 def build_notices_js(notices):
     return "const notices = " + json.dumps(notices, ensure_ascii=False) + ";"
 
-def update(html, fleet, flights, curr, timeline, notices_js):
+# Sites layer for stadiums.html. The points live in sites.json; at build time
+# they are bucketed into a Web Mercator pixel grid at every zoom up to
+# SITES_CLUSTER_MAX_ZOOM, so the page draws one marker per occupied cell (a
+# few dozen at most in any viewport) instead of one per point, and only
+# switches to individual points once zoomed in past that.
+SITES_FILE = "sites.json"
+SITES_PAGE = "stadiums.html"
+SITES_MIN_ZOOM = 3
+SITES_CLUSTER_MAX_ZOOM = 12
+SITES_CELL_PX = 60
+
+def _mercator_px(lat, lng, z):
+    scale = 256 * 2 ** z
+    s = math.sin(math.radians(max(min(lat, 85.05), -85.05)))
+    return (lng + 180) / 360 * scale, (0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)) * scale
+
+def cluster_sites(points, cell=SITES_CELL_PX):
+    """{zoom: [[lat, lng, count, s, w, n, e] or point index, ...]} for
+    SITES_MIN_ZOOM..SITES_CLUSTER_MAX_ZOOM. A cell holding a single point is
+    just that point's index, so the page draws it as itself."""
+    out = {}
+    for z in range(SITES_MIN_ZOOM, SITES_CLUSTER_MAX_ZOOM + 1):
+        cells = {}
+        for i, p in enumerate(points):
+            x, y = _mercator_px(p['lat'], p['lng'], z)
+            cells.setdefault((int(x // cell), int(y // cell)), []).append(i)
+        out[z] = []
+        for key in sorted(cells):
+            mem = cells[key]
+            if len(mem) == 1:
+                out[z].append(mem[0])
+                continue
+            la, ln = [points[i]['lat'] for i in mem], [points[i]['lng'] for i in mem]
+            out[z].append([round(sum(la) / len(mem), 5), round(sum(ln) / len(mem), 5), len(mem),
+                           min(la), min(ln), max(la), max(ln)])
+    return out
+
+def load_sites(cfg):
+    """sites.json, with malformed points dropped. None if there is no file."""
+    if not os.path.exists(cfg.sites_file):
+        return None
+    try:
+        layer = json.loads(read_text(cfg.sites_file))
+    except (OSError, ValueError) as e:
+        print(f"⚠️ {SITES_FILE}: {e}")
+        parse_error('load_sites')
+        return None
+    pts = []
+    for p in layer.get('points', []):
+        try:
+            pts.append({**p, 'lat': float(p['lat']), 'lng': float(p['lng'])})
+        except (KeyError, TypeError, ValueError):
+            print(f"⚠️ {SITES_FILE}: skipping point without lat/lng: {p.get('name', p)!r}")
+            parse_error('load_sites')
+    layer['points'] = pts
+    print(f"✅ Loaded {len(pts)} sites")
+    return layer
+
+def build_sites_js(layer):
+    clusters = cluster_sites(layer['points'])
+    meta = {k: v for k, v in layer.items() if k != 'points'}
+    return '\n'.join([
+        f"const siteLayer = {json.dumps(meta, ensure_ascii=False)};",
+        "const sites = [",
+        *(f"  {json.dumps(p, ensure_ascii=False)}," for p in layer['points']),
+        "];",
+        f"const siteClusterZoom = [{SITES_MIN_ZOOM}, {SITES_CLUSTER_MAX_ZOOM}];",
+        "const siteClusters = {",
+        *(f"  {z}: {json.dumps(c, separators=(',', ':'))}," for z, c in clusters.items()),
+        "};",
+    ]).replace('</', '<\\/')
+
+SITES_REGION = r'<!-- SITES_START -->.*?<!-- SITES_END -->'
+
+def build_sites_page(cfg, layer, html=None):
+    """stadiums.html (or `html`, another copy of it) with its SITES region
+    rebuilt, or None if either the page or sites.json is missing."""
+    page = os.path.join(cfg.repo_dir, SITES_PAGE)
+    if layer is None or (html is None and not os.path.exists(page)):
+        return None
+    return re.sub(SITES_REGION,
+                  lambda _: f'<!-- SITES_START -->\n<script>\n{build_sites_js(layer)}\n</script>\n<!-- SITES_END -->',
+                  open(page).read() if html is None else html, flags=re.DOTALL)
+
+def update(cfg, html, fleet, flights, curr, timeline, notices_js, report_period):
     html = re.sub(r'const fleet = \[.*?\];', fleet, html, flags=re.DOTALL)
     html = re.sub(r'const notices = \[.*?\];', lambda _: notices_js, html, flags=re.DOTALL)
     html = re.sub(r'<!-- FLIGHTS_START -->.*?<!-- FLIGHTS_END -->', f'<!-- FLIGHTS_START -->\n{flights}\n  <!-- FLIGHTS_END -->', html, flags=re.DOTALL)
     html = re.sub(r'<!-- CURRENCY_START -->.*?<!-- CURRENCY_END -->', f'<!-- CURRENCY_START -->\n{curr}\n  <!-- CURRENCY_END -->', html, flags=re.DOTALL)
     html = re.sub(r'<!-- TIMELINE_START -->.*?<!-- TIMELINE_END -->', f'<!-- TIMELINE_START -->\n{timeline}\n    <!-- TIMELINE_END -->', html, flags=re.DOTALL)
-    html = re.sub(r'<title>THC Fleet Map.*?</title>', f'<title>THC Fleet Map — {TODAY.strftime("%-d %b %Y")}</title>', html)
-    html = re.sub(r'<!-- LAST_UPDATED -->.*?<!-- /LAST_UPDATED -->', f'<!-- LAST_UPDATED -->{TODAY.strftime("%-d %b %Y %H:%M")}<!-- /LAST_UPDATED -->', html)
-    html = re.sub(r'<!-- LAST_UPDATED2 -->.*?<!-- /LAST_UPDATED2 -->', f'<!-- LAST_UPDATED2 -->{TODAY.strftime("%-d %b %Y %H:%M")}<!-- /LAST_UPDATED2 -->', html)
+    today = cfg.today
+    html = re.sub(r'<title>THC Fleet Map.*?</title>', f'<title>THC Fleet Map — {today.strftime("%-d %b %Y")}</title>', html)
+    html = re.sub(r'<!-- LAST_UPDATED -->.*?<!-- /LAST_UPDATED -->', f'<!-- LAST_UPDATED -->{today.strftime("%-d %b %Y %H:%M")}<!-- /LAST_UPDATED -->', html)
+    html = re.sub(r'<!-- LAST_UPDATED2 -->.*?<!-- /LAST_UPDATED2 -->', f'<!-- LAST_UPDATED2 -->{today.strftime("%-d %b %Y %H:%M")}<!-- /LAST_UPDATED2 -->', html)
     # Update report period from Flights Schedule (always)
-    rp = get_report_period()
+    rp = report_period
     html = re.sub(r'<!-- REPORT_PERIOD -->.*?<!-- /REPORT_PERIOD -->', f'<!-- REPORT_PERIOD -->{rp}<!-- /REPORT_PERIOD -->', html)
     return html
 
-def main():
-    print(f"\n🚁 THC Fleet Map Generator\n   {TODAY.strftime('%Y-%m-%d %H:%M:%S')}\n")
-    h = load_helis()
-    fl, fy, fr = load_flights()
-    c = load_currency()
-    m = load_missions()
-    html = open(HTML_FILE).read()
-    html = update(html, build_fleet_js(h, fy, fr), build_flights_html(), build_currency_html(c), build_timeline(m), build_notices_js(load_notices()))
-    open(HTML_FILE, 'w').write(html)
-    print(f"\n✅ Done!")
-
-if __name__ == "__main__": main()
+# The volatile section: stamps rewritten on every run whatever the data says
+# (the "Last updated" times and the dated <title>). A diff confined to these
+# is not a change worth publishing. Everything else the generator writes is
+# canonical — every sort over vault data has a full tie-breaker and files
+# are read in sorted order — so unchanged data gives identical bytes.
+_VOLATILE = re.compile(r'<!-- (LAST_UPDATED2?) -->.*?<!-- /\1 -->|<title>THC Fleet Map.*?</title>')
+
+# Generated regions of index.html, for reporting what a change touched
+REGIONS = {
+    'fleet': r'const fleet = \[.*?\];', 'notices': r'const notices = \[.*?\];',
+    'flights': r'<!-- FLIGHTS_START -->.*?<!-- FLIGHTS_END -->',
+    'currency': r'<!-- CURRENCY_START -->.*?<!-- CURRENCY_END -->',
+    'timeline': r'<!-- TIMELINE_START -->.*?<!-- TIMELINE_END -->',
+    'report_period': r'<!-- REPORT_PERIOD -->.*?<!-- /REPORT_PERIOD -->',
+    'status': r'<!-- STATUS_START -->.*?<!-- STATUS_END -->',
+}
+
+def is_substantive(old, new):
+    """True if `new` differs from `old` outside the volatile stamp regions."""
+    return _VOLATILE.sub('', old) != _VOLATILE.sub('', new)
+
+def page_shell(html):
+    """`html` with every generated region and stamp blanked — the part only a
+    hand edit changes."""
+    for pat in (*REGIONS.values(), SITES_REGION):
+        html = re.sub(pat, '', html, flags=re.S)
+    return _VOLATILE.sub('', html)
+
+def changed_files(cfg, html, data):
+    """{relpath: [changed regions]} for generated output that differs from the
+    files on disk, stamps ignored. Empty when a run would change nothing."""
+    def on_disk(rel, binary=False):
+        try:
+            return open(os.path.join(cfg.repo_dir, rel), 'rb' if binary else 'r').read()
+        except OSError:
+            return None
+    def region(pat, text):
+        m = re.search(pat, text, re.S) if text else None
+        return m and m.group()
+    out = {}
+    rel = os.path.relpath(os.path.abspath(cfg.html_file), cfg.repo_dir)
+    old = on_disk(rel)
+    if old is None or is_substantive(old, html):
+        out[rel] = [n for n, pat in REGIONS.items() if region(pat, old) != region(pat, html)] or ['layout']
+    for rel, text in data.items():
+        old = on_disk(rel, isinstance(text, bytes))
+        if rel.endswith('.html') and old is not None:
+            if is_substantive(old, text):
+                out[rel] = [n for n, pat in REGIONS.items() if region(pat, old) != region(pat, text)]
+        elif old != text:
+            out[rel] = []
+    return out
+
+# ── Page weight ──────────────────────────────────────────────────────────────
+# Pilots open the map on thin links, so every run measures index.html region
+# by region: raw, gzip and (with the brotli module) brotli bytes, and element
+# count. The shell is whatever is left outside the regions. One sample a day
+# is kept in .cache/sizes.json. A region over its gzip budget, or more than
+# SIZE_GROWTH_WARN bigger than a week ago, is warned about the day it happens.
+SIZES_FILE = "sizes.json"
+SIZES_KEEP_DAYS = 120
+SIZE_GROWTH_WARN = 0.10            # week on week...
+SIZE_GROWTH_MIN = 1024             # ...and at least this many gzip bytes
+SIZE_BUDGETS = {                   # gzip bytes
+    'page': 40_000, 'shell': 16_000, 'timeline': 16_000, 'currency': 6_000,
+    'flights': 4_000, 'fleet': 4_000, 'notices': 2_000,
+}
+
+def _sizes(text):
+    raw = text.encode()
+    s = {'raw': len(raw), 'gzip': len(gzip.compress(raw, mtime=0)), 'elements': len(re.findall(r'<[a-zA-Z]', text))}
+    if brotli:
+        s['br'] = len(brotli.compress(raw))
+    return s
+
+def region_sizes(html):
+    """{region: {raw, gzip, [br,] elements}} for index.html, plus 'shell'
+    (everything outside the regions) and 'page' (the whole file)."""
+    out, shell = {}, html
+    for name, pat in REGIONS.items():
+        m = re.search(pat, html, re.S)
+        if m:
+            out[name] = _sizes(m.group())
+            shell = shell.replace(m.group(), '', 1)
+    out['shell'], out['page'] = _sizes(shell), _sizes(html)
+    return out
+
+def size_warnings(sizes, base):
+    """Budget and week-on-week growth warnings. `base` is the newest sample
+    at least a week old, or None if there isn't one yet."""
+    out = []
+    for name, s in sizes.items():
+        budget = SIZE_BUDGETS.get(name)
+        if budget and s['gzip'] > budget:
+            out.append(f"{name} is {s['gzip'] / 1024:.1f} KB gzipped, over its {budget / 1024:.1f} KB budget")
+        old = (base or {}).get(name, {}).get('gzip')
+        if old and s['gzip'] - old >= SIZE_GROWTH_MIN and s['gzip'] > old * (1 + SIZE_GROWTH_WARN):
+            out.append(f"{name} grew {(s['gzip'] / old - 1) * 100:.0f}% in a week "
+                       f"({old / 1024:.1f} → {s['gzip'] / 1024:.1f} KB gzipped)")
+    return out
+
+def track_sizes(cfg, html):
+    """Measure the page, warn, and record today's sample in the history."""
+    sizes = region_sizes(html)
+    path = os.path.join(cfg.state_dir, SIZES_FILE)
+    try:
+        history = json.load(open(path))
+    except (OSError, ValueError):
+        history = {}
+    day = cfg.today.date()
+    week_ago = (day - timedelta(days=7)).isoformat()
+    base = max((d for d in history if d <= week_ago), default=None)
+    warnings = size_warnings(sizes, base and history[base])
+    for w in warnings:
+        print(f"⚠️ Page weight: {w}")
+    p = sizes['page']
+    print(f"📦 index.html {p['raw'] / 1024:.1f} KB, {p['gzip'] / 1024:.1f} KB gzipped — "
+          + ', '.join(f"{n} {s['gzip'] / 1024:.1f}" for n, s in sizes.items() if n != 'page'))
+    for name, s in sizes.items():
+        for enc in ('raw', 'gzip', 'br'):
+            if enc in s:
+                metric('fleetmap_page_bytes', s[enc], inc=False, region=name, encoding=enc)
+        metric('fleetmap_page_elements', s['elements'], inc=False, region=name)
+    metric('fleetmap_page_size_warnings', len(warnings), inc=False)
+    keep = (day - timedelta(days=SIZES_KEEP_DAYS)).isoformat()
+    history = {d: v for d, v in history.items() if d >= keep}
+    history[day.isoformat()] = sizes
+    os.makedirs(cfg.state_dir, exist_ok=True)
+    with open(path + ".tmp", 'w') as f:
+        json.dump(history, f, sort_keys=True)
+    os.replace(path + ".tmp", path)
+    return sizes, warnings
+
+# ── Change sets ──────────────────────────────────────────────────────────────
+# What changed, in fleet terms rather than as a text diff. model_records()
+# reduces the model to keyed records (aircraft by reg, flights by date, time
+# and reg, missions by title, currency alerts, notices by id). The previous
+# run's records are kept in .cache/model.json, and change_set() compares the
+# two dict by dict in one pass. The result is written to .cache/changes.json
+# with a one-line summary (for the phone notification). The same comparison
+# against the records last published writes the commit message.
+MODEL_FILE = "model.json"
+CHANGES_FILE = "changes.json"
+_ALERT = re.compile(r'class="alert (danger|warn|info)">(?:\S+ )?(.+?)</div>')
+
+def model_records(model, currency_html):
+    plan = model.get('mission_plan')
+    # Every mission note, from the summary index, so notes a run didn't
+    # open still count as present (see plan_missions)
+    missions = ({_mission_title(os.path.basename(rel).replace('.md', '')):
+                 {'date': e['date'], 'endDate': e['endDate'], 'status': e['status'], 'regs': e['regs']}
+                 for rel, e in plan['index'].items()} if plan else
+                {m['title']: {'date': m['date'], 'endDate': m['endDate'], 'status': m['status'], 'regs': m['regs']}
+                 for m in model['missions']})
+    return {
+        'aircraft': {h['reg']: {'status': h['status'], 'location': h['loc'],
+                                'MEL': h['mel_ref'], 'MEL expiry': h['mel_expiry']} for h in model['helis']},
+        'flights': {f"{f['date']} {f['time']} {short_reg(f['reg'])}": f"{f['route']} · {f['mission']} · {f['pilot'] or 'TBA'}"
+                    for f in model['schedule']},
+        'missions': missions,
+        'alerts': {text: level for level, text in _ALERT.findall(currency_html) if level != 'ok'},
+        'notices': {n['id']: n['msg'] for n in model['notices']},
+    }
+
+def change_set(prev, cur, today):
+    """Structured differences between two model_records(). Flights before
+    `today` (YYYY-MM-DD) dropping off the schedule are not removals. Empty
+    when there is no previous run to compare with."""
+    if not prev:
+        return {}
+    out = {}
+    pa, ca = prev.get('aircraft', {}), cur['aircraft']
+    ac = [{'reg': r, 'field': k, 'from': pa[r].get(k, ''), 'to': v}
+          for r, rec in ca.items() if r in pa for k, v in rec.items() if pa[r].get(k, '') != v]
+    ac += [{'reg': r, 'field': 'added', 'from': '', 'to': rec['status']} for r, rec in ca.items() if r not in pa]
+    ac += [{'reg': r, 'field': 'removed', 'from': rec['status'], 'to': ''} for r, rec in pa.items() if r not in ca]
+    if ac:
+        out['aircraft'] = ac
+    pf = {k: v for k, v in prev.get('flights', {}).items() if k[:10] >= today}
+    fl = {'added': [f"{k} {v}" for k, v in cur['flights'].items() if k not in pf],
+          'removed': [f"{k} {v}" for k, v in pf.items() if k not in cur['flights']],
+          'changed': [f"{k} {pf[k]} → {v}" for k, v in cur['flights'].items() if k in pf and pf[k] != v]}
+    pm, cm = prev.get('missions', {}), cur['missions']
+    ms = {'added': [t for t in cm if t not in pm], 'removed': [t for t in pm if t not in cm],
+          'rescheduled': [{'title': t, 'from': f"{pm[t]['date']} – {pm[t]['endDate']}", 'to': f"{m['date']} – {m['endDate']}"}
+                          for t, m in cm.items() if t in pm and (pm[t]['date'], pm[t]['endDate']) != (m['date'], m['endDate'])],
+          'status': [{'title': t, 'from': pm[t]['status'], 'to': m['status']}
+                     for t, m in cm.items() if t in pm and pm[t]['status'] != m['status']],
+          'aircraft': [{'title': t, 'from': ', '.join(pm[t]['regs']), 'to': ', '.join(m['regs'])}
+                       for t, m in cm.items() if t in pm and pm[t]['regs'] != m['regs']]}
+    pl, cl = prev.get('alerts', {}), cur['alerts']
+    al = {'raised': [f"{lv}: {t}" for t, lv in cl.items() if pl.get(t) != lv],
+          'cleared': [f"{lv}: {t}" for t, lv in pl.items() if t not in cl]}
+    pn, cn = prev.get('notices', {}), cur['notices']
+    no = {'added': [m for i, m in cn.items() if i not in pn], 'removed': [m for i, m in pn.items() if i not in cn]}
+    for key, group in (('flights', fl), ('missions', ms), ('alerts', al), ('notices', no)):
+        group = {k: sorted(v, key=str) for k, v in group.items() if v}
+        if group:
+            out[key] = group
+    return out
+
+def _n(count, what):
+    return f"{count} {what}{'' if count == 1 else 's'}"
+
+def summarize_changes(cs):
+    """One line: 'HC54 maint; 2 flights added; 1 mission rescheduled'."""
+    parts = []
+    for a in cs.get('aircraft', ()):
+        if a['field'] == 'status':
+            parts.append(f"{short_reg(a['reg'])} {a['to']}")
+        elif a['field'] == 'location':
+            parts.append(f"{short_reg(a['reg'])} at {a['to']}")
+        elif a['field'] in ('added', 'removed'):
+            parts.append(f"{short_reg(a['reg'])} {a['field']}")
+        else:
+            parts.append(f"{short_reg(a['reg'])} {a['field']} {a['to'] or 'cleared'}")
+    verbs = {'status': 'status changed', 'aircraft': 'reassigned'}
+    for key, noun in (('flights', 'flight'), ('missions', 'mission'), ('alerts', 'currency alert'), ('notices', 'notice')):
+        for kind, items in cs.get(key, {}).items():
+            parts.append(f"{_n(len(items), noun)} {verbs.get(kind, kind)}")
+    return '; '.join(parts)
+
+def describe_changes(cs):
+    """One line per change, for a commit body."""
+    L = []
+    for a in cs.get('aircraft', ()):
+        L.append(f"{short_reg(a['reg'])} {a['field']}: {a['from'] or '—'} → {a['to'] or '—'}")
+    for kind, items in cs.get('flights', {}).items():
+        L += [f"Flight {kind}: {f}" for f in items]
+    for kind, items in cs.get('missions', {}).items():
+        L += [f"Mission {kind}: {m}" if isinstance(m, str) else f"Mission {kind}: {m['title']} {m['from'] or '—'} → {m['to'] or '—'}"
+              for m in items]
+    for kind, items in cs.get('alerts', {}).items():
+        L += [f"Currency alert {kind}: {a}" for a in items]
+    for kind, items in cs.get('notices', {}).items():
+        L += [f"Notice {kind}: {n}" for n in items]
+    return L
+
+def commit_message(subject, cs, limit=40):
+    """`subject` plus the change summary, with the changes as the body."""
+    summary, lines = summarize_changes(cs), describe_changes(cs)
+    if not lines:
+        return subject
+    more = [f"- …and {len(lines) - limit} more"] if len(lines) > limit else []
+    return f"{subject} — {summary}" + "\n\n" + '\n'.join([f"- {ln}" for ln in lines[:limit]] + more)
+
+def record_changes(cfg, records):
+    """Compare with the previous run, save both files, print the summary."""
+    path = os.path.join(cfg.state_dir, MODEL_FILE)
+    try:
+        prev = json.load(open(path))
+    except (OSError, ValueError):
+        prev = None
+    cs = change_set(prev, records, cfg.today.strftime("%Y-%m-%d"))
+    summary = summarize_changes(cs)
+    print(f"🧾 Since the last run: {summary}" if summary else "🧾 No fleet changes since the last run")
+    os.makedirs(cfg.state_dir, exist_ok=True)
+    for name, obj in ((MODEL_FILE, records), (CHANGES_FILE, {'at': cfg.today.isoformat(), 'summary': summary, 'changes': cs})):
+        p = os.path.join(cfg.state_dir, name)
+        with open(p + ".tmp", 'w') as f:
+            json.dump(obj, f, indent=1, sort_keys=True, ensure_ascii=False)
+        os.replace(p + ".tmp", p)
+    return cs
+
+# ── Publish scheduling ───────────────────────────────────────────────────────
+# Every push fires a full Pages deploy, and push volume is what starved the
+# hosted runners and left a deploy stuck for 3h47m (see pages.yml). Changes a
+# pilot must see now go out immediately; the rest are coalesced and flushed by
+# the next scheduled run once the window and minimum interval have passed.
+COALESCE_WINDOW = timedelta(minutes=60)      # hold routine changes at least this long
+MIN_PUSH_INTERVAL = timedelta(minutes=120)   # ...and never push routine changes closer than this
+URGENT_HORIZON = timedelta(days=2)           # mission edits starting within this are urgent
+
+def publish_snapshot(cfg, model):
+    """The parts of the model whose changes are safety-relevant."""
+    soon = (cfg.today + URGENT_HORIZON).strftime("%Y-%m-%d")
+    ts = cfg.today.strftime("%Y-%m-%d")
+    return {
+        'status': {h['reg']: h['status'] for h in model['helis']},
+        'flights_today': sorted(f"{f['reg']} {f['route']} {f['mission']}" for f in model['flights']),
+        'notices': {n['id']: n['date'] for n in model['notices']},
+        'conflicts': sorted(f"{c['key']}|{c['a']}|{c['b']}" for c in model.get('conflicts', ())
+                            if c['end'] > cfg.today and c['start'] <= cfg.today + URGENT_HORIZON),
+        'missions_soon': sorted(f"{m['title']}|{m['date']}|{m['endDate']}|{m['status']}|{m['helicopters']}"
+                                for m in model['missions'] if m['date'] and m['date'] <= soon and (m['endDate'] or m['date']) >= ts),
+    }
+
+def classify_change(prev, snap):
+    """Reasons this change must publish now (empty list = routine, coalesce)."""
+    if not prev:
+        return ["no publish state yet"]
+    why = []
+    for reg, st in sorted(snap['status'].items()):
+        if st == 'maint' and prev['status'].get(reg) != 'maint':
+            why.append(f"{short_reg(reg)} → AOG/maint")
+    for f in snap['flights_today']:
+        if f not in prev['flights_today']:
+            why.append(f"new flight today: {f}")
+    for nid, date in sorted(snap['notices'].items(), key=lambda x: (x[1], x[0])):
+        if nid not in prev['notices']:
+            why.append(f"new notice {date}")
+    for c in snap.get('conflicts', ()):
+        if c not in prev.get('conflicts', ()):
+            why.append(f"new double booking within 2 days: {c.split('|')[0]}")
+    if snap['missions_soon'] != prev['missions_soon']:
+        why.append("mission starting within 2 days changed")
+    return why
+
+def load_publish_state(cfg):
+    try:
+        return json.load(open(os.path.join(cfg.state_dir, "publish-state.json")))
+    except (OSError, ValueError):
+        return {}
+
+def save_publish_state(cfg, state):
+    os.makedirs(cfg.state_dir, exist_ok=True)
+    path = os.path.join(cfg.state_dir, "publish-state.json")
+    with open(path + ".tmp", 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def publish_due(cfg, state, urgent):
+    """When a pending change may go out: now if urgent, else once it has sat
+    for COALESCE_WINDOW and MIN_PUSH_INTERVAL has passed since the last push."""
+    if urgent:
+        return cfg.today
+    pending = datetime.fromisoformat(state['pending_since']) if state.get('pending_since') else cfg.today
+    due = pending + COALESCE_WINDOW
+    if state.get('last_push'):
+        due = max(due, datetime.fromisoformat(state['last_push']) + MIN_PUSH_INTERVAL)
+    return due
+
+# ForeFlight content pack, built from the map's own `bases` table in
+# index.html plus training_areas.json. The pack is keyed by a hash of those
+# inputs: while the hash matches foreflight/pack.json the committed zip is
+# reused byte for byte (nothing to republish); when geometry changes the
+# version is bumped, the zip rebuilt, and a notice tells pilots to re-import.
+FOREFLIGHT_DIR = "foreflight"
+FOREFLIGHT_ZIP = "THC-ForeFlight-Pack.zip"
+FOREFLIGHT_FORMAT = 1                 # bump when the pack layout changes
+FOREFLIGHT_NOTICE_DAYS = 14
+TRAINING_AREAS_FILE = "training_areas.json"
+_BASE_LINE = re.compile(r'^\s*(\w+):\s*\{\s*lat:\s*(-?[\d.]+),\s*lng:\s*(-?[\d.]+),\s*name:\s*"([^"]*)"', re.M)
+
+def load_waypoints(cfg):
+    """{code: (lat, lng, name)} from `const bases = {...}` in the page."""
+    m = re.search(r'const bases = \{(.*?)\n\};', open(cfg.html_file).read(), re.S)
+    return {c: (float(la), float(ln), n) for c, la, ln, n in _BASE_LINE.findall(m.group(1))} if m else {}
+
+def load_training_areas(cfg):
+    """[{name, points: [[lat, lng], ...]}] from training_areas.json, if any."""
+    path = os.path.join(cfg.repo_dir, TRAINING_AREAS_FILE)
+    if not os.path.exists(path):
+        return []
+    try:
+        return [{'name': a['name'], 'points': [[float(la), float(ln)] for la, ln in a['points']]}
+                for a in json.loads(read_text(path))]
+    except (KeyError, TypeError, ValueError) as e:
+        print(f"⚠️ {TRAINING_AREAS_FILE}: {e}")
+        parse_error('training_areas')
+        return []
+
+def _is_vrp(name):
+    return name.startswith('VRP') or name == 'KAFD HELIPAD'   # same rule as the map
+
+def _pack_kml(waypoints, areas):
+    def pm(code, la, ln, name):
+        return (f'      <Placemark><name>{xml_escape(code)}</name><description>{xml_escape(name)}</description>'
+                f'<Point><coordinates>{ln},{la},0</coordinates></Point></Placemark>')
+    L = ['<?xml version="1.0" encoding="UTF-8"?>', '<kml xmlns="http://www.opengis.net/kml/2.2">', '  <Document>',
+         '    <name>THC</name>']
+    for folder, vrp in (('Bases', False), ('VRPs', True)):
+        L += [f'    <Folder><name>{folder}</name>',
+              *(pm(c, la, ln, n) for c, (la, ln, n) in waypoints.items() if _is_vrp(n) == vrp), '    </Folder>']
+    L.append('    <Folder><name>Training Areas</name>')
+    for a in areas:
+        ring = a['points'] + a['points'][:1] if a['points'][0] != a['points'][-1] else a['points']
+        L.append(f'      <Placemark><name>{xml_escape(a["name"])}</name><Polygon><outerBoundaryIs><LinearRing><coordinates>'
+                 + ' '.join(f'{ln},{la},0' for la, ln in ring) + '</coordinates></LinearRing></outerBoundaryIs></Polygon></Placemark>')
+    return '\n'.join(L + ['    </Folder>', '  </Document>', '</kml>', ''])
+
+def _pack_csv(waypoints):
+    # ForeFlight user_waypoints.csv: name, description, lat, lon — no header
+    return ''.join(f'{c},"{n}",{la},{ln}\n' for c, (la, ln, n) in waypoints.items())
+
+def build_foreflight_zip(waypoints, areas, version):
+    """Deterministic content-pack zip (fixed timestamps), so equal inputs give
+    equal bytes."""
+    manifest = {'name': 'THC Fleet Map', 'abbreviation': 'THC', 'version': float(version),
+                'organizationName': 'THC'}
+    files = {'THC/manifest.json': json.dumps(manifest, indent=2) + '\n',
+             'THC/layers/THC.kml': _pack_kml(waypoints, areas),
+             'THC/navdata/user_waypoints.csv': _pack_csv(waypoints)}
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as z:
+        for name, text in files.items():
+            z.writestr(zipfile.ZipInfo(name, (1980, 1, 1, 0, 0, 0)), text, zipfile.ZIP_DEFLATED)
+    return buf.getvalue()
+
+def foreflight_pack(cfg):
+    """(pack meta, {relpath: bytes/text}) — rebuilt only if the inputs' hash
+    differs from the committed pack.json."""
+    waypoints, areas = load_waypoints(cfg), load_training_areas(cfg)
+    if not waypoints:
+        print("⚠️ No `const bases` table in the page — ForeFlight pack skipped")
+        return None, {}
+    key = json.dumps([FOREFLIGHT_FORMAT, waypoints, areas], sort_keys=True)
+    h = hashlib.sha256(key.encode()).hexdigest()[:12]
+    meta_rel, zip_rel = f"{FOREFLIGHT_DIR}/pack.json", f"{FOREFLIGHT_DIR}/{FOREFLIGHT_ZIP}"
+    try:
+        prev_text = read_text(os.path.join(cfg.repo_dir, meta_rel))
+        prev = json.loads(prev_text)
+    except (OSError, ValueError):
+        prev = {}
+    if prev.get('hash') == h:
+        # pack.json always goes out with the zip, so a run that built the
+        # pack but never published it doesn't leave origin without it
+        try:
+            return prev, {zip_rel: open(os.path.join(cfg.repo_dir, zip_rel), 'rb').read(), meta_rel: prev_text}
+        except OSError:
+            print(f"📦 ForeFlight pack v{prev['version']} ({h}): zip missing — rebuilt")
+            return prev, {zip_rel: build_foreflight_zip(waypoints, areas, prev['version']), meta_rel: prev_text}
+    meta = {'version': prev.get('version', 0) + 1, 'hash': h, 'date': cfg.today.strftime("%Y-%m-%d"),
+            'waypoints': len(waypoints), 'areas': len(areas)}
+    print(f"📦 ForeFlight pack v{meta['version']} ({h}): {len(waypoints)} waypoints, {len(areas)} training areas")
+    return meta, {zip_rel: build_foreflight_zip(waypoints, areas, meta['version']),
+                  meta_rel: json.dumps(meta, indent=2) + '\n'}
+
+_FOREFLIGHT_BUTTON = re.compile(r'<a\b[^>]*\bhref="([^"]*)"[^>]*>\s*📲 ForeFlight Pack')
+
+def foreflight_notice(cfg, meta):
+    """Auto notice for a pack built in the last FOREFLIGHT_NOTICE_DAYS. Held
+    back while the pack has no training areas (it would replace one that
+    does) or the page's 📲 ForeFlight Pack button doesn't fetch this zip —
+    the notice would send pilots to a different pack."""
+    if not meta or datetime.strptime(meta['date'], "%Y-%m-%d") < cfg.today - timedelta(days=FOREFLIGHT_NOTICE_DAYS):
+        return None
+    m = _FOREFLIGHT_BUTTON.search(open(cfg.html_file).read())
+    if not meta['areas'] or not m or not m.group(1).endswith(f"{FOREFLIGHT_DIR}/{FOREFLIGHT_ZIP}"):
+        print(f"ℹ️  ForeFlight pack v{meta['version']} notice held back — "
+              + ("no training areas" if not meta['areas'] else "the page's ForeFlight button doesn't link to the zip"))
+        return None
+    msg = (f"ForeFlight content pack v{meta['version']} — {meta['waypoints']} waypoints, {meta['areas']} training areas. "
+           f"Tap the 📲 ForeFlight Pack button on this site and import again.")
+    return {"id": hashlib.md5(f"{meta['date']}|{msg}".encode()).hexdigest()[:10], "date": meta['date'], "msg": msg}
+
+# Search. data/search.json is a prebuilt inverted index, so the phone does
+# no indexing: "k" is every token, sorted, "p" the ids of the entries holding
+# it (same order), and "e" the entries as [kind, label, detail, target].
+# A query token matches every index token it prefixes, a binary search on
+# "k"; entries must match all query tokens. Kinds are a(ircraft), b(ase),
+# p(ilot), m(ission) and f(light); a target is ['a', reg], ['b', code] or
+# ['m', title, year] and says what the page jumps to. Missions are every
+# note in the summary index (tails and title), with location, client and
+# pilots as well for those in the timeline window; flights are the next
+# SEARCH_FLIGHT_DAYS days. The page fetches the file on first focus.
+SEARCH_FILE = "data/search.json"
+SEARCH_FLIGHT_DAYS = 7
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+def _tokens(*texts):
+    out = set()
+    for t in texts:
+        for tok in _TOKEN.findall(str(t or '').lower()):
+            out.add(tok)
+            if re.fullmatch(r'hz(hc|th)\d+', tok):
+                out.add(tok[2:])              # HZHC55 is also found as HC55
+    return out
+
+def _reg_tokens(reg):
+    return _tokens(normalize_reg(reg), short_reg(normalize_reg(reg)))
+
+def build_search_index(cfg, model, waypoints=None):
+    """Compact JSON for the page's search box (see above)."""
+    waypoints = load_waypoints(cfg) if waypoints is None else waypoints
+    entries, postings = [], {}
+    def add(kind, label, detail, target, toks):
+        for t in toks:
+            postings.setdefault(t, set()).add(len(entries))
+        entries.append([kind, label, detail, target])
+    labels = {'flying': 'flying', 'parked': 'serviceable', 'maint': 'maintenance', 'preserv': 'preservation'}
+    fy = model['pilot_by_reg']
+    for h in sorted(model['helis'], key=lambda h: h['reg']):
+        st = 'flying' if h['reg'] in fy else h['status']
+        detail = ' · '.join(x for x in (f"{labels.get(st, st)} at {h['loc']}", fy.get(h['reg']), h['mission']) if x)
+        add('a', short_reg(h['reg']), detail, ['a', h['reg']],
+            _reg_tokens(h['reg']) | _tokens(h['loc'], fy.get(h['reg']), h['mission']))
+    for code, (_, _, name) in sorted(waypoints.items()):
+        add('b', code, name, ['b', code], _tokens(code, name))
+    today, until = cfg.today.strftime("%Y-%m-%d"), (cfg.today + timedelta(days=SEARCH_FLIGHT_DAYS)).strftime("%Y-%m-%d")
+    week = [f for f in model['schedule'] if today <= f['date'] < until]
+    mn, mx = (_iso(d) for d in timeline_window(cfg.today))
+    loaded = {m['title']: m for m in model['missions']
+              if not m['date'] or (m['date'] <= mx and (m['endDate'] or m['date']) >= mn)}
+    missions = []
+    for rel, e in sorted(model['mission_plan']['index'].items()):
+        if e['training'] or e['status'] in ('canceled', 'cancelled'):
+            continue
+        title = _mission_title(os.path.basename(rel).replace('.md', ''))
+        missions.append((e['date'] or 'zzzz', title, e, loaded.get(title)))
+    for name in sorted({c['name'] for c in model['currency']}):
+        aliases = {name, _short_name(name), name.split()[0]}
+        reg = next((r for r, p in sorted(fy.items()) if p in aliases), None)
+        nxt = next((t for d, t, e, m in sorted(missions, key=lambda x: x[:2]) if m and (m['endDate'] or m['date'] or 'zzzz') >= today
+                    and aliases & {p.strip() for p in re.split(r'[,/&]| and ', m['pilots'] or '')}), None)
+        flights = sum(1 for f in week if f['pilot'] in aliases)
+        detail = ' · '.join(x for x in (f"flying {short_reg(reg)} today" if reg else '',
+                                        f"{flights} flight(s) this week" if flights else '', f"next: {nxt}" if nxt else '') if x)
+        target = ['a', reg] if reg else ['m', nxt, int(loaded[nxt]['date'][:4]) if loaded[nxt]['date'] else None] if nxt else None
+        add('p', name, detail, target, _tokens(name))
+    for date, title, e, m in sorted(missions, key=lambda x: x[:2], reverse=True):     # undated, then newest first
+        dates = e['date'] and (e['date'] if e['endDate'] in ('', e['date']) else f"{e['date']} → {e['endDate']}")
+        detail = ' · '.join(x for x in (dates or 'dates TBD', ' '.join(short_reg(r) for r in e['regs']),
+                                        m and m['location'], m and m['client'], m and m['pilots']) if x)
+        toks = _tokens(title) | set().union(*(_reg_tokens(r) for r in e['regs']))
+        if m:
+            toks |= _tokens(m['location'], m['client'], m['pilots'])
+        add('m', title, detail, ['m', title, int(e['date'][:4]) if e['date'][:4].isdigit() else None], toks)
+    for f in sorted(week, key=lambda f: (f['date'], f['time'], f['reg'])):
+        d = datetime.strptime(f['date'], "%Y-%m-%d")
+        add('f', f"{short_reg(f['reg'])} {d.strftime('%a %-d %b')} {f['time']}",
+            ' · '.join(x for x in (f['route'], f['mission'], f['pilot']) if x), ['a', f['reg']],
+            _reg_tokens(f['reg']) | _tokens(f['route'], f['mission'], f['pilot']))
+    keys = sorted(postings)
+    metric('fleetmap_search_entries', len(entries), inc=False)
+    return json.dumps({'v': 1, 'e': entries, 'k': keys, 'p': [sorted(postings[k]) for k in keys]},
+                      ensure_ascii=False, separators=(',', ':')) + '\n'
+
+# ── Exports ──────────────────────────────────────────────────────────────────
+# Machine-readable copies of what the page shows, for the teams that used to
+# scrape index.html and for pilots' calendars: exports/fleet.geojson (each
+# aircraft at its base), exports/currency.csv (one row per pilot and item)
+# and iCalendar feeds per pilot and per aircraft under exports/calendars/.
+# Feeds carry the timeline window's missions plus every scheduled flight.
+# exports/index.json lists every file with the sha256 of its content and
+# when that last changed; DTSTAMPs come from there, so a file's bytes only
+# change when what it says does, and HTTP caches and calendar clients see
+# an unchanged ETag otherwise. A feed that drops out (pilot off the roster)
+# is kept as an empty calendar, so subscribers see its events go.
+EXPORTS_DIR = "exports"
+EXPORTS_INDEX = f"{EXPORTS_DIR}/index.json"
+EXPORTS_FORMAT = 1                    # bump when a file's layout changes
+CALENDARS_DIR = f"{EXPORTS_DIR}/calendars"
+_STAMP = '\x00STAMP\x00'
+
+def _slug(s):
+    return re.sub(r'[^a-z0-9]+', '-', s.lower()).strip('-') or 'unknown'
+
+def build_fleet_geojson(helis, waypoints, pilot_by_reg):
+    """FeatureCollection of aircraft at their base; unknown bases get a null
+    geometry rather than being dropped."""
+    feats = []
+    for h in sorted(helis, key=lambda h: h['reg']):
+        wp = waypoints.get(h['loc'])
+        feats.append({'type': 'Feature', 'id': h['reg'],
+                      'geometry': {'type': 'Point', 'coordinates': [wp[1], wp[0]]} if wp else None,
+                      'properties': {'reg': h['reg'], 'short': short_reg(h['reg']), 'status': h['status'],
+                                     'fullStatus': h['fullStatus'], 'base': h['loc'], 'baseName': wp[2] if wp else '',
+                                     'mission': h['mission'], 'pilotToday': pilot_by_reg.get(h['reg'], ''),
+                                     'melRef': h['mel_ref'], 'melExpiry': h['mel_expiry']}})
+    return json.dumps({'type': 'FeatureCollection', 'features': feats}, ensure_ascii=False, indent=1) + '\n'
+
+def build_currency_csv(curr):
+    """pilot,item,last,expires — one row per dated currency item."""
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator='\n')
+    w.writerow(['pilot', 'item', 'last', 'expires'])
+    for c in curr:
+        for item in CURRENCY_ITEMS:
+            if c.get(item):
+                try:
+                    exp = _currency_expiry(item, c[item])
+                except ValueError:
+                    exp = ''
+                w.writerow([c['name'], CURRENCY_ITEMS[item][0], c[item], exp])
+    return buf.getvalue()
+
+def _ics_text(s):
+    return re.sub(r'([,;\\])', r'\\\1', str(s)).replace('\n', '\\n')
+
+def _ics_fold(line):
+    # RFC 5545: lines over 75 octets continue on the next line after a space
+    b, out = line.encode(), []
+    while len(b) > 75:
+        cut = 75 if not out else 74
+        while cut and (b[cut] & 0xC0) == 0x80:   # never split a UTF-8 sequence
+            cut -= 1
+        out.append(b[:cut].decode())
+        b = b[cut:]
+    out.append(b.decode())
+    return '\r\n '.join(out)
+
+def _ics_utc(cfg, day, hhmm):
+    local = datetime.strptime(f"{day} {hhmm}", "%Y-%m-%d %H:%M").replace(tzinfo=ZoneInfo(cfg.tz))
+    return local.astimezone(ZoneInfo('UTC'))
+
+def mission_events(cfg, missions):
+    """All-day VEVENT fields for dated missions overlapping the timeline window."""
+    mn, mx = (_iso(d) for d in timeline_window(cfg.today))
+    out = []
+    for m in missions:
+        if not m['date'] or m['date'] > mx or (m['endDate'] or m['date']) < mn:
+            continue
+        try:
+            end = datetime.strptime(m['endDate'] or m['date'], "%Y-%m-%d") + timedelta(days=1)
+        except ValueError:
+            continue
+        desc = [f"{k}: {v}" for k, v in (('Aircraft', m['helicopters']), ('Pilots', m['pilots']), ('Client', m['client']),
+                                          ('Notes', m['special_notes'])) if v]
+        out.append({'uid': hashlib.sha1(m['_src'].encode()).hexdigest()[:16] + '@thc-fleetmap',
+                    'DTSTART;VALUE=DATE': m['date'].replace('-', ''), 'DTEND;VALUE=DATE': end.strftime("%Y%m%d"),
+                    'SUMMARY': m['title'], 'LOCATION': m['location'], 'DESCRIPTION': '\n'.join(desc),
+                    'STATUS': 'TENTATIVE' if m['status'] in ('pending', 'potential', 'paused') else 'CONFIRMED',
+                    'regs': m['regs'], 'pilots': [p.strip() for p in re.split(r'[,/&]| and ', m['pilots'] or '') if p.strip()]})
+    return out
+
+def flight_events(cfg, sched):
+    """Timed VEVENT fields (UTC) for every scheduled flight."""
+    out = []
+    for f in sched:
+        try:
+            t0, t1 = f['time'].split('-')
+            start, end = _ics_utc(cfg, f['date'], t0), _ics_utc(cfg, f['date'], t1)
+        except ValueError:
+            continue
+        if end <= start:
+            end += timedelta(days=1)
+        key = f"{f['date']} {f['time']} {f['reg']} {f['mission']}"
+        out.append({'uid': hashlib.sha1(key.encode()).hexdigest()[:16] + '@thc-fleetmap',
+                    'DTSTART': start.strftime("%Y%m%dT%H%M%SZ"), 'DTEND': end.strftime("%Y%m%dT%H%M%SZ"),
+                    'SUMMARY': f"{short_reg(f['reg'])} {f['mission']}", 'LOCATION': f['route'],
+                    'DESCRIPTION': f"PIC: {f['pilot']}" if f['pilot'] else '', 'STATUS': 'CONFIRMED',
+                    'regs': [f['reg']], 'pilots': [f['pilot']] if f['pilot'] else []})
+    return out
+
+def build_ics(name, events):
+    """One VCALENDAR; DTSTAMP is left as a placeholder for export_files()."""
+    L = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//THC//Fleet Map//EN', 'CALSCALE:GREGORIAN',
+         f'X-WR-CALNAME:{_ics_text(name)}', 'X-PUBLISHED-TTL:PT1H']
+    for e in sorted(events, key=lambda e: (e.get('DTSTART') or e['DTSTART;VALUE=DATE'], e['uid'])):
+        L += ['BEGIN:VEVENT', f"UID:{e['uid']}", f'DTSTAMP:{_STAMP}']
+        L += [f"{k}:{v if k.startswith('DT') or k == 'STATUS' else _ics_text(v)}"
+              for k, v in e.items() if k not in ('uid', 'regs', 'pilots') and v]
+        L.append('END:VEVENT')
+    L.append('END:VCALENDAR')
+    return ''.join(_ics_fold(ln) + '\r\n' for ln in L)
+
+def _pilot_names(curr):
+    """{alias: full name}: the schedule writes "Will L", mission notes "Will"."""
+    names = {}
+    for c in curr:
+        names[_short_name(c['name'])] = c['name']
+        first = c['name'].split()[0]
+        names[first] = c['name'] if first not in names else None   # ambiguous first names match nobody
+    return {k: v for k, v in names.items() if v}
+
+def build_calendars(cfg, model):
+    """{relpath: (calendar name, events)} per pilot and per aircraft."""
+    events = mission_events(cfg, model['missions']) + flight_events(cfg, model['schedule'])
+    alias = _pilot_names(model['currency'])
+    by_heli = {h['reg']: [] for h in model['helis']}
+    by_pilot = {}
+    for e in events:
+        for r in e['regs']:
+            by_heli.setdefault(r, []).append(e)
+        for p in {alias.get(p, p) for p in e['pilots'] if p.upper() not in ('TBD', 'TBA')}:
+            by_pilot.setdefault(p, []).append(e)
+    cals = {f"{CALENDARS_DIR}/{short_reg(r)}.ics": (f"THC {short_reg(r)}", ev) for r, ev in by_heli.items()}
+    cals.update({f"{CALENDARS_DIR}/pilot-{_slug(p)}.ics": (f"THC {p}", ev) for p, ev in by_pilot.items()})
+    return cals
+
+def export_files(cfg, model):
+    """{relpath: text} for every export plus exports/index.json. A file keeps
+    its `updated` time (and so its ICS DTSTAMPs) while its hash is unchanged.
+    Calendars are bytes: text mode would turn their CRLFs into LFs on read,
+    and every comparison with the file on disk would then differ."""
+    try:
+        prev = json.loads(read_text(os.path.join(cfg.repo_dir, EXPORTS_INDEX)))
+        prev = prev['files'] if prev.get('format') == EXPORTS_FORMAT else {}
+    except (OSError, ValueError, KeyError):
+        prev = {}
+    waypoints = load_waypoints(cfg)
+    bodies = {f"{EXPORTS_DIR}/fleet.geojson": build_fleet_geojson(model['helis'], waypoints, model['pilot_by_reg']),
+              f"{EXPORTS_DIR}/currency.csv": build_currency_csv(model['currency'])}
+    cals = build_calendars(cfg, model)
+    for rel in prev:
+        if rel.startswith(CALENDARS_DIR + '/') and rel not in cals:
+            cals[rel] = (f"THC {os.path.basename(rel)[:-4]}", [])
+    bodies.update({rel: build_ics(name, ev) for rel, (name, ev) in cals.items()})
+    now = cfg.today.replace(tzinfo=ZoneInfo(cfg.tz)).astimezone(ZoneInfo('UTC')).strftime("%Y%m%dT%H%M%SZ")
+    index, out = {}, {}
+    for rel in sorted(bodies):
+        h = hashlib.sha256(bodies[rel].encode()).hexdigest()
+        updated = prev[rel]['updated'] if prev.get(rel, {}).get('sha256') == h else now
+        out[rel] = bodies[rel].replace(_STAMP, updated).encode()
+        index[rel] = {'sha256': h, 'updated': updated, 'bytes': len(out[rel])}
+        if not rel.endswith('.ics'):
+            out[rel] = out[rel].decode()
+    changed = sum(1 for rel in index if prev.get(rel, {}).get('sha256') != index[rel]['sha256'])
+    if changed:
+        print(f"📤 Exports: {changed} of {len(index)} file(s) changed")
+    metric('fleetmap_export_files_changed', changed, inc=False)
+    out[EXPORTS_INDEX] = json.dumps({'format': EXPORTS_FORMAT, 'files': index}, indent=1, sort_keys=True) + '\n'
+    return out
+
+def load_model(cfg):
+    """Read everything the page is built from, once."""
+    helis = timed('load_helis', load_helis, cfg)
+    fl, fy, fr, dates, sched = timed('load_flights', load_flights, cfg)
+    curr = timed('load_currency', load_currency, cfg)
+    model = {
+        'helis': helis, 'flights': fl, 'pilot_by_reg': fy, 'route_by_reg': fr,
+        'flight_dates': dates, 'schedule': sched, 'currency': curr,
+        'expiry': timed('expiry_index', build_expiry_index, curr),
+        'mission_plan': timed('plan_missions', plan_missions, cfg),
+        'notices': timed('load_notices', load_notices, cfg),
+        'sites': load_sites(cfg),
+    }
+    model['missions'] = timed('load_missions', load_missions, cfg, model['mission_plan']['load'])
+    model['flight_days'] = timed('flight_days', flight_days, cfg)
+    model['scrub_audit'] = timed('scrub', scrub_model, model)
+    model['foreflight'], model['foreflight_files'] = timed('foreflight_pack', foreflight_pack, cfg)
+    notice = foreflight_notice(cfg, model['foreflight'])
+    if notice and notice['id'] not in {n['id'] for n in model['notices']}:
+        model['notices'].append(notice)
+    model['conflicts'] = timed('conflicts', find_conflicts, model['missions'], sched)
+    report_conflicts(cfg, model['conflicts'])
+    return model
+
+def render(cfg, model):
+    """Build every generated region from the model. Returns update()'s args."""
+    return (timed('build_fleet_js', build_fleet_js, model['helis'], model['pilot_by_reg'], model['route_by_reg']),
+            timed('build_flights_html', build_flights_html, cfg, model['flight_days']),
+            timed('build_currency_html', build_currency_html, cfg, model['currency'])
+            + '\n' + build_expiry_calendar_html(cfg, model['expiry']),
+            timed('build_timeline', build_timeline, cfg, model['missions'], model['mission_plan']['years']),
+            build_notices_js(model['notices']), get_report_period(cfg, model['flight_dates']))
+
+# Last-good regions. A loader that fails (Flights Schedule.md mid-sync, the
+# Pilots folder still OneDrive placeholders) returns empty rather than
+# raising, and the region it feeds would publish blank. After every healthy
+# build each guarded region is saved in .cache/last-good.json with a
+# fingerprint of its source files. A region is suspect when its loader
+# swallowed an error, a source file was unreadable, or its record count
+# collapsed (under STALE_COLLAPSE of the last good count). A suspect region
+# is replaced by the saved copy under a "not current" banner (the fleet,
+# being JS, gets a notice instead). This is alerted on every run, through
+# the log, the fleetmap_region_stale_seconds metric and .cache/stale.json,
+# which auto-update.sh pings about. A collapse with readable sources is
+# only held for STALE_MAX_AGE: after that the emptier data is taken as real.
+LAST_GOOD_FILE = "last-good.json"
+STALE_FILE = "stale.json"
+STALE_COLLAPSE = 0.5
+STALE_COLLAPSE_MIN = 3             # last good counts below this can't "collapse"
+STALE_MAX_AGE = timedelta(hours=48)
+
+# region: (count of records, vault sources, loader error sites, records key)
+GUARDED_REGIONS = {
+    'fleet':    (lambda m: len(m['helis']), ('Helicopters',), (), 'aircraft'),
+    'flights':  (lambda m: len(m['schedule']), ('Flights Schedule',), ('load_flights', 'build_flights_html'), 'flights'),
+    'currency': (lambda m: len(m['currency']), ('Pilots',), ('load_currency',), 'alerts'),
+    'timeline': (lambda m: len(m['mission_plan']['index']), ('Missions', 'Past Missions'), (), 'missions'),
+}
+
+def source_fingerprint(cfg, sources):
+    """Hash of (path, mtime, size) of every note in `sources`."""
+    paths = {'Helicopters': cfg.helis_dir, 'Pilots': cfg.pilots_dir, 'Missions': cfg.missions_dir,
+             'Past Missions': f"{cfg.missions_dir}/Past Missions", 'Flights Schedule': cfg.flights_file}
+    sig = []
+    for src in sources:
+        p = paths[src]
+        files = [p] if not os.path.isdir(p) else [os.path.join(r, f) for r, ds, fs in os.walk(p) for f in fs if f.endswith('.md')]
+        for fp in sorted(files):
+            try:
+                st = os.stat(fp)
+                sig.append((os.path.relpath(fp, cfg.vault), st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append((os.path.relpath(fp, cfg.vault), None, None))
+    return hashlib.sha1(json.dumps(sig).encode()).hexdigest()[:12]
+
+def _ago(delta):
+    mins = int(delta.total_seconds() // 60)
+    return f"{mins} min" if mins < 90 else f"{mins // 60} h" if mins < 48 * 60 else f"{mins // 1440} days"
+
+def region_failure(cfg, model, region, good):
+    """Why `region` can't be trusted this run, or None."""
+    count, sources, sites, _ = GUARDED_REGIONS[region]
+    errors = sum(v for (name, labels), v in _metrics.items()
+                 if name == 'fleetmap_parse_errors_total' and dict(labels).get('where') in sites)
+    if errors:
+        return f"{sites[0]} failed"
+    unreadable = sum(v for (name, labels), v in _metrics.items()
+                     if name == 'fleetmap_unreadable_files' and dict(labels).get('source') in sources)
+    if unreadable:
+        return f"{unreadable} unreadable file(s) in {'/'.join(sources)}"
+    n = count(model)
+    if good and good['count'] >= STALE_COLLAPSE_MIN and n < good['count'] * STALE_COLLAPSE \
+            and cfg.today - datetime.fromisoformat(good['at']) < STALE_MAX_AGE:
+        return f"{n} record(s), down from {good['count']}"
+    return None
+
+def guard_regions(cfg, model, regions, write=True):
+    """Swap suspect regions for their last good copy (see above). Returns the
+    regions; model['stale'] is {region: {'why', 'at'}} for those swapped."""
+    path = os.path.join(cfg.state_dir, LAST_GOOD_FILE)
+    try:
+        cache = json.load(open(path))
+    except (OSError, ValueError):
+        cache = {}
+    named = dict(zip(UPDATE_ARGS, regions))
+    stale, fresh = {}, {}
+    for region, (count, sources, _, _) in GUARDED_REGIONS.items():
+        good = cache.get(region)
+        why = region_failure(cfg, model, region, good)
+        if why and good:
+            same = good['fingerprint'] == source_fingerprint(cfg, sources)
+            stale[region] = {'why': why, 'at': good['at'], 'inputs_changed': not same}
+            age = cfg.today - datetime.fromisoformat(good['at'])
+            print(f"❌ {region}: {why} — showing the last good copy from {_ago(age)} ago"
+                  + ("" if same else " (its sources have changed since)"))
+            metric('fleetmap_region_stale_seconds', round(age.total_seconds()), inc=False, region=region)
+            banner = (f'  <div class="stale-banner">⚠️ Not current — last updated {_ago(age)} ago '
+                      f'({datetime.fromisoformat(good["at"]).strftime("%-d %b %H:%M")}); the source is syncing</div>')
+            named[region] = good['html'] if region == 'fleet' else banner + '\n' + good['html']
+            if region == 'fleet':
+                model['status_html'] = banner + '\n' + good['status']
+            if region == 'flights':
+                named['report_period'] = good.get('report_period', named['report_period'])
+            continue
+        if why:
+            print(f"⚠️ {region}: {why} — no last good copy to fall back on")
+        metric('fleetmap_region_stale_seconds', 0, inc=False, region=region)
+        fresh[region] = {'html': named[region], 'count': count(model), 'at': cfg.today.isoformat(),
+                         'fingerprint': source_fingerprint(cfg, sources)}
+        if region == 'flights':
+            fresh[region]['report_period'] = named['report_period']
+        if region == 'fleet':
+            fresh[region]['status'] = build_status_html(model)
+    if 'fleet' in stale:
+        at = datetime.fromisoformat(stale['fleet']['at'])
+        msg = f"Aircraft positions and status are from {at.strftime('%-d %b %H:%M')} — the fleet data is syncing."
+        model['notices'].append({'id': hashlib.md5(f"stale|{at}".encode()).hexdigest()[:10],
+                                 'date': cfg.today.strftime("%Y-%m-%d"), 'msg': msg})
+        named['notices'] = build_notices_js(model['notices'])
+    model['stale'] = stale
+    if write:
+        os.makedirs(cfg.state_dir, exist_ok=True)
+        for p, obj in ((path, {**cache, **fresh}), (os.path.join(cfg.state_dir, STALE_FILE), stale)):
+            with open(p + ".tmp", 'w') as f:
+                json.dump(obj, f, indent=1, sort_keys=True, ensure_ascii=False)
+            os.replace(p + ".tmp", p)
+    return tuple(named[k] for k in UPDATE_ARGS)
+
+def carry_stale_records(cfg, records, stale):
+    """Keep the previous run's records for stale regions, so a failed load
+    doesn't read as everything being removed (and back again)."""
+    if not stale:
+        return records
+    try:
+        prev = json.load(open(os.path.join(cfg.state_dir, MODEL_FILE)))
+    except (OSError, ValueError):
+        return records
+    for region in stale:
+        key = GUARDED_REGIONS[region][3]
+        records[key] = prev.get(key, records[key])
+    return records
+
+# Views: several pages rendered from one model in one run. Regions are built
+# once by render() and shared; a view's template picks the regions it shows
+# simply by containing their markers. `omit` blanks regions a view must not
+# carry (the data is left out, not just hidden) and `hide` is CSS selectors
+# for the panels that held them. The first view is cfg.html_file itself, and
+# a template of None means cfg.html_file, whatever the site calls it.
+@dataclass(frozen=True)
+class View:
+    name: str
+    template: str                 # repo-relative, None: cfg.html_file
+    output: str                   # repo-relative
+    omit: tuple = ()              # region names rendered empty
+    hide: tuple = ()              # CSS selectors hidden in this view
+
+VIEWS = (
+    View('ops', None, None),
+    View('pilot', None, 'pilot.html', omit=('currency',), hide=('#currency-panel',)),
+    View('status', 'status.html', 'status.html'),
+)
+UPDATE_ARGS = ('fleet', 'flights', 'currency', 'timeline', 'notices', 'report_period')
+
+def build_status_html(model):
+    """Mobile status list: every aircraft, grouped by status, no map."""
+    fy, groups = model['pilot_by_reg'], {}
+    for h in model['helis']:
+        groups.setdefault('flying' if h['reg'] in fy else h['status'], []).append(h)
+    L = []
+    for st, label in (('flying', 'Flying'), ('parked', 'Serviceable'), ('maint', 'Maintenance'), ('preserv', 'Preservation')):
+        L.append(f'  <h4>{label} ({len(groups.get(st, []))})</h4>')
+        for h in groups.get(st, []):
+            extra = fy.get(h['reg']) or h['note'] or h['mission'] or (f"ERT {h['ert']}" if h['ert'] else '')
+            L.append(f'  <div class="status-row {st}"><span class="reg">{short_reg(h["reg"])}</span>'
+                     f'<span class="loc">{h["loc"]}</span><span class="info">{extra}</span></div>')
+    return '\n'.join(L)
+
+def view_template(cfg, view):
+    return os.path.join(cfg.repo_dir, view.template) if view.template else cfg.html_file
+
+def render_view(cfg, view, regions, model, html=None):
+    """One view's page from the shared regions ({name: text}), built on the
+    template file or on `html`, another copy of it."""
+    if html is None:
+        html = open(view_template(cfg, view)).read()
+    regs = {**regions, **{r: '' for r in view.omit}}
+    if 'notices' in view.omit:
+        regs['notices'] = build_notices_js([])
+    html = update(cfg, html, *(regs[k] for k in UPDATE_ARGS))
+    if '<!-- STATUS_START -->' in html:
+        if 'status' not in regions:
+            regions['status'] = model.get('status_html') or timed('build_status_html', build_status_html, model)
+        html = re.sub(r'<!-- STATUS_START -->.*?<!-- STATUS_END -->',
+                      lambda _: f'<!-- STATUS_START -->\n{regions["status"]}\n  <!-- STATUS_END -->', html, flags=re.DOTALL)
+    if view.hide:
+        html = html.replace('</head>', f'<style>{", ".join(view.hide)} {{ display: none !important; }}</style>\n</head>', 1)
+    return html
+
+def render_views(cfg, model, regions, views=VIEWS):
+    """{output: html} for every view after the first, sharing `regions`."""
+    named = dict(zip(UPDATE_ARGS, regions))
+    return {v.output: render_view(cfg, v, named, model) for v in views[1:]
+            if os.path.exists(view_template(cfg, v))}
+
+def build_data_files(cfg, model, regions=None):
+    """Generated files published alongside index.html: {relpath: text}."""
+    plan = model['mission_plan']
+    data = build_timeline_segments(cfg, model['missions'], plan['complete'], keep=plan['years'])
+    data.update(build_flight_day_files(cfg, model['flight_days']))
+    if regions is not None:
+        data.update(timed('views', render_views, cfg, model, regions))
+    data.update(model['foreflight_files'])
+    data.update(timed('exports', export_files, cfg, model))
+    data[SEARCH_FILE] = timed('search_index', build_search_index, cfg, model)
+    page = timed('build_sites_page', build_sites_page, cfg, model['sites'])
+    if page is not None:
+        data[SITES_PAGE] = page
+    return data
+
+def write_if_changed(path, text):
+    """Write `text` (str or bytes) to `path` unless it already holds exactly
+    that (keeps mtimes — and anything watching them — quiet)."""
+    mode = 'b' if isinstance(text, bytes) else ''
+    try:
+        if open(path, 'r' + mode).read() == text:
+            return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w' + mode) as f:
+        f.write(text)
+    return True
+
+def run(cfg, write=True):
+    """One generation: read the vault, rewrite cfg.html_file. Safe to call
+    repeatedly in one process — the clock is re-read and unchanged notes come
+    from the parse cache. With write=False nothing is written (not even
+    metrics). Returns (model, regions, html, data files)."""
+    cfg.tick()
+    t0 = time.perf_counter()
+    _metrics.clear()
+    metric('fleetmap_run_success', 0, inc=False)
+    print(f"\n🚁 THC Fleet Map Generator\n   {cfg.today.strftime('%Y-%m-%d %H:%M:%S')}\n")
+    try:
+        model = load_model(cfg)
+        regions = timed('last_good', guard_regions, cfg, model, render(cfg, model), write)
+        model['records'] = carry_stale_records(cfg, model_records(model, regions[2]), model['stale'])
+        html = timed('update', update, cfg, open(cfg.html_file).read(), *regions)
+        data = timed('data_files', build_data_files, cfg, model, regions)
+        if write:
+            open(cfg.html_file, 'w').write(html)
+            for rel, text in data.items():
+                write_if_changed(os.path.join(cfg.repo_dir, rel), text)
+            timed('sizes', track_sizes, cfg, html)
+            save_mission_index(cfg, model['mission_plan']['index'])
+            record_changes(cfg, model['records'])
+            write_scrub_audit(cfg, model['scrub_audit'], find_leaks(html))
+        collect_model_metrics(model, regions[2])
+        metric('fleetmap_run_success', 1, inc=False)
+        return model, regions, html, data
+    finally:
+        collect_source_ages(cfg)
+        metric('fleetmap_run_duration_seconds', time.perf_counter() - t0, inc=False)
+        metric('fleetmap_last_run_timestamp_seconds', round(time.time()), inc=False)
+        try:
+            if write:
+                write_metrics(cfg)
+        except OSError as e:
+            print(f"⚠️ Could not write metrics to {cfg.metrics_dir}: {e}")
+
+def publish_run(cfg, model, regions, html, data, message, dry_run=False, now=False):
+    """Publish a run's page onto origin/main, subject to coalescing."""
+    import publish
+    def onto(text, rebuild):
+        # Pages that are their own template: re-apply the regions to origin's
+        # copy, so hand edits that landed there since this clone last synced
+        # are kept, not overwritten.
+        def apply(old):
+            if old is None:
+                return text.encode()
+            new = rebuild(old.decode())
+            return new.encode() if is_substantive(old.decode(), new) else old
+        return apply
+    def stamped(text):
+        # Generated pages (the other views) carry stamps too; keep origin's
+        # copy when only those moved.
+        return lambda old: old if old is not None and not is_substantive(old.decode(), text) else text.encode()
+    named = dict(zip(UPDATE_ARGS, regions))
+    rebuilds = {v.output: lambda t, v=v: render_view(cfg, v, named, model, t) for v in VIEWS[1:] if v.template == v.output}
+    rebuilds[SITES_PAGE] = lambda t: build_sites_page(cfg, model['sites'], t)
+    files = {os.path.relpath(os.path.abspath(cfg.html_file), cfg.repo_dir): onto(html, lambda t: update(cfg, t, *regions))}
+    files.update({rel: text if isinstance(text, bytes) else onto(text, rebuilds[rel]) if rel in rebuilds
+                  else stamped(text) if rel.endswith('.html') else text.encode()
+                  for rel, text in data.items()})
+    # A site may live in a subdirectory of its repo (thc/index.html); commit
+    # paths are relative to the repo root.
+    top = publish.git(cfg.repo_dir, 'rev-parse', '--show-toplevel')
+    files = {os.path.relpath(os.path.join(os.path.realpath(cfg.repo_dir), rel), top): v for rel, v in files.items()}
+    state, snap = load_publish_state(cfg), publish_snapshot(cfg, model)
+    # Staged once: the commit that answers "anything to publish?" is the one
+    # pushed, unless the push loses a race
+    message = commit_message(message, change_set(state.get('published_records'), model['records'], cfg.today.strftime("%Y-%m-%d")))
+    staged = publish.stage(files, message, cfg.repo_dir)
+    if staged[1] is None:
+        print("⏭️  Nothing to publish — origin/main already has this content")
+        if not dry_run:
+            save_publish_state(cfg, {**state, 'published': snap, 'published_records': model['records'], 'pending_since': None})
+        return
+    why = ["--now"] if now else classify_change(state.get('published'), snap)
+    due = publish_due(cfg, state, why)
+    if due > cfg.today:
+        print(f"⏳ Routine change — coalescing, publishes at {due.strftime('%Y-%m-%d %H:%M')} or with the next urgent change")
+        if not dry_run:
+            save_publish_state(cfg, {**state, 'pending_since': state.get('pending_since') or cfg.today.isoformat()})
+        return
+    print(f"📤 Publishing now — {'; '.join(why) if why else 'coalescing window elapsed'}")
+    if publish.publish(files, message, repo=cfg.repo_dir, dry_run=dry_run, staged=staged) and not dry_run:
+        save_publish_state(cfg, {'published': snap, 'published_records': model['records'],
+                                 'last_push': cfg.today.isoformat(), 'pending_since': None})
+
+def sync_clone(cfg, *more):
+    """Reset the clone to origin/main before a publishing run, so templates,
+    sites.json and the generator itself are origin's. Local changes confined
+    to generated output (data files, page regions, stamps) of `cfg` or the
+    sites in `more` sharing its clone don't block it; anything else does,
+    and raises publish.PublishError — a clone that can't follow origin must
+    not publish. Returns the absolute paths the sync changed."""
+    import publish
+    top = publish.git(cfg.repo_dir, 'rev-parse', '--show-toplevel')
+    def regenerated(path, base):
+        rels = [os.path.relpath(os.path.join(top, path), os.path.realpath(c.repo_dir)) for c in (cfg, *more)]
+        if any(rel.split(os.sep)[0] in ('data', EXPORTS_DIR, FOREFLIGHT_DIR) for rel in rels):
+            return True
+        if not path.endswith('.html'):
+            return False
+        old = publish.read_blob(cfg.repo_dir, base, path)
+        try:
+            return old is not None and page_shell(old.decode()) == page_shell(open(os.path.join(top, path)).read())
+        except OSError:
+            return False
+    return [os.path.join(top, p) for p in publish.sync(cfg.repo_dir, regenerated=regenerated)]
+
+def restart_if_changed(changed, argv):
+    """Re-exec this command when a sync changed the generator's own code."""
+    here = os.path.dirname(os.path.realpath(__file__))
+    if any(p.endswith('.py') and os.path.dirname(os.path.realpath(p)) == here for p in changed):
+        print("🔁 Generator updated on origin — restarting with the new code")
+        sys.stdout.flush()
+        os.execv(sys.executable, [sys.executable, os.path.join(here, 'generate.py'), *argv])
+
+# Single-flight runs. launchd, the shell scripts and the watcher can all fire
+# at once; only one generator runs per clone. A caller that finds the lock
+# held records a rerun request and exits; the holder, when it finishes, runs
+# once more for every request that arrived meanwhile. N simultaneous triggers
+# therefore cost at most two runs. The request is checked again after the
+# lock is released (and the requester retries the lock after recording it),
+# so a request can't fall between the holder's last check and its exit.
+LOCK_FILE = "generate.lock"
+RERUN_FILE = "rerun-requested.json"
+
+def try_lock(cfg):
+    """Exclusive non-blocking lock on the repo, as an open file (or None if
+    another run holds it). The file then records who holds it."""
+    os.makedirs(cfg.state_dir, exist_ok=True)
+    f = open(os.path.join(cfg.state_dir, LOCK_FILE), 'a+')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    f.truncate(0)
+    f.write(json.dumps({'pid': os.getpid(), 'since': datetime.now().isoformat(timespec='seconds'),
+                        'argv': sys.argv[1:]}) + '\n')
+    f.flush()
+    return f
+
+def lock_holder(cfg):
+    try:
+        return json.loads(open(os.path.join(cfg.state_dir, LOCK_FILE)).read() or '{}')
+    except (OSError, ValueError):
+        return {}
+
+def request_rerun(cfg, publish):
+    """Ask the current holder for one more run. Keeps the earliest request
+    time; `publish` is sticky across requests."""
+    path = os.path.join(cfg.state_dir, RERUN_FILE)
+    with open(path, 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        try:
+            req = json.loads(f.read() or '{}')
+        except ValueError:
+            req = {}
+        req = {'since': req.get('since') or datetime.now().isoformat(timespec='seconds'),
+               'count': req.get('count', 0) + 1, 'publish': req.get('publish', False) or publish}
+        f.truncate(0)
+        f.write(json.dumps(req) + '\n')
+
+def take_rerun(cfg):
+    """Pop the pending rerun request, if any."""
+    path = os.path.join(cfg.state_dir, RERUN_FILE)
+    try:
+        with open(path, 'r+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            req = json.loads(f.read() or 'null')
+            os.unlink(path)
+            return req
+    except (OSError, ValueError):
+        return None
+
+def run_single_flight(cfg, once, publish=False, request_publish=None):
+    """Call once(publish) under the repo lock, then again while reruns were
+    requested (publishing if any request asked to). If another run holds the
+    lock, leave a request — publishing if `request_publish` — and return 0."""
+    lock = try_lock(cfg)
+    if lock is None:
+        h = lock_holder(cfg)
+        request_rerun(cfg, publish if request_publish is None else request_publish)
+        lock = try_lock(cfg)
+        if lock is None:
+            age = ''
+            if h.get('since'):
+                age = f", running {int((datetime.now() - datetime.fromisoformat(h['since'])).total_seconds())}s"
+            print(f"🔒 Generator busy (pid {h.get('pid', '?')}{age}) — rerun requested, it will pick this up")
+            return 0
+    print(f"🔐 Generator lock held by pid {os.getpid()}")
+    rc, first = 0, True
+    while lock:
+        try:
+            while True:
+                req = take_rerun(cfg)
+                if not first and not req:
+                    break
+                if req and not first:
+                    waited = int((datetime.now() - datetime.fromisoformat(req['since'])).total_seconds())
+                    print(f"\n🔁 Rerun for {req['count']} request(s) that arrived mid-run (waited {waited}s)")
+                publish = publish or bool(req and req.get('publish'))
+                first = False
+                rc = once(publish)
+        finally:
+            lock.close()
+        lock = try_lock(cfg) if os.path.exists(os.path.join(cfg.state_dir, RERUN_FILE)) else None
+    return rc
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['serve']:
+        import serve
+        return serve.main(argv[1:])
+    if argv[:1] == ['batch']:
+        import batch
+        return batch.main(argv[1:])
+    ap = argparse.ArgumentParser(description="Regenerate index.html from the THC vault.")
+    ap.add_argument('--publish', action='store_true',
+                    help="commit the regenerated page straight onto origin/main (see publish.py)")
+    ap.add_argument('--dry-run', action='store_true',
+                    help="with --publish: print what would publish when, don't push or save state")
+    ap.add_argument('--now', action='store_true', help="with --publish: skip coalescing, publish immediately")
+    ap.add_argument('-m', '--message', help="commit message (default: 'Fleet sync <time>')")
+    ap.add_argument('--check', action='store_true',
+                    help="write nothing; exit 1 if a run would change published content (stamps ignored), else 0")
+    ap.add_argument('--expiring', nargs='*', metavar='DATE',
+                    help=f"print currency expiring FROM [TO] (or within N days; default next {CURRENCY_LOOKAHEAD_DAYS}) and exit")
+    ap.add_argument('--validate', nargs='*', metavar='OPT',
+                    help="lint every vault note without rendering (OPT: json, all) and exit; 1 on errors")
+    args = ap.parse_args(argv)
+    cfg = Config.from_env()
+    if not os.path.isdir(cfg.vault):
+        raise SystemExit(
+            f"❌ Vault not found at {cfg.vault!r}. Set THC_VAULT to the vault path, "
+            f"or check that one of the iCloud locations exists."
+        )
+    if args.validate is not None:
+        import validate
+        return validate.main(cfg, args.validate)
+    if args.expiring is not None:
+        cfg.tick()
+        start, end = cfg.today, cfg.today + timedelta(days=CURRENCY_LOOKAHEAD_DAYS)
+        if len(args.expiring) == 1 and args.expiring[0].isdigit():
+            end = cfg.today + timedelta(days=int(args.expiring[0]))
+        elif args.expiring:
+            start, end = (args.expiring + [end])[:2]
+        with contextlib.redirect_stdout(sys.stderr):
+            curr = load_currency(cfg)
+        print_expiring(build_expiry_index(curr), start, end)
+        return 0
+    if args.check:
+        with contextlib.redirect_stdout(sys.stderr):
+            _, _, html, data = run(cfg, write=False)
+        changes = changed_files(cfg, html, data)
+        for rel, regions in sorted(changes.items()):
+            print(f"📝 {rel}" + (f" ({', '.join(regions)})" if regions else ""))
+        if not changes:
+            print("✅ No change to published content")
+        return 1 if changes else 0
+
+    def once(do_publish):
+        if do_publish and not args.dry_run:
+            import publish
+            try:
+                changed = sync_clone(cfg)
+            except publish.PublishError as e:
+                print(f"❌ Can't sync the clone to origin/main — {e}. Not generating or publishing; "
+                      f"fix the clone (git status) and rerun.")
+                return 1
+            restart_if_changed(changed, argv)
+        model, regions, html, data = run(cfg)
+        if do_publish:
+            import publish
+            try:
+                publish_run(cfg, model, regions, html, data, args.message or f"Fleet sync {cfg.today.strftime('%Y-%m-%d %H:%M')}",
+                            dry_run=args.dry_run, now=args.now)
+            except publish.PublishError as e:
+                print(f"❌ Publish failed: {e}")
+                return 1
+        print(f"\n✅ Done!")
+        return 0
+    return run_single_flight(cfg, once, args.publish, request_publish=args.publish and not args.dry_run)
+
+if __name__ == "__main__": sys.exit(main())
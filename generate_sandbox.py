@@ -2,19 +2,12 @@
 """Scratch / experimental copy of generate.py. Not invoked by the launchd
 jobs (morning / afternoon / push) — those run generate.py. Safe to edit
 when prototyping changes before promoting them to generate.py."""
-import os, re, glob
+import os, re, sys, glob
 from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
 
-VAULT = "/thc-vault"
-HELIS_DIR = f"{VAULT}/Helicopters"
-PILOTS_DIR = f"{VAULT}/Pilots"
-FLIGHTS_FILE = f"{VAULT}/Flights Schedule.md"
-MISSIONS_DIR = f"{VAULT}/Missions"
-HTML_FILE = "/willy/FleetMapAndTimeline/index.html"
-# Use Saudi Arabia timezone, then strip tz for naive comparisons
-_now = datetime.now(ZoneInfo("Asia/Riyadh"))
-TODAY = datetime(_now.year, _now.month, _now.day, _now.hour, _now.minute, _now.second)
+# Same Config as production (vault paths, output path, clock), so the sandbox
+# reads the vault layout generate.py does and importing it does no I/O.
+from generate import Config
 
 def parse_fm(fp):
     d = {}
@@ -71,9 +64,9 @@ def parse_fm(fp):
     except: pass
     return d
 
-def load_helis():
+def load_helis(cfg):
     h = []
-    for f in sorted(glob.glob(f"{HELIS_DIR}/HZHC*.md")):
+    for f in sorted(glob.glob(f"{cfg.helis_dir}/HZHC*.md")):
         d = parse_fm(f)
         raw_status = d.get('status', 'Parked')
         st = raw_status.lower()
@@ -107,11 +100,11 @@ def is_h125(reg_field):
         return 50 <= num <= 70
     return False
 
-def load_flights():
+def load_flights(cfg):
     fl, fy, fr = [], {}, {}  # fr = flight routes
     try:
-        t = open(FLIGHTS_FILE).read()
-        ts = TODAY.strftime("%Y-%m-%d")
+        t = open(cfg.flights_file).read()
+        ts = cfg.today.strftime("%Y-%m-%d")
         for ln in t.split('\n'):
             if ln.startswith(ts) and '|' in ln:
                 p = [x.strip() for x in ln.split('|')]
@@ -131,9 +124,9 @@ def load_flights():
     print(f"✅ Loaded {len(fl)} flights")
     return fl, fy, fr
 
-def load_currency():
+def load_currency(cfg):
     c = []
-    for pd in glob.glob(f"{PILOTS_DIR}/*/"):
+    for pd in glob.glob(f"{cfg.pilots_dir}/*/"):
         nm = os.path.basename(pd.rstrip('/'))
         pf = os.path.join(pd, f"{nm}.md")
         if os.path.exists(pf):
@@ -149,9 +142,9 @@ def load_currency():
     print(f"✅ Loaded {len(c)} currency records")
     return c
 
-def load_missions():
+def load_missions(cfg):
     m = []
-    for pat in [f"{MISSIONS_DIR}/*.md", f"{MISSIONS_DIR}/Past Missions/*.md"]:
+    for pat in [f"{cfg.missions_dir}/*.md", f"{cfg.missions_dir}/Past Missions/*.md"]:
         for f in glob.glob(pat):
             d = parse_fm(f)
             t = d.get('title', os.path.basename(f).replace('.md',''))
@@ -176,7 +169,7 @@ def load_missions():
             if raw_status in ('past', 'complete'):
                 auto_status = raw_status
             elif start:
-                ts = TODAY.strftime("%Y-%m-%d")
+                ts = cfg.today.strftime("%Y-%m-%d")
                 if end and end < ts:
                     auto_status = 'past'
                 elif start <= ts and (not end or end >= ts):
@@ -215,12 +208,12 @@ def build_fleet_js(helis, fy, fr):
     print(f"✅ Fleet: {cnt['parked']} serviceable, {cnt['flying']} flying, {cnt['maint']} maint")
     return '\n'.join(L)
 
-def build_flights_html():
+def build_flights_html(cfg):
     L = []
-    ts = TODAY.strftime("%Y-%m-%d")
+    ts = cfg.today.strftime("%Y-%m-%d")
     current_section_is_past = False
     try:
-        t = open(FLIGHTS_FILE).read()
+        t = open(cfg.flights_file).read()
         for ln in t.split('\n'):
             if ln.startswith('## '):
                 # Check if this section header is for a past date
@@ -249,9 +242,10 @@ def build_flights_html():
     except: pass
     return '\n'.join(L) if L else '  <div>No flights scheduled</div>'
 
-def build_currency_html(curr):
+def build_currency_html(cfg, curr):
     L = []
-    this_mo = TODAY.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    today = cfg.today
+    this_mo = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     this_mo_end = (this_mo + timedelta(days=32)).replace(day=1)
     next_mo = this_mo_end
     next_mo_end = (next_mo + timedelta(days=32)).replace(day=1)
@@ -296,7 +290,7 @@ def build_currency_html(curr):
                 exp = datetime(exp_year, exp_month, 1)
                 exp_end = (exp + timedelta(days=32)).replace(day=1)  # First of next month
                 first_name = c['name'].split()[0] + ' ' + c['name'].split()[-1][0] if len(c['name'].split()) > 1 else c['name'].split()[0]
-                if TODAY >= exp_end:
+                if today >= exp_end:
                     # Expired (we're past the expiry month)
                     rems_issues.append((first_name, exp.strftime("%b %Y"), 'danger', 'expired'))
                 elif this_mo <= exp < this_mo_end:
@@ -310,7 +304,7 @@ def build_currency_html(curr):
     
     # Medical - 12 months from check date
     med_issues = []
-    this_month_start = TODAY.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    this_month_start = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     this_month_end = (this_month_start + timedelta(days=32)).replace(day=1)
     for c in curr:
         m = c.get('medical','')
@@ -335,7 +329,8 @@ def build_currency_html(curr):
     return '\n'.join(L)
 
 
-def build_timeline(missions):
+def build_timeline(cfg, missions):
+    today = cfg.today
     tbd = [m for m in missions if not m['date']]
     dated = [m for m in missions if m['date']]
     if not dated: return "<!-- No missions -->"
@@ -425,8 +420,8 @@ def build_timeline(missions):
             L.append(f'        <div class="week-tick" style="left:{pct}%;"></div>')
         c += timedelta(days=1)
     
-    if mn <= TODAY <= mx: 
-        L.append(f'        <div class="today-marker" style="left:{round(((TODAY-mn).days/td)*100,1)}%;"></div>')
+    if mn <= today <= mx: 
+        L.append(f'        <div class="today-marker" style="left:{round(((today-mn).days/td)*100,1)}%;"></div>')
     
     L.append('      </div>')
     L.append('      <div class="lanes-below">')
@@ -439,24 +434,33 @@ def build_timeline(missions):
     L.append('    </div>')
     return '\n'.join(L)
 
-def update(html, fleet, flights, curr, timeline):
+def update(cfg, html, fleet, flights, curr, timeline):
+    today = cfg.today
     html = re.sub(r'const fleet = \[.*?\];', fleet, html, flags=re.DOTALL)
     html = re.sub(r'<!-- FLIGHTS_START -->.*?<!-- FLIGHTS_END -->', f'<!-- FLIGHTS_START -->\n{flights}\n  <!-- FLIGHTS_END -->', html, flags=re.DOTALL)
     html = re.sub(r'<!-- CURRENCY_START -->.*?<!-- CURRENCY_END -->', f'<!-- CURRENCY_START -->\n{curr}\n  <!-- CURRENCY_END -->', html, flags=re.DOTALL)
     html = re.sub(r'<!-- TIMELINE_START -->.*?<!-- TIMELINE_END -->', f'<!-- TIMELINE_START -->\n{timeline}\n    <!-- TIMELINE_END -->', html, flags=re.DOTALL)
-    html = re.sub(r'<title>THC Fleet Map.*?</title>', f'<title>THC Fleet Map — {TODAY.strftime("%-d %b %Y")}</title>', html)
-    html = re.sub(r'<!-- LAST_UPDATED -->.*?<!-- /LAST_UPDATED -->', f'<!-- LAST_UPDATED -->{TODAY.strftime("%-d %b %Y %H:%M")}<!-- /LAST_UPDATED -->', html)
+    html = re.sub(r'<title>THC Fleet Map.*?</title>', f'<title>THC Fleet Map — {today.strftime("%-d %b %Y")}</title>', html)
+    html = re.sub(r'<!-- LAST_UPDATED -->.*?<!-- /LAST_UPDATED -->', f'<!-- LAST_UPDATED -->{today.strftime("%-d %b %Y %H:%M")}<!-- /LAST_UPDATED -->', html)
     return html
 
-def main():
-    print(f"\n🚁 THC Fleet Map Generator\n   {TODAY.strftime('%Y-%m-%d %H:%M:%S')}\n")
-    h = load_helis()
-    fl, fy, fr = load_flights()
-    c = load_currency()
-    m = load_missions()
-    html = open(HTML_FILE).read()
-    html = update(html, build_fleet_js(h, fy, fr), build_flights_html(), build_currency_html(c), build_timeline(m))
-    open(HTML_FILE, 'w').write(html)
+def run(cfg):
+    cfg.tick()
+    print(f"\n🚁 THC Fleet Map Generator\n   {cfg.today.strftime('%Y-%m-%d %H:%M:%S')}\n")
+    h = load_helis(cfg)
+    fl, fy, fr = load_flights(cfg)
+    c = load_currency(cfg)
+    m = load_missions(cfg)
+    html = open(cfg.html_file).read()
+    html = update(cfg, html, build_fleet_js(h, fy, fr), build_flights_html(cfg), build_currency_html(cfg, c), build_timeline(cfg, m))
+    open(cfg.html_file, 'w').write(html)
     print(f"\n✅ Done!")
 
+def main():
+    # Never the tracked index.html by default: pass an output path to write one.
+    out = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "index.sandbox.html")
+    if not os.path.exists(out):
+        open(out, 'w').write(open(Config.from_env().html_file).read())
+    run(Config.from_env(html_file=out))
+
 if __name__ == "__main__": main()
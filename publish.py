@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""Publish generated files straight onto origin/main with git plumbing.
+
+The shell scripts used to pull --rebase, diff, add, commit and push from the
+working tree — every run was several porcelain invocations, and a conflicted
+autostash once shipped conflict markers to the live page (2026-08-16). This
+builds the commit from the generated bytes instead:
+
+    fetch origin/main → hash-object → temp-index tree update → commit-tree
+    → push --force-with-lease=main:<fetched sha>
+
+The working tree, the real index and local branches are never touched, so
+there is nothing to rebase and nothing to conflict. If someone else pushed in
+between, the lease rejects the push and we rebuild on the new tip and retry.
+
+Generated commits roll. Each carries a `Generated-by:` trailer, and when
+origin's tip is one, the new commit replaces it (same parent) instead of
+stacking on top. main is therefore hand-edited history plus at most one
+generated commit, and superseded copies of index.html become unreachable
+instead of being cloned forever. `compact` rewrites existing history the
+same way, once.
+
+Usage:
+    python3 publish.py [-m MSG] [--dry-run] [--remote R] [--branch B] PATH...
+    python3 publish.py compact [--yes] [--remote R] [--branch B]
+"""
+import os, re, sys, time, tempfile, subprocess, argparse
+
+REMOTE = 'origin'
+BRANCH = 'main'
+RETRIES = 4
+# Push rejections that mean the remote moved under us (retry on the new tip);
+# anything else — hooks, permissions, protection — is reported as is
+_LOST_RACE = re.compile(r'stale info|fetch first|non-fast-forward')
+_CONFLICT = re.compile(rb'^(<<<<<<< |>>>>>>> |=======$)', re.M)
+TRAILER = 'Generated-by: generate.py'
+# Exact subjects of generated commits from before the trailer existed:
+# fleetpush.sh, the watcher and auto-update.sh respectively. A hand commit
+# that merely starts "Auto-update…" (e.g. "Auto-update.sh: …") isn't one.
+LEGACY_SUBJECTS = re.compile(r'^Fleet sync \d{4}-|^Auto-update fleet map \(|^Auto-update: \d{1,2} \w{3} \d{4}')
+
+class PublishError(Exception):
+    pass
+
+def git(repo, *args, data=None, env=None, check=True):
+    """Run a git command in `repo` and return stripped stdout (str)."""
+    r = subprocess.run(['git', '-C', repo, *args], input=data, capture_output=True,
+                       env={**os.environ, **(env or {})})
+    if check and r.returncode != 0:
+        raise PublishError(f"git {args[0]} failed: {r.stderr.decode(errors='replace').strip()}")
+    return r.stdout.decode().strip() if check else r
+
+def fetch(repo, remote=REMOTE, branch=BRANCH):
+    """Fetch `branch` into refs/remotes/<remote>/<branch> and return its sha."""
+    git(repo, 'fetch', '--quiet', remote, f'+refs/heads/{branch}:refs/remotes/{remote}/{branch}')
+    return git(repo, 'rev-parse', f'refs/remotes/{remote}/{branch}')
+
+def read_blob(repo, rev, path):
+    """Bytes of `path` at `rev`, or None if it does not exist there."""
+    r = git(repo, 'cat-file', 'blob', f'{rev}:{path}', check=False)
+    return r.stdout if r.returncode == 0 else None
+
+def is_generated(repo, rev):
+    """True if `rev` is a generated (publish) commit rather than a hand edit:
+    it has the trailer in its trailer block (not just quoted in the body), or
+    a legacy generated subject."""
+    key, value = TRAILER.split(': ')
+    trailers = git(repo, 'log', '-1', f'--format=%(trailers:key={key},valueonly)', rev).split('\n')
+    return value in trailers or bool(LEGACY_SUBJECTS.match(git(repo, 'log', '-1', '--format=%s', rev)))
+
+def sync(repo='.', remote=REMOTE, branch=BRANCH, regenerated=lambda path, base: False):
+    """Reset the clone's checked-out `branch` to the fetched remote tip, so a
+    run generates from origin's templates and code rather than whatever this
+    clone last pulled. Refuses (PublishError) unless `branch` is checked out,
+    every local commit missing from the remote is a generated one, and every
+    tracked file changed since the merge base with the remote — committed
+    or not — satisfies `regenerated(path, base)`: output the run is about
+    to rewrite anyway. Returns the root-relative paths the reset changed."""
+    tip = fetch(repo, remote, branch)
+    head = git(repo, 'rev-parse', 'HEAD')
+    if head == tip:
+        return []
+    cur = git(repo, 'symbolic-ref', '--quiet', '--short', 'HEAD', check=False)
+    if cur.returncode or cur.stdout.decode().strip() != branch:
+        raise PublishError(f"clone is not on {branch}")
+    local = [c for c in git(repo, 'rev-list', f'{tip}..{head}').split() if not is_generated(repo, c)]
+    if local:
+        raise PublishError(f"{len(local)} local commit(s) not on {remote}/{branch}")
+    base = git(repo, 'merge-base', tip, head)
+    kept = [p for p in git(repo, 'diff', '--no-relative', '--name-only', '-z', base).split('\0') if p and not regenerated(p, base)]
+    if kept:
+        raise PublishError(f"local changes to {', '.join(kept)} not on {remote}/{branch}")
+    changed = git(repo, 'diff', '--no-relative', '--name-only', '-z', head, tip).split('\0')
+    git(repo, 'reset', '--quiet', '--hard', tip)
+    print(f"⬇️  Clone synced to {remote}/{branch} ({head[:8]} → {tip[:8]})")
+    return [p for p in changed if p]
+
+def build_commit(repo, tip, files, message, parent=None):
+    """Write `files` ({path: bytes}) as blobs, lay them over `tip`'s tree in a
+    throwaway index and commit the result on `parent` (default `tip`).
+    Returns the new commit sha, or None when `tip`'s tree would not change.
+    If the result is exactly `parent`'s tree, returns `parent` itself."""
+    parent = parent or tip
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {'GIT_INDEX_FILE': os.path.join(tmp, 'index')}
+        git(repo, 'read-tree', tip, env=env)
+        for path, data in sorted(files.items()):
+            blob = git(repo, 'hash-object', '-w', '--stdin', data=data)
+            git(repo, 'update-index', '--add', '--cacheinfo', f'100644,{blob},{path}', env=env)
+        tree = git(repo, 'write-tree', env=env)
+    if tree == git(repo, 'rev-parse', f'{tip}^{{tree}}'):
+        return None
+    if parent != tip and tree == git(repo, 'rev-parse', f'{parent}^{{tree}}'):
+        return parent
+    return git(repo, 'commit-tree', tree, '-p', parent, data=message.encode())
+
+def stage(files, message, repo='.', remote=REMOTE, branch=BRANCH):
+    """Fetch the remote tip and build (but don't push) the commit for `files`,
+    replacing the tip if it is itself a generated commit.
+    Returns (tip sha, new commit sha or None — nothing would change)."""
+    old = fetch(repo, remote, branch)
+    out = {}
+    for path, v in files.items():
+        out[path] = v(read_blob(repo, old, path)) if callable(v) else v
+        if path.endswith('.html') and _CONFLICT.search(out[path]):
+            raise PublishError(f"{path} contains git conflict markers — refusing to publish")
+    parent = git(repo, 'rev-parse', f'{old}^') if is_generated(repo, old) and git(repo, 'rev-list', '--count', old) != '1' else old
+    return old, build_commit(repo, old, out, f"{message.rstrip()}\n\n{TRAILER}\n", parent)
+
+def publish(files, message, repo='.', remote=REMOTE, branch=BRANCH, retries=RETRIES, dry_run=False, staged=None):
+    """Commit `files` on top of the fetched remote branch and push it.
+
+    `files` maps repo-relative paths to bytes, or to a callable taking the
+    path's current bytes on the remote tip (None if absent) and returning the
+    bytes to publish — so a lost race re-applies the change to the new tip
+    instead of overwriting whatever landed there. `staged` is stage()'s
+    result for the same files and message, pushed as is on the first
+    attempt; only a lost race stages again. Returns the pushed commit sha,
+    or None if nothing changed."""
+    t0 = time.time()
+    for attempt in range(1, retries + 1):
+        old, commit = staged if staged and attempt == 1 else stage(files, message, repo, remote, branch)
+        if not commit:
+            print(f"⏭️  Nothing to publish — {remote}/{branch} already has this content")
+            return None
+        if dry_run:
+            print(f"🔍 DRY RUN — would push {commit[:8]} onto {remote}/{branch} ({old[:8]})")
+            return commit
+        r = git(repo, 'push', '--porcelain', f'--force-with-lease=refs/heads/{branch}:{old}',
+                remote, f'{commit}:refs/heads/{branch}', check=False)
+        if r.returncode == 0:
+            how = "replacing" if git(repo, 'merge-base', '--is-ancestor', old, commit, check=False).returncode else "on"
+            print(f"🚀 Pushed {commit[:8]} to {remote}/{branch} ({how} {old[:8]}) in {time.time() - t0:.1f}s")
+            return commit
+        report = (r.stdout + r.stderr).decode(errors='replace').strip()
+        if not _LOST_RACE.search(report):
+            raise PublishError(f"git push failed: {report}")
+        if attempt == retries:
+            raise PublishError(f"gave up after {retries} attempts — {remote}/{branch} kept moving: {report}")
+        print(f"↻ {remote}/{branch} moved during publish (attempt {attempt}/{retries}) — rebuilding on the new tip")
+        time.sleep(min(2 ** attempt, 10))
+
+def compact(repo='.', remote=REMOTE, branch=BRANCH, yes=False):
+    """Rewrite the remote branch's first-parent history without generated
+    commits: each hand commit is re-created with its own tree, author and
+    message on top of the previous one, so every hand-edited state is kept
+    exactly (generated changes between them fold into the next hand commit)
+    and a generated tip becomes the one rolling commit. Merges are
+    linearised. Pushes only with yes=True. Returns the new tip (or None)."""
+    old = fetch(repo, remote, branch)
+    revs = git(repo, 'rev-list', '--first-parent', '--reverse', old).split()
+    fmt = '%an%x00%ae%x00%aI%x00%cn%x00%ce%x00%cI%x00%B'
+    tip, kept = None, 0
+    for i, rev in enumerate(revs):
+        last = i == len(revs) - 1
+        if is_generated(repo, rev) and not last:
+            continue
+        an, ae, ad, cn, ce, cd, msg = git(repo, 'log', '-1', f'--format={fmt}', rev).split('\0', 6)
+        env = {'GIT_AUTHOR_NAME': an, 'GIT_AUTHOR_EMAIL': ae, 'GIT_AUTHOR_DATE': ad,
+               'GIT_COMMITTER_NAME': cn, 'GIT_COMMITTER_EMAIL': ce, 'GIT_COMMITTER_DATE': cd}
+        tree = git(repo, 'rev-parse', f'{rev}^{{tree}}')
+        if tip and tree == git(repo, 'rev-parse', f'{tip}^{{tree}}'):
+            continue
+        tip = git(repo, 'commit-tree', tree, *(['-p', tip] if tip else []), data=msg.encode() + b'\n', env=env)
+        kept += 1
+    objs = lambda rev: len(git(repo, 'rev-list', '--objects', rev).splitlines())
+    print(f"🗜️  {remote}/{branch}: {len(revs)} commits → {kept}, {objs(old)} objects → {objs(tip)}")
+    if git(repo, 'rev-parse', f'{old}^{{tree}}') != git(repo, 'rev-parse', f'{tip}^{{tree}}'):
+        raise PublishError("compacted tip tree differs from the original — not pushing")
+    if not yes:
+        print(f"🔍 DRY RUN — would force {remote}/{branch} {old[:8]} → {tip[:8]}; rerun with --yes")
+        return None
+    r = git(repo, 'push', '--porcelain', f'--force-with-lease=refs/heads/{branch}:{old}',
+            remote, f'{tip}:refs/heads/{branch}', check=False)
+    if r.returncode != 0:
+        raise PublishError(f"git push failed: {(r.stdout + r.stderr).decode(errors='replace').strip()}")
+    print(f"🚀 {remote}/{branch} is now {tip[:8]}. Other clones: git fetch && git reset --hard {remote}/{branch}")
+    return tip
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['compact']:
+        ap = argparse.ArgumentParser(prog='publish.py compact',
+                                     description="Drop generated commits from the remote branch's history.")
+        ap.add_argument('--repo', default=os.path.dirname(os.path.abspath(__file__)))
+        ap.add_argument('--remote', default=REMOTE)
+        ap.add_argument('--branch', default=BRANCH)
+        ap.add_argument('--yes', action='store_true', help="actually force-push the compacted history")
+        a = ap.parse_args(argv[1:])
+        try:
+            compact(a.repo, a.remote, a.branch, a.yes)
+        except PublishError as e:
+            print(f"❌ {e}")
+            return 1
+        return 0
+    ap = argparse.ArgumentParser(description="Publish files from the working tree onto the remote branch.")
+    ap.add_argument('paths', nargs='+')
+    ap.add_argument('-m', '--message', default='Fleet sync')
+    ap.add_argument('--repo', default=os.path.dirname(os.path.abspath(__file__)))
+    ap.add_argument('--remote', default=REMOTE)
+    ap.add_argument('--branch', default=BRANCH)
+    ap.add_argument('--dry-run', action='store_true')
+    a = ap.parse_args(argv)
+    files = {}
+    for p in a.paths:
+        rel = os.path.relpath(os.path.abspath(p), a.repo)
+        files[rel] = open(os.path.join(a.repo, rel), 'rb').read()
+    try:
+        publish(files, a.message, a.repo, a.remote, a.branch, dry_run=a.dry_run)
+    except PublishError as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__": sys.exit(main())
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Local preview: render the page in memory and serve it with live reload.
+
+    python3 generate.py serve [--port 8000] [--host 127.0.0.1]
+
+The vault stays parsed in generate's in-process caches. A poller watches the
+vault, the hand-edited templates (index.html, status.html, stadiums.html,
+sites.json, training_areas.json) and generate.py itself; on any change the
+pages are re-rendered with run(cfg, write=False) — nothing in the working
+tree is written — and every open browser is told to reload over a
+server-sent-events channel (/__events). Edits to generate.py are picked up by reloading the
+module; if it fails to import, the last good build keeps being served.
+"""
+import os, io, sys, time, argparse, importlib, threading, traceback, contextlib
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import generate
+
+POLL = 0.2                       # seconds between change scans
+TEMPLATES = ('index.html', 'status.html', 'stadiums.html', 'sites.json', 'training_areas.json', 'generate.py')
+_RELOAD_JS = ("<script>new EventSource('/__events').addEventListener('reload', function() "
+              "{ location.reload(); });</script>\n")
+
+class Preview:
+    """The current build plus a version counter browsers wait on."""
+    def __init__(self, cfg):
+        self.cfg, self.mod = cfg, generate
+        self.files, self.version, self.error, self.warnings = {}, 0, None, []
+        self.changed = threading.Condition()
+
+    def signature(self):
+        """(path, mtime_ns, size) of every watched file — any edit, add or
+        delete changes it."""
+        sig = []
+        for root, dirs, names in os.walk(self.cfg.vault):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for n in names:
+                if n.endswith('.md'):
+                    st = os.stat(os.path.join(root, n))
+                    sig.append((root, n, st.st_mtime_ns, st.st_size))
+        for n in TEMPLATES:
+            p = os.path.join(self.cfg.repo_dir, n)
+            if os.path.exists(p):
+                st = os.stat(p)
+                sig.append((n, st.st_mtime_ns, st.st_size))
+        return hash(tuple(sorted(sig)))
+
+    def build(self, reload_code=False):
+        t0 = time.perf_counter()
+        try:
+            if reload_code:
+                self.mod = importlib.reload(self.mod)
+            with contextlib.redirect_stdout(io.StringIO()) as log:
+                _, _, html, data = self.mod.run(self.cfg, write=False)
+        except Exception:
+            self.error = traceback.format_exc()
+            print(f"❌ Build failed — still serving the last good page\n{self.error}")
+            return
+        rel = os.path.relpath(os.path.abspath(self.cfg.html_file), self.cfg.repo_dir)
+        live = lambda page: page.replace('</body>', _RELOAD_JS + '</body>', 1)
+        files = {rel: live(html).encode(),
+                 **{k: v if isinstance(v, bytes) else (live(v) if k.endswith('.html') else v).encode() for k, v in data.items()}}
+        warnings = [ln for ln in log.getvalue().splitlines() if ln.lstrip().startswith(('⚠️', '❌'))]
+        with self.changed:
+            self.files, self.error = files, None
+            self.version += 1
+            self.changed.notify_all()
+        print(f"🔄 Built v{self.version} in {(time.perf_counter() - t0) * 1000:.0f} ms"
+              + (f" — {len(warnings)} warning(s)" if warnings else ""))
+        if warnings != self.warnings:     # only when they change, not every build
+            for w in warnings:
+                print(f"   {w.strip()}")
+            self.warnings = warnings
+
+    def watch(self):
+        sig = self.signature()
+        code = os.stat(os.path.join(self.cfg.repo_dir, 'generate.py')).st_mtime_ns
+        while True:
+            time.sleep(POLL)
+            try:
+                new = self.signature()
+            except OSError:
+                continue   # a file vanished mid-scan (editor save); look again
+            if new != sig:
+                sig = new
+                now = os.stat(os.path.join(self.cfg.repo_dir, 'generate.py')).st_mtime_ns
+                self.build(reload_code=now != code)
+                code = now
+
+def handler(preview):
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, directory=preview.cfg.repo_dir, **kw)
+
+        def log_message(self, *a):
+            pass
+
+        def do_GET(self):
+            path = self.path.split('?', 1)[0].lstrip('/') or 'index.html'
+            if path == '__events':
+                return self.events()
+            body = preview.files.get(path)
+            if body is None:
+                return super().do_GET()
+            self.send_response(200)
+            self.send_header('Content-Type', self.guess_type(path))
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def events(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            seen = preview.version
+            try:
+                while True:
+                    with preview.changed:
+                        preview.changed.wait_for(lambda: preview.version != seen, timeout=15)
+                        v = preview.version
+                    if v != seen:
+                        seen = v
+                        self.wfile.write(f"event: reload\ndata: {v}\n\n".encode())
+                    else:
+                        self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+    return Handler
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='generate.py serve', description="Preview the page with live reload.")
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8000)
+    a = ap.parse_args(argv)
+    cfg = generate.Config.from_env()
+    if not os.path.isdir(cfg.vault):
+        raise SystemExit(f"❌ Vault not found at {cfg.vault!r}. Set THC_VAULT to the vault path.")
+    preview = Preview(cfg)
+    preview.build()
+    if not preview.files:
+        return 1
+    threading.Thread(target=preview.watch, daemon=True).start()
+    server = ThreadingHTTPServer((a.host, a.port), handler(preview))
+    server.daemon_threads = True
+    print(f"👀 Serving http://{a.host}:{a.port}/ — vault {cfg.vault}\n   Edit the vault, index.html or generate.py; Ctrl-C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+    return 0
+
+if __name__ == "__main__": sys.exit(main())
@@ -0,0 +1,170 @@
+"""publish.py against a local bare origin: pushes, lease races, the rolling
+generated commit, compact and sync."""
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import publish
+
+GEN = f"Fleet sync\n\n{publish.TRAILER}\n"
+_git = publish.git                     # the real one, for set-up behind monkeypatches
+
+@pytest.fixture(autouse=True)
+def git_env(monkeypatch):
+    for k in ('AUTHOR', 'COMMITTER'):
+        monkeypatch.setenv(f'GIT_{k}_NAME', 'Test')
+        monkeypatch.setenv(f'GIT_{k}_EMAIL', 'test@example.com')
+    monkeypatch.setenv('GIT_CONFIG_NOSYSTEM', '1')
+    monkeypatch.setattr(publish.time, 'sleep', lambda s: None)
+
+def git(repo, *args):
+    return _git(str(repo), *args)
+
+def commit(repo, files, message, push=True):
+    for path, text in files.items():
+        with open(os.path.join(repo, path), 'w') as f:
+            f.write(text)
+    git(repo, 'add', *files)
+    git(repo, 'commit', '--quiet', '-m', message)
+    if push:
+        git(repo, 'push', '--quiet', 'origin', 'HEAD:main')
+    return git(repo, 'rev-parse', 'HEAD')
+
+def clone(origin, path):
+    git(path.parent, 'clone', '--quiet', str(origin), str(path))
+    return path
+
+@pytest.fixture
+def origin(tmp_path):
+    """(bare origin, a clone of it) with one hand commit on main."""
+    bare = tmp_path / 'origin.git'
+    git(tmp_path, 'init', '--quiet', '--bare', '-b', 'main', str(bare))
+    work = tmp_path / 'work'
+    git(tmp_path, 'init', '--quiet', '-b', 'main', str(work))
+    git(work, 'remote', 'add', 'origin', str(bare))
+    commit(work, {'index.html': 'page v1\n', 'auto-update.sh': 'echo v1\n'}, 'Initial page')
+    return bare, work
+
+def tip(bare):
+    return git(bare, 'rev-parse', 'refs/heads/main')
+
+def show(bare, path, rev='main'):
+    return git(bare, 'show', f'{rev}:{path}')
+
+def subjects(bare):
+    return git(bare, 'log', '--format=%s', 'main').splitlines()
+
+def test_plain_push(origin):
+    bare, work = origin
+    before = tip(bare)
+    pushed = publish.publish({'index.html': b'page v2\n'}, 'Fleet sync', repo=str(work))
+    assert pushed == tip(bare)
+    assert git(bare, 'rev-parse', f'{pushed}^') == before
+    assert show(bare, 'index.html') == 'page v2'
+    assert publish.is_generated(str(bare), pushed)
+
+def test_nothing_to_publish(origin):
+    bare, work = origin
+    before = tip(bare)
+    assert publish.publish({'index.html': b'page v1\n'}, 'Fleet sync', repo=str(work)) is None
+    assert tip(bare) == before
+
+def test_lost_lease_rebuilds_on_new_tip(origin, tmp_path, monkeypatch):
+    bare, work = origin
+    other = clone(bare, tmp_path / 'other')
+    pushes = []
+    def racing_git(repo, *args, **kw):
+        if args[0] == 'push':
+            pushes.append(args)
+            if len(pushes) == 1:
+                # someone else lands a hand edit between our fetch and push
+                commit(other, {'auto-update.sh': 'echo v2\n'}, 'Raise the ping timeout')
+        return _git(repo, *args, **kw)
+    monkeypatch.setattr(publish, 'git', racing_git)
+    pushed = publish.publish({'index.html': lambda old: old + b'generated\n'}, 'Fleet sync', repo=str(work))
+    assert len(pushes) == 2
+    assert pushed == tip(bare)
+    assert git(bare, 'log', '-1', '--format=%s', f'{pushed}^') == 'Raise the ping timeout'
+    assert show(bare, 'auto-update.sh') == 'echo v2'
+    assert show(bare, 'index.html') == 'page v1\ngenerated'
+
+def test_rejected_push_fails_without_retrying(origin):
+    bare, work = origin
+    hook = bare / 'hooks' / 'pre-receive'
+    hook.write_text('#!/bin/sh\necho "main is protected" >&2\nexit 1\n')
+    hook.chmod(0o755)
+    with pytest.raises(publish.PublishError, match='main is protected'):
+        publish.publish({'index.html': b'page v2\n'}, 'Fleet sync', repo=str(work))
+
+def test_generated_tip_is_replaced(origin):
+    bare, work = origin
+    base = tip(bare)
+    first = publish.publish({'index.html': b'page v2\n'}, 'Fleet sync 1', repo=str(work))
+    second = publish.publish({'index.html': b'page v3\n'}, 'Fleet sync 2', repo=str(work))
+    assert second != first
+    assert git(bare, 'rev-parse', f'{second}^') == base
+    assert subjects(bare) == ['Fleet sync 2', 'Initial page']
+    assert show(bare, 'index.html') == 'page v3'
+
+def test_hand_commit_after_generated_is_kept(origin, tmp_path):
+    bare, work = origin
+    generated = publish.publish({'index.html': b'page v2\n'}, 'Fleet sync 1', repo=str(work))
+    other = clone(bare, tmp_path / 'other')
+    hand = commit(other, {'auto-update.sh': 'echo v2\n'}, 'Raise the ping timeout')
+    pushed = publish.publish({'index.html': b'page v3\n'}, 'Fleet sync 2', repo=str(work))
+    assert git(bare, 'rev-parse', f'{pushed}^') == hand
+    assert git(bare, 'rev-parse', f'{hand}^') == generated
+    assert subjects(bare) == ['Fleet sync 2', 'Raise the ping timeout', 'Fleet sync 1', 'Initial page']
+
+def test_trailer_quoted_in_body_is_a_hand_commit(origin):
+    bare, work = origin
+    quoted = commit(work, {'README.md': 'docs\n'},
+                    f"Document rolling commits\n\nGenerated commits carry\n\n    {publish.TRAILER}\n\nin their message.")
+    legacyish = commit(work, {'auto-update.sh': 'echo v2\n'}, 'Auto-update.sh: raise the ping timeout')
+    assert not publish.is_generated(str(bare), quoted)
+    assert not publish.is_generated(str(bare), legacyish)
+    legacy = commit(work, {'index.html': 'page v2\n'}, 'Auto-update: 3 Aug 2026 10:00')
+    assert publish.is_generated(str(bare), legacy)
+
+def test_compact_keeps_tip_tree_and_every_hand_commit(origin):
+    bare, work = origin
+    commit(work, {'index.html': 'page v2\n'}, 'Fleet sync 2026-08-01 10:00')
+    commit(work, {'auto-update.sh': 'echo v2\n'}, 'Raise the ping timeout')
+    commit(work, {'index.html': 'page v3\n'}, 'Auto-update fleet map (vault change detected)')
+    commit(work, {'README.md': 'docs\n'}, f"Document rolling commits\n\nQuoting the trailer:\n\n    {publish.TRAILER}")
+    commit(work, {'index.html': 'page v4\n'}, GEN)
+    tree = git(bare, 'rev-parse', 'main^{tree}')
+    assert publish.compact(str(work), yes=False) is None          # dry run pushes nothing
+    assert len(subjects(bare)) == 6
+    new = publish.compact(str(work), yes=True)
+    assert new == tip(bare)
+    assert git(bare, 'rev-parse', 'main^{tree}') == tree
+    assert subjects(bare) == ['Fleet sync', 'Document rolling commits', 'Raise the ping timeout', 'Initial page']
+    assert git(bare, 'show', 'main~1:index.html') == 'page v3'      # generated changes fold forward
+
+def test_sync_refuses_unpushed_hand_commit(origin, tmp_path):
+    bare, work = origin
+    commit(clone(bare, tmp_path / 'other'), {'index.html': 'page v2\n'}, 'Edit the page')
+    local = commit(work, {'auto-update.sh': 'echo local\n'}, 'Auto-update.sh: raise the ping timeout', push=False)
+    with pytest.raises(publish.PublishError):
+        publish.sync(str(work), regenerated=lambda path, base: path == 'index.html')
+    assert git(work, 'rev-parse', 'HEAD') == local
+
+def test_sync_refuses_generated_commit_touching_other_files(origin, tmp_path):
+    bare, work = origin
+    commit(clone(bare, tmp_path / 'other'), {'index.html': 'page v2\n'}, 'Edit the page')
+    local = commit(work, {'auto-update.sh': 'echo local\n'}, GEN, push=False)
+    with pytest.raises(publish.PublishError, match='auto-update.sh'):
+        publish.sync(str(work), regenerated=lambda path, base: path == 'index.html')
+    assert git(work, 'rev-parse', 'HEAD') == local
+
+def test_sync_resets_over_generated_output(origin, tmp_path):
+    bare, work = origin
+    commit(clone(bare, tmp_path / 'other'), {'auto-update.sh': 'echo v2\n'}, 'Raise the ping timeout')
+    commit(work, {'index.html': 'page generated\n'}, GEN, push=False)
+    (work / 'index.html').write_text('page regenerated\n')
+    changed = publish.sync(str(work), regenerated=lambda path, base: path == 'index.html')
+    assert git(work, 'rev-parse', 'HEAD') == tip(bare)
+    assert set(changed) == {'index.html', 'auto-update.sh'}
+    assert (work / 'auto-update.sh').read_text() == 'echo v2\n'
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Vault lint: check every note the generator reads, without rendering.
+
+    python3 generate.py --validate            # file:line: level: [code] message
+    python3 generate.py --validate json       # one JSON object per diagnostic
+    python3 generate.py --validate all        # ignore the clean-file cache
+
+The generator itself is lenient — a bad note is skipped or defaulted so the
+map always builds — which is exactly why data-quality problems go unseen.
+This pass looks at each note on its own terms: frontmatter that doesn't
+parse or close, dates that aren't YYYY-MM-DD, registrations that don't
+normalise, base and waypoint codes the map doesn't know, heli_N_* slots
+that disagree with each other or with helicopter_count, and schedule
+bullets that parse_flight_bullet() would drop.
+
+Files are checked on a thread pool (reads from a synced vault are the slow
+part). A file with no diagnostics is recorded in .cache/validate.json with
+its mtime and size, and skipped next time until it changes or the rules do.
+Exit status is 1 if there is any error, else 0; warnings don't fail.
+"""
+import os, re, sys, json, glob, hashlib, functools
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import generate
+
+CACHE_FILE = "validate.json"
+MISSION_STATUSES = {'pending', 'confirmed', 'potential', 'active', 'complete', 'paused', 'canceled', 'cancelled'}
+HELI_STATUSES = ('serviceable', 'maint', 'aog', 'preserv')
+CURRENCY_FIELDS = {          # label in the pilot note: strptime format
+    'Medical Certificate Date': "%Y-%m-%d",
+    '30 Mins REMS': "%Y-%m",
+    'Last Competency Check': "%Y-%m-%d",
+    'Last Line Check': "%Y-%m-%d",
+    'Check Pilot Renewal': "%Y-%m-%d",
+}
+_REG = re.compile(r'^HZ(HC|TH)\d+$')
+
+class Diagnostics(list):
+    """[(line, level, code, message)] for one file."""
+    def error(self, line, code, msg):
+        self.append((line, 'error', code, msg))
+
+    def warn(self, line, code, msg):
+        self.append((line, 'warning', code, msg))
+
+def _key_lines(text):
+    """{frontmatter key: 1-based line} for top-level `key: value` lines."""
+    out = {}
+    for i, ln in enumerate(text.split('\n'), 1):
+        m = re.match(r'^([A-Za-z0-9_][\w ./-]*?)\s*:', ln)
+        if m:
+            out.setdefault(m.group(1), i)
+    return out
+
+def _is_date(value, fmt="%Y-%m-%d"):
+    try:
+        datetime.strptime(value, fmt)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+def _frontmatter(text, diags):
+    """Parse as the generator does, reporting an unclosed or broken block."""
+    if text.startswith('---') and text.count('\n---') < 1:
+        diags.error(1, 'frontmatter-unclosed', "frontmatter opened with --- but never closed")
+    d, ok = generate._parse_fm_text(text)
+    if not ok:
+        diags.error(1, 'frontmatter-parse', "frontmatter could not be parsed; the generator sees only part of it")
+    return d
+
+def check_heli(path, text, fleet):
+    diags = Diagnostics()
+    d, at = _frontmatter(text, diags), _key_lines(text)
+    stem = os.path.basename(path)[:-3]
+    reg = d.get('registration')
+    if not reg:
+        diags.warn(1, 'reg-missing', f"no registration; the filename {stem!r} is used")
+    else:
+        norm = generate.normalize_reg(reg)
+        if not _REG.match(norm):
+            diags.error(at.get('registration', 1), 'reg-invalid', f"registration {reg!r} does not normalise to HZHCnn / HZTHnn")
+        elif norm != generate.normalize_reg(stem):
+            diags.warn(at.get('registration', 1), 'reg-filename', f"registration {reg!r} does not match the filename {stem!r}")
+    loc = d.get('location')
+    if not loc:
+        diags.warn(1, 'base-missing', "no location; the aircraft is drawn at UNK")
+    elif loc not in generate.KNOWN_BASES:
+        diags.warn(at.get('location', 1), 'base-unknown', f"base {loc!r} is not in KNOWN_BASES")
+    st = d.get('status', '')
+    if st and not any(s in st.lower() for s in HELI_STATUSES):
+        diags.warn(at.get('status', 1), 'status-unknown', f"status {st!r} is shown as parked")
+    return diags
+
+def check_mission(path, text, fleet):
+    diags = Diagnostics()
+    d, at = _frontmatter(text, diags), _key_lines(text)
+    start, end = d.get('date', ''), d.get('endDate', '')
+    if start and not _is_date(start):
+        diags.error(at.get('date', 1), 'date-format', f"date {start!r} is not YYYY-MM-DD; the mission is left off the timeline")
+    if end and not _is_date(end):
+        diags.error(at.get('endDate', 1), 'date-format', f"endDate {end!r} is not YYYY-MM-DD")
+    if _is_date(start) and _is_date(end) and end < start:
+        diags.error(at.get('endDate', 1), 'date-order', f"endDate {end} is before date {start}")
+    if end and not start:
+        diags.warn(at.get('endDate', 1), 'date-missing', "endDate without date; the mission shows as dates TBD")
+    st = d.get('status', 'pending').lower()
+    if st not in MISSION_STATUSES:
+        diags.warn(at.get('status', 1), 'status-unknown', f"status {st!r} is not one of {', '.join(sorted(MISSION_STATUSES))}")
+    count = d.get('helicopter_count')
+    n_count = 0
+    if count is not None:
+        try:
+            n_count = int(count or 0)
+        except ValueError:
+            diags.error(at.get('helicopter_count', 1), 'slot-count', f"helicopter_count {count!r} is not a number")
+    filled = []
+    for n in range(1, max(n_count, 10) + 1):
+        reg, role = d.get(f'heli_{n}_reg'), (d.get(f'heli_{n}_role') or '').strip()
+        if not reg and not role:
+            continue
+        filled.append(n)
+        line = at.get(f'heli_{n}_reg') or at.get(f'heli_{n}_role', 1)
+        if role and not reg:
+            diags.warn(line, 'slot-no-reg', f"heli_{n}_role {role!r} has no heli_{n}_reg; shown as TBD")
+        if reg and reg.strip().upper() not in ('TBD', 'TBA'):
+            norm = generate.normalize_reg(reg)
+            if not _REG.match(norm):
+                diags.error(line, 'reg-invalid', f"heli_{n}_reg {reg!r} does not normalise to HZHCnn / HZTHnn")
+            elif fleet and norm not in fleet:
+                diags.warn(line, 'reg-unknown', f"heli_{n}_reg {reg!r} is not an aircraft in Helicopters/")
+    if filled and filled != list(range(1, len(filled) + 1)):
+        diags.warn(at.get(f'heli_{filled[0]}_reg', 1), 'slot-gap', f"heli_N slots are not numbered from 1 without gaps: {filled}")
+    if count is not None and n_count and filled and n_count != len(filled):
+        diags.warn(at.get('helicopter_count', 1), 'slot-count', f"helicopter_count is {n_count} but {len(filled)} slot(s) are filled")
+    return diags
+
+def check_pilot(path, text, fleet):
+    diags = Diagnostics()
+    _frontmatter(text, diags)
+    for i, ln in enumerate(text.split('\n'), 1):
+        for label, fmt in CURRENCY_FIELDS.items():
+            if f'{label}:' in ln:
+                v = ln.split(':', 1)[1].strip()
+                if v and not _is_date(v, fmt):
+                    want = 'YYYY-MM' if fmt == "%Y-%m" else 'YYYY-MM-DD'
+                    diags.error(i, 'date-format', f"{label} {v!r} is not {want}; the alert for it is skipped")
+    return diags
+
+def check_schedule(path, text, fleet, section='## H125', ranges=generate.H125_RANGES):
+    diags = Diagnostics()
+    ref = datetime(2024, 1, 1)            # leap year: 29 Feb is a valid bullet date
+    in_h125 = False
+    for i, ln in enumerate(text.split('\n'), 1):
+        if ln.startswith(section):
+            in_h125 = True
+            continue
+        if ln.startswith('## '):
+            in_h125 = False
+            continue
+        if not in_h125 or not ln.strip().startswith('- '):
+            continue
+        p = generate.parse_flight_bullet(ln, ref)
+        if not p:
+            diags.error(i, 'bullet-syntax', "not '- REG — MISSION, DD Mon HH:MM-HH:MM, ROUTE (PIC: …)'; the flight is dropped")
+            continue
+        if not generate.is_h125(p['reg'], ranges):
+            diags.warn(i, 'reg-not-h125', f"{p['reg']} is not an H125; the flight is dropped")
+            continue
+        if not p['date']:
+            diags.error(i, 'date-format', f"{p['date_short']!r} is not a valid DD Mon date")
+        a, b = p['time'].split('-')
+        if not (_is_date(a, "%H:%M") and _is_date(b, "%H:%M")):
+            diags.error(i, 'time-format', f"{p['time']!r} is not a valid HH:MM-HH:MM range")
+        norm = generate.normalize_reg(p['reg'])
+        if fleet and norm not in fleet:
+            diags.warn(i, 'reg-unknown', f"{p['reg']} is not an aircraft in Helicopters/")
+        for wp in p['route'].split('→') if '→' in p['route'] else ():
+            wp = wp.strip()
+            if wp and wp not in generate.KNOWN_WAYPOINTS and not re.match(r'[NS]\d+', wp):
+                diags.warn(i, 'waypoint-unknown', f"waypoint {wp!r} is not in KNOWN_WAYPOINTS")
+    return diags
+
+def notes(cfg):
+    """[(path, checker)] for every note the generator reads."""
+    out = [(f, check_heli) for f in sorted(glob.glob(f"{cfg.helis_dir}/HZHC*.md") + glob.glob(f"{cfg.helis_dir}/HZTH*.md"))]
+    if os.path.exists(cfg.flights_file):
+        out.append((cfg.flights_file, functools.partial(check_schedule, section=cfg.schedule_section, ranges=cfg.reg_ranges)))
+    out += [(f, check_mission) for f in generate.mission_files(cfg)]
+    out += [(f, check_pilot) for f in sorted(glob.glob(f"{cfg.pilots_dir}/*/*.md"))]
+    return out
+
+def rules_version(fleet, cfg=None):
+    """Changes whenever a check could give a different answer for an
+    unchanged file: this module, the generator, the code tables, the fleet
+    and the site's schedule section and registration ranges."""
+    h = hashlib.sha256()
+    for mod in (__file__, generate.__file__):
+        h.update(open(mod, 'rb').read())
+    h.update(' '.join(sorted(fleet)).encode())
+    if cfg is not None:
+        h.update(repr((cfg.schedule_section, cfg.reg_ranges)).encode())
+    return h.hexdigest()[:16]
+
+def validate(cfg, use_cache=True):
+    """{relpath: Diagnostics} for every note that has any, plus the number
+    of notes checked and skipped as unchanged since a clean pass."""
+    fleet = {generate.normalize_reg(os.path.basename(f)[:-3])
+             for f in glob.glob(f"{cfg.helis_dir}/HZHC*.md") + glob.glob(f"{cfg.helis_dir}/HZTH*.md")}
+    version = rules_version(fleet, cfg)
+    path = os.path.join(cfg.state_dir, CACHE_FILE)
+    try:
+        cache = json.load(open(path))
+        clean = cache['clean'] if use_cache and cache.get('version') == version else {}
+    except (OSError, ValueError, KeyError):
+        clean = {}
+
+    todo, now_clean, skipped = [], {}, 0
+    for f, check in notes(cfg):
+        rel = os.path.relpath(f, cfg.vault)
+        try:
+            st = os.stat(f)
+        except OSError:
+            continue
+        key = [st.st_mtime_ns, st.st_size]
+        if clean.get(rel) == key:
+            now_clean[rel] = key
+            skipped += 1
+        else:
+            todo.append((f, rel, key, check))
+
+    def one(item):
+        f, rel, key, check = item
+        try:
+            text = open(f, encoding='utf-8').read()
+        except UnicodeDecodeError as e:
+            return rel, key, Diagnostics([(1, 'error', 'encoding', f"not UTF-8: {e}")])
+        except OSError as e:
+            return rel, key, Diagnostics([(1, 'error', 'unreadable', str(e))])
+        return rel, key, check(f, text, fleet)
+
+    found = {}
+    with ThreadPoolExecutor() as pool:
+        for rel, key, diags in pool.map(one, todo):
+            if diags:
+                found[rel] = diags
+            else:
+                now_clean[rel] = key
+    os.makedirs(cfg.state_dir, exist_ok=True)
+    with open(path + ".tmp", 'w') as fh:
+        json.dump({'version': version, 'clean': now_clean}, fh, sort_keys=True)
+    os.replace(path + ".tmp", path)
+    return found, len(todo), skipped
+
+def main(cfg, opts=()):
+    """--validate entry point. `opts`: 'json' and/or 'all'."""
+    bad = [o for o in opts if o not in ('json', 'all')]
+    if bad:
+        raise SystemExit(f"❌ Unknown --validate option(s): {', '.join(bad)} (expected json, all)")
+    found, checked, skipped = validate(cfg, use_cache='all' not in opts)
+    errors = sum(1 for ds in found.values() for d in ds if d[1] == 'error')
+    warnings = sum(len(ds) for ds in found.values()) - errors
+    for rel in sorted(found):
+        for line, level, code, msg in sorted(found[rel]):
+            if 'json' in opts:
+                print(json.dumps({'file': rel, 'line': line, 'level': level, 'code': code, 'message': msg}, ensure_ascii=False))
+            else:
+                print(f"{rel}:{line}: {level}: [{code}] {msg}")
+    print(f"{'❌' if errors else '✅'} {errors} error(s), {warnings} warning(s) — "
+          f"{checked} note(s) checked, {skipped} unchanged since a clean pass", file=sys.stderr)
+    return 1 if errors else 0